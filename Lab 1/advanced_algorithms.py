@@ -1,50 +1,77 @@
+import functools
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 import random
 import pprint
 
-from matplotlib.ticker import MaxNLocator, AutoLocator
+from collections import namedtuple
+from statistics import NormalDist
 
-from synthetic_data import SyntheticGraphGenerator
-from basic_algorithms import compute_degree_sequence, breadth_first_search
+from graph import EdgeType, frozen_node_names
+from hyperanf import hyperanf
+from instrumentation import active, phase
+from parallel import attach_frontier_bfs, graph_arrays, parallel_map, split_chunks
+from sampling import Estimate, WedgeSampler, hoeffding_estimate, hoeffding_samples
+from basic_algorithms import compute_degree_sequence
+from triangles import count_triangles_per_node
+from traversal import UNVISITED
 
 
-def count_triangles(graph):
-    num_triangles = {}
+def count_triangles(graph, n_jobs=1, backend='python'):
+    # backend = 'python' or 'sparse' (sparse matrix products, ignores n_jobs).
+    # Directed graphs count closed walks of length 3, always with the sparse backend.
+    assert backend in ['python', 'sparse']
+    if backend == 'sparse' or graph.edge_type is not EdgeType.UNDIRECTED:
+        import sparse_backend  # Loads scipy
 
-    # Run a depth 2 DFS from each node
-    for start_node in graph.nodes:
-        num_triangles[start_node] = 0
-        for neigh1 in graph.get_neighbours(start_node):
-            for neigh2 in graph.get_neighbours(neigh1):
-                # Don't return to parent
-                if neigh2 == start_node:
-                    continue
-                for neigh3 in graph.get_neighbours(neigh2):
-                    # If returned to start_node, we found a triangle
-                    if neigh3 == start_node:
-                        num_triangles[start_node] += 1
+        total, per_node = sparse_backend.triangles_per_node(graph)
+        return total, dict(zip(frozen_node_names(graph, graph.freeze()), per_node.tolist()))
 
-        # Each triangle was counted twice for start_node
-        num_triangles[start_node] = num_triangles[start_node] // 2
+    # Degree-ordered wedge intersection on the CSR snapshot
+    frozen = graph.freeze()
+    total, per_node = count_triangles_per_node(frozen, n_jobs)
+    num_triangles = dict(zip(frozen_node_names(graph, frozen), per_node.tolist()))
 
-    total = 0
-    for node in num_triangles.keys():
-        total += num_triangles[node]
+    return total, num_triangles
 
-    # Each triangle was counted once for every of its vertices
-    return total // 3, num_triangles
 
+# Coefficients rounded to 2 decimals and the number of nodes for each value
+ClusteringDistribution = namedtuple('ClusteringDistribution', ['values', 'counts'])
 
-def clustering_coefficients(graph, name=''):
+
+def clustering_distribution(coefficients):
+    # Python's round, NumPy rounds ties like 1/40 differently
+    rounded = np.fromiter((round(coeff, 2) for coeff in np.asarray(coefficients).tolist()), dtype=np.float64)
+    histogram = np.bincount(np.rint(rounded * 100).astype(np.int64))
+    values = np.flatnonzero(histogram)
+    return ClusteringDistribution(values / 100, histogram[values])
+
+
+def clustering_coefficients(graph, name='', n_jobs=1, plot=True, backend='python'):
+    # Directed graphs use Fagiolo's directed triangles, always with the sparse backend
+    assert backend in ['python', 'sparse']
+    if backend == 'sparse' or graph.edge_type is not EdgeType.UNDIRECTED:
+        import sparse_backend  # Loads scipy
+
+        names = frozen_node_names(graph, graph.freeze())
+        coeff = dict(zip(names, sparse_backend.clustering_coefficients(graph).tolist()))
+    else:
+        coeff = _clustering_coefficients(graph, n_jobs)
+
+    if plot:
+        import plotting
+        plotting.plot_clustering_distribution(clustering_distribution(list(coeff.values())), name)
+
+    return coeff
+
+
+def _clustering_coefficients(graph, n_jobs):
     coeff = {}
 
     # Compute the degree sequence
     degree = compute_degree_sequence(graph)
 
     # Get number of triangles foro each vertex
-    _, num_triangles = count_triangles(graph)
+    _, num_triangles = count_triangles(graph, n_jobs)
 
     for node in graph.nodes:
         # Compute the theoretical maximum possible number of triangles
@@ -55,46 +82,211 @@ def clustering_coefficients(graph, name=''):
         else:
             coeff[node] = 0
 
-    # Make bar plot for coefficient count
-    coeffs = list(coeff.values())
-    coeffs = list(map(lambda c: round(c, 2), coeffs))
-    coeffs = pd.DataFrame(coeffs, columns=['clustering_coefficient'])
-    coeffs = coeffs['clustering_coefficient'].value_counts().sort_index()
-    coeffs.plot(kind='bar', rot=45, width=1.3)
-
-    plt.title(f'Clustering coefficients distribution\n{name}')
-    # plt.gca().xaxis.set_major_locator(MaxNLocator(min(25, len(coeffs))))
-    plt.gca().yaxis.set_major_locator(MaxNLocator(integer=True))
-
-    plt.xlabel('Clustering coefficient')
-    plt.ylabel('Count')
-
-    plt.tight_layout()
-    plt.show()
-
     return coeff
 
 
-def compute_average_distance(graph, num_samples=1000):
+# Estimates with (epsilon, delta) guarantees. transitivity = 3 * triangles /
+# wedges; the distribution holds estimated node counts, each within
+# distribution_margin nodes of the exact clustering_distribution.
+ApproximateClustering = namedtuple('ApproximateClustering', [
+    'transitivity', 'average_clustering', 'triangles', 'distribution', 'distribution_margin', 'num_samples'])
+
+
+def approximate_clustering(graph, epsilon=0.01, delta=0.01, seed=None, name='', plot=True):
+    # Sampling instead of exact per-node triangle counts (undirected graphs,
+    # parallel edges and self-loops ignored). All estimates are within
+    # epsilon (relative to their range) together with probability >= 1 - delta.
+    assert graph.edge_type is EdgeType.UNDIRECTED, 'Use clustering_coefficients for directed graphs'
+    sampler = WedgeSampler(graph.freeze(), seed)
+    # Union bound over the three bounds below (transitivity and triangles
+    # share one): each may fail with probability delta / 3
+    num_samples = hoeffding_samples(epsilon, delta / 3)
+    num_wedges, num_nodes = sampler.num_wedges, sampler.num_nodes
+
+    with phase('approximate_clustering.wedges'):
+        transitivity = sampler.closed_wedges(num_samples) / num_samples if num_wedges > 0 else 0.0
+    transitivity = hoeffding_estimate(transitivity, epsilon)
+    triangles = Estimate(*(num_wedges * value / 3 for value in transitivity))
+
+    # Exact coefficients of uniform nodes: their mean is within epsilon of
+    # the average (Hoeffding), their empirical CDF within epsilon of the
+    # exact one everywhere (Dvoretzky-Kiefer-Wolfowitz), so every bin of
+    # the distribution within 2 * epsilon
+    with phase('approximate_clustering.nodes'):
+        coefficients = sampler.node_coefficients(sampler.sample_nodes(num_samples)) if num_nodes > 0 else []
+    average = hoeffding_estimate(np.mean(coefficients) if num_nodes > 0 else 0.0, epsilon)
+
+    sampled = clustering_distribution(coefficients)
+    counts = np.rint(sampled.counts * num_nodes / num_samples).astype(np.int64)
+    distribution = ClusteringDistribution(sampled.values, counts)
+
+    if plot:
+        import plotting
+        plotting.plot_clustering_distribution(distribution, name)
+
+    return ApproximateClustering(transitivity, average, triangles, distribution, 2 * epsilon * num_nodes,
+                                 num_samples)
+
+
+def _pair_distances(bfs, pairs):
+    # Bidirectional search stops as soon as both sides meet
+    profile = active()
+    if profile is None:
+        return [bfs.distance(src, dest) for src, dest in pairs]
+
+    before = bfs.counters()
     distances = []
-
+    for done, (src, dest) in enumerate(pairs, 1):
+        distances.append(bfs.distance(src, dest))
+        profile.report_progress('average_distance.pairs', done, len(pairs))
+    profile.count_since('average_distance', before, bfs.counters())
+
+    return distances
+
+
+MIN_SOURCES = 8  # First batch of BFS sources, later batches double up to MAX_SOURCES_PER_BATCH
+MAX_SOURCES_PER_BATCH = 64
+
+DistanceSample = namedtuple('DistanceSample', [
+    'average_distance',  # Over the connected ordered pairs
+    'lower',  # Confidence interval of the average
+    'upper',
+    'distance_distribution',  # Estimated ordered pairs at distance exactly t, t >= 1
+    'num_sources',  # BFS runs until the interval was narrow enough
+])
+
+
+def _distance_summary(distance):
+    distance = distance[distance > 0]  # Drops the source and unreachable nodes
+    return int(distance.sum(dtype=np.int64)), len(distance), np.bincount(distance)[1:]
+
+
+def _source_distances(bfs, sources):
+    # (sum of distances, reachable nodes, distance histogram) of each source
+    profile = active()
+    before = bfs.counters() if profile is not None else None
+
+    results = []
+    for done, source in enumerate(sources, 1):
+        results.append(_distance_summary(bfs.distances(source)))
+
+        if profile is not None:
+            profile.report_progress('average_distance.sources', done, len(sources))
+    if profile is not None:
+        profile.count_since('average_distance', before, bfs.counters())
+
+    return results
+
+
+def _ratio_interval(sums, reachable, z, num_nodes):
+    # Half width of the confidence interval of sum(sums) / sum(reachable)
+    # for sources drawn without replacement (delta method)
+    num_sources = len(sums)
+    if num_sources < 2 or reachable.sum() == 0:
+        return np.inf
+
+    residuals = sums - sums.sum() / reachable.sum() * reachable
+    variance = residuals.var(ddof=1) / num_sources * (1 - num_sources / num_nodes)
+    return z * np.sqrt(variance) / reachable.mean()
+
+
+def sample_distances(graph, ci_width=0.1, confidence=0.95, max_sources=1000, n_jobs=1, seed=None,
+                     backend='python'):
+    # One BFS per random source gives the distances of all its n - 1 pairs.
+    # Sources are added in batches until the confidence interval of the
+    # average distance is at most ci_width wide (or max_sources ran).
+    # backend = 'python' or 'sparse' (compiled csgraph BFS, ignores n_jobs),
+    # both give the same sample for the same seed.
+    assert backend in ['python', 'sparse']
+    rng = random if seed is None else random.Random(seed)
+    frozen = graph.freeze()
+    num_nodes = frozen.num_nodes
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    # Drawn upfront, so the sample does not depend on n_jobs
+    sources = rng.sample(range(num_nodes), min(max_sources, num_nodes))
+
+    setup = functools.partial(attach_frontier_bfs, frozen.edge_type)
+    arrays = graph_arrays(frozen)
+    sums, reachable, histograms = [], [], []
+    margin = np.inf
+    with phase('average_distance.bfs'):
+        start, batch_size = 0, MIN_SOURCES
+        while start < len(sources):
+            batch = sources[start:start + batch_size]
+            start, batch_size = start + batch_size, min(2 * batch_size, MAX_SOURCES_PER_BATCH)
+            if backend == 'sparse':
+                import sparse_backend  # Loads scipy
+
+                chunks = [list(map(_distance_summary, sparse_backend.source_distances(frozen, batch)))]
+            else:
+                chunks = parallel_map(arrays, setup, _source_distances, split_chunks(batch, n_jobs), n_jobs,
+                                      task='average_distance')
+            for chunk in chunks:
+                for total, count, histogram in chunk:
+                    sums.append(total)
+                    reachable.append(count)
+                    histograms.append(histogram)
+
+            margin = _ratio_interval(np.array(sums), np.array(reachable), z, num_nodes)
+            if 2 * margin <= ci_width:
+                break
+
+    distribution = np.zeros(max(map(len, histograms), default=0))
+    for histogram in histograms:
+        distribution[:len(histogram)] += histogram
+    distribution *= num_nodes / max(len(histograms), 1)
+
+    total_reachable = sum(reachable)
+    average = sum(sums) / total_reachable if total_reachable > 0 else np.nan
+    return DistanceSample(average, average - margin, average + margin, distribution, len(histograms))
+
+
+def compute_average_distance(graph, num_samples=1000, n_jobs=1, seed=None, method='sources', ci_width=0.1,
+                             backend='python'):
+    # method = 'sources' (all pairs of at most num_samples BFS sources, until
+    # the 95% confidence interval is ci_width wide), 'sample' (num_samples
+    # random pairs) or 'hyperanf' (sketch of all pairs). backend only applies
+    # to 'sources', see sample_distances()
+    assert method in ['sources', 'sample', 'hyperanf']
+    if method == 'hyperanf':
+        with phase('average_distance.hyperanf'):
+            return label_average_distance(graph, hyperanf(graph, seed=seed or 0).average_distance)
+    if method == 'sources':
+        sample = sample_distances(graph, ci_width, max_sources=num_samples, n_jobs=n_jobs, seed=seed, backend=backend)
+        return label_average_distance(graph, sample.average_distance)
+
+    rng = random if seed is None else random.Random(seed)
+    frozen = graph.freeze()
+
+    # Draw all pairs upfront, so the sample does not depend on n_jobs
+    pairs = []
     for _ in range(num_samples):
-        src = random.choice(list(graph.nodes))
-        dest = random.choice(list(graph.nodes))
+        src = rng.randrange(frozen.num_nodes)
+        dest = rng.randrange(frozen.num_nodes)
 
         if src == dest:
             continue
 
-        _, out = breadth_first_search(graph, src)
+        pairs.append((src, dest))
 
-        # Check if src and dest are connected
-        res = list(filter(lambda o: o[0] == dest, out))
-        if len(res) > 0:
-            distances.append(res[0][1])
+    chunks = split_chunks(pairs, n_jobs)
+    setup = functools.partial(attach_frontier_bfs, frozen.edge_type)
+    with phase('average_distance.bfs'):
+        distances = parallel_map(graph_arrays(frozen), setup, _pair_distances, chunks, n_jobs,
+                                 task='average_distance')
 
-    average_distance = np.array(distances).mean()
+    # Keep only connected pairs
+    distances = [distance for chunk in distances for distance in chunk if distance != UNVISITED]
+
+    return label_average_distance(graph, np.array(distances).mean())
+
+
+def label_average_distance(graph, average_distance):
     label = ''
 
+    if len(graph.nodes) < 2:  # log log 1 is not defined
+        return average_distance, label
     if average_distance < np.log(np.log(len(graph.nodes))):
         label = 'ultra small world'
     elif average_distance < np.log(len(graph.nodes)):
@@ -104,6 +296,8 @@ def compute_average_distance(graph, num_samples=1000):
 
 
 def main():
+    from synthetic_data import SyntheticGraphGenerator
+
     pp = pprint.PrettyPrinter(indent=4)
 
     graph = SyntheticGraphGenerator.create_random_edge_graph(num_nodes=500, edge_prob=0.01)
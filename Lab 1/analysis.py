@@ -1,110 +1,99 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import pandas as pd
-import powerlaw
-import sys
 
-from matplotlib.ticker import MaxNLocator
+from collections import namedtuple
 
-from data import prepare_data
-from synthetic_data import SyntheticGraphGenerator
-from basic_algorithms import get_connected_components, compute_diameter, compute_girth, compute_degree_sequence
+from girth import find_girth
+from graph import EdgeType
+from basic_algorithms import exact_diameter, sample_diameters
+from hyperanf import hyperanf
 
-print(sys.getrecursionlimit())
-sys.setrecursionlimit(11000)
-print(sys.getrecursionlimit())
 
+# Plain results of the analyses, plotting.py draws them. Arrays only hold
+# the non-empty bins of the histograms.
+ComponentDistribution = namedtuple('ComponentDistribution', ['sizes', 'counts', 'big_component'])
+DegreeDistribution = namedtuple('DegreeDistribution', ['degrees', 'counts'])
+ScaleFreeFit = namedtuple('ScaleFreeFit', ['is_scale_free', 'alpha'])
 
-def distribution_of_connected_components(graph, name=''):
-    cc = get_connected_components(graph)
 
-    # Count connected components sizes
-    cc_sizes = list(map(lambda comp: len(comp), cc))
-
-    # Convert to dataframe for easier plotting
-    cc_sizes = pd.DataFrame(cc_sizes, columns=['size'])
-
-    # Aggregate by size
-    cc_sizes = cc_sizes['size'].value_counts().sort_index()
+def component_distribution(component_sizes, num_nodes):
+    # Number of components of every size
+    histogram = np.bincount(component_sizes)
+    sizes = np.flatnonzero(histogram)
+    counts = histogram[sizes]
 
     # Determine if graph has a `big component`
-    sizes = cc_sizes.iloc[-2:].index.tolist()
-    counts = cc_sizes.iloc[-2:].tolist()
-
     big_component = False
-    if sizes[-1] > len(graph.nodes) / 100 and counts[-1] == 1:  # a single big component
+    if sizes[-1] > num_nodes / 100 and counts[-1] == 1:  # a single big component
         big_component = True
 
-    if len(sizes) == 2 and sizes[-2] > np.log(len(graph.nodes)) / 2:
+    if len(sizes) >= 2 and sizes[-2] > np.log(num_nodes) / 2:
         big_component = False
 
-    # Plot count for unique sizes
-    cc_sizes.plot(kind='bar', rot=0)
-
-    plt.title(f'Connected components size distribution\n{name}')
-    plt.gca().yaxis.set_major_locator(MaxNLocator(integer=True))
+    return ComponentDistribution(sizes, counts, big_component)
 
-    BIG = mpatches.Patch(color='green', label='Big component')
-    MEH = mpatches.Patch(color='red', label='Not big enough')
-    plt.legend(handles=[BIG, MEH])
 
-    if big_component:
-        plt.gca().get_xticklabels()[-1].set_color("green")
-    else:
-        plt.gca().get_xticklabels()[-1].set_color("red")
+def distribution_of_connected_components(graph, name='', plot=True):
+    # Union-find gives the component sizes without materializing the components
+    result = component_distribution(graph.component_sizes(), len(graph.nodes))
 
-    plt.xlabel('Size')
-    plt.ylabel('Count')
+    if plot:
+        import plotting
+        plotting.plot_component_distribution(result, name)
 
-    plt.tight_layout()
+    return result
 
-    plt.show()
 
+def degree_distribution(degree_histogram):
+    degrees = np.flatnonzero(degree_histogram)
+    return DegreeDistribution(degrees, degree_histogram[degrees])
 
-def scale_free_classification(graph, name):
-    degree = compute_degree_sequence(graph)
-    degree_sequence = sorted(degree.values())
 
-    results = powerlaw.Fit(degree_sequence, xmin=1, discrete=True)
-    R, p = results.distribution_compare('power_law', 'lognormal')
-    is_scale_free = R > 0
+def fit_scale_free(degree_histogram, xmin=1, n_jobs=1):
+    # Power law against lognormal on the (degree, count) histogram; xmin=None
+    # searches the xmin with the best KS distance instead
+    from power_law import compare_alternatives, fit_power_law  # Loads scipy, only import it when fitting
 
-    # fig, axes = plt.subplots(nrows=1, ncols=2, figsize=(5, 3))
-    fig = plt.figure(figsize=(17, 6.5), dpi=100)
-    ax = fig.add_subplot(111, frame_on=False)
-    ax.tick_params(labelcolor="none", bottom=False, left=False)
+    fit = fit_power_law(degree_histogram, xmin, n_jobs)
+    R, p = compare_alternatives(degree_histogram, fit)['lognormal']
 
-    ax1 = fig.add_subplot(121)
-    ax2 = fig.add_subplot(122)
+    return ScaleFreeFit(bool(R > 0), fit.alpha)
 
-    df = pd.DataFrame(degree_sequence, columns=['degree'])
-    degree_count = df['degree'].value_counts().sort_index()
-    degree_count.plot(kind='line', ax=ax1)
-    degree_count.plot(kind='line', loglog=True, ax=ax2)
 
-    ax.set_xlabel('Degree')
-    ax.set_ylabel('Count')
+def scale_free_classification(graph, name='', plot=True, direction='out'):
+    # direction = 'in' fits the in-degrees of a directed graph
+    result = fit_scale_free(graph.degree_histogram(direction))
 
-    ax1.set_title('Linear scale')
-    ax2.set_title('Logarithmic scale')
-    ax.set_title(f'Scale-free analysis: Degree distribution\n{name}\n\n')
+    if plot:
+        import plotting
+        # Cached degree histogram instead of counting the sequence again
+        plotting.plot_degree_distribution(degree_distribution(graph.degree_histogram(direction)), name)
 
-    plt.show()
+    return result
 
-    return is_scale_free, results.power_law.alpha
 
+def estimate_diameter(graph, num_samples=20, n_jobs=1, seed=None, method='sample', time_budget=None):
+    # method = 'sample' (repeated double sweeps), 'hyperanf' (effective
+    # diameter, the 90th percentile distance, which is below the diameter) or
+    # 'exact' (iFUB, lower bound if time_budget runs out)
+    assert method in ['sample', 'hyperanf', 'exact']
+    if method == 'exact' and graph.edge_type is not EdgeType.UNDIRECTED:
+        raise ValueError("method='exact' (iFUB) needs an undirected graph, use 'sample' or 'hyperanf'")
 
-def diameter_classification(graph, num_samples=20):
-    # Use 2 DFS method multiple times to estimate graph diameter
-    diameters = []
-    for _ in range(num_samples):
-        diameter, _, _ = compute_diameter(graph, start_node='random')
-        diameters.append(diameter)
+    if method == 'sample':
+        # Use 2 DFS method multiple times to estimate graph diameter
+        diameters = sample_diameters(graph, num_samples, n_jobs, seed)
+        return np.array(diameters).mean()
+    elif len(graph.component_sizes()) > 1:
+        return np.inf  # Disconnected, like the sampled double sweeps
+    elif method == 'hyperanf':
+        return hyperanf(graph, seed=seed or 0).effective_diameter
+    elif method == 'exact':
+        diameter, _ = exact_diameter(graph, time_budget)
+        return diameter
 
-    diameter = np.array(diameters).mean()
 
-    ratio = diameter / np.log(len(graph.nodes))
+def diameter_type(diameter, num_nodes):
+    ratio = diameter / np.log(num_nodes)
 
     # Classify based on diameter / log(n) ratio
     if ratio <= 1:
@@ -115,16 +104,28 @@ def diameter_classification(graph, num_samples=20):
         return 2
 
 
-def girth_classification(graph):
-    girth = compute_girth(graph)
+def diameter_classification(graph, num_samples=20, n_jobs=1, seed=None, method='sample', time_budget=None):
+    diameter = estimate_diameter(graph, num_samples, n_jobs, seed, method, time_budget)
+    return diameter_type(diameter, len(graph.nodes))
 
+
+def girth_type(girth):
     if girth <= 4:
         return 0
     elif girth > 4:
         return 1
 
 
+def girth_classification(graph, n_jobs=1):
+    # Only girth <= 4 matters, the search stops as soon as it is decided
+    girth, _ = find_girth(graph, threshold=4, n_jobs=n_jobs)
+    return girth_type(girth)
+
+
 def main():
+    from data import prepare_data
+    from synthetic_data import SyntheticGraphGenerator
+
     # test_pandas()
 
     real_graphs = prepare_data()
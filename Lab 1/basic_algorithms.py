@@ -1,157 +1,245 @@
+import functools
 import pprint
-from matplotlib.pyplot import draw_if_interactive
 import numpy as np
 import random
+import time
 
-from queue import Queue
+from components import strongly_connected_components, weakly_connected_components
+from girth import find_girth
+from graph import EdgeType, FrozenGraph, Graph, frozen_node_names
+from instrumentation import active
+from parallel import attach_frontier_bfs, graph_arrays, parallel_map, split_chunks
+from traversal import FrontierBFS, TraversalEngine, UNVISITED
 
-from graph import EdgeType, Graph
-from synthetic_data import SyntheticGraphGenerator
 
+def depth_first_search(graph, starting_node, reverse=False):
+    # reverse=True follows edges backwards (nodes that reach starting_node)
+    if not isinstance(graph, FrozenGraph):
+        return _adjacency_dfs(graph, starting_node, reverse)
 
-def depth_first_search(graph, starting_node):
-    def _dfs(crt_node, graph, visited, output):
-        visited.add(crt_node)
-        output.append(crt_node)
+    engine = TraversalEngine(graph, reverse)
+    engine.dfs(engine.node_id(starting_node))
 
-        for neigh in graph.get_neighbours(crt_node):
-            if neigh not in visited:
-                _dfs(neigh, graph, visited, output)
+    output = [engine.node_label(node) for node in engine.visited_nodes()]  # Order of visiting nodes
+    visited = set(output)
+
+    return visited, output
+
+
+def breadth_first_search(graph, starting_node, reverse=False):
+    if not isinstance(graph, FrozenGraph):
+        return _adjacency_bfs(graph, starting_node, reverse)
 
-    visited = set()  # No nodes yet visited
-    output = []  # Order of visiting nodes
+    engine = TraversalEngine(graph, reverse)
+    engine.bfs(engine.node_id(starting_node))
 
-    _dfs(starting_node, graph, visited, output)
+    distance = engine.distance
+    output = [[engine.node_label(node), distance[node]]  # [node, distance]
+              for node in engine.visited_nodes()]
+    visited = set(node for node, _ in output)
 
     return visited, output
 
 
-def breadth_first_search(graph, starting_node):
-    visited = set()  # No nodes yet visited
-    output = []  # Order of visiting nodes
-    q = Queue()
+# A single search on a mutable Graph walks its adjacency lists, so it costs
+# O(size of the component) instead of freezing the whole graph first. The
+# visiting order is the same as the engine's.
 
-    q.put([starting_node, 0])  # [node, distance]
-    visited.add(starting_node)
 
-    while not q.empty():
-        node, distance = q.get()
-        output.append([node, distance])
+def _adjacency_dfs(graph, starting_node, reverse=False):
+    neighbours = graph.get_in_neighbours if reverse else graph.get_neighbours
+    visited = {starting_node}
+    output = [starting_node]
+    stack = [iter(neighbours(starting_node))]
 
-        for neigh in graph.get_neighbours(node):
+    while stack:
+        for neigh in stack[-1]:
             if neigh not in visited:
                 visited.add(neigh)
-                q.put([neigh, distance + 1])
+                output.append(neigh)
+                stack.append(iter(neighbours(neigh)))
+                break
+        else:
+            stack.pop()
 
     return visited, output
 
 
-def get_connected_components(graph):
-    components = []
-    visited = set()
+def _adjacency_bfs(graph, starting_node, reverse=False):
+    neighbours = graph.get_in_neighbours if reverse else graph.get_neighbours
+    visited = {starting_node}
+    output = [[starting_node, 0]]
 
-    for node in graph.nodes:
-        if node not in visited:
-            component, _ = depth_first_search(graph, node)
-            components.append(component)
-            visited.update(component)
+    for node, distance in output:  # Grows while it is scanned, a FIFO queue
+        for neigh in neighbours(node):
+            if neigh not in visited:
+                visited.add(neigh)
+                output.append([neigh, distance + 1])
 
-    return components
+    return visited, output
 
 
-def compute_degree_sequence(graph):
-    in_degree = {}
-    out_degree = {}
+def get_connected_components(graph, connection='weak'):
+    # connection = 'weak' (edge directions ignored) or 'strong' (directed
+    # paths both ways); both are the same for undirected graphs
+    assert connection in ['weak', 'strong']
+    frozen = graph.freeze()
+    names = frozen_node_names(graph, frozen)
 
-    for node in graph.nodes:
-        in_degree[node] = 0
-        out_degree[node] = 0
+    # Group nodes by their component label
+    if connection == 'strong' and graph.edge_type is EdgeType.DIRECTED:
+        labels = strongly_connected_components(frozen)
+    else:
+        labels = weakly_connected_components(frozen)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+
+    components = []
+    for nodes in np.split(order, bounds):
+        if len(nodes) > 0:
+            components.append(set(names[node] for node in nodes.tolist()))
+
+    return components
 
-    for node in graph.nodes:
-        for neigh in graph.get_neighbours(node):
-            in_degree[neigh] += 1
-            out_degree[node] += 1
 
+def compute_degree_sequence(graph, backend='python'):
+    # backend = 'python' or 'sparse' (row / column sums of graph.to_sparse())
+    assert backend in ['python', 'sparse']
+    if backend == 'sparse':
+        return _sparse_degree_sequence(graph)
+
+    # Degrees are kept up to date by the graph, no need to rescan the edges
     degree = {}
     for node in graph.nodes:
-        if graph.edge_type == EdgeType.UNDIRECTED:
-            degree[node] = out_degree[node]  # same as in_degree
-        elif graph.edge_type == EdgeType.DIRECTED:
-            degree[node] = (in_degree[node], out_degree[node])
+        degree[node] = graph.degree(node)
 
     return degree
 
 
+def _sparse_degree_sequence(graph):
+    import sparse_backend  # Loads scipy
+
+    names = frozen_node_names(graph, graph.freeze())
+    out_degrees = sparse_backend.degree_vector(graph).tolist()
+    if graph.edge_type is not EdgeType.DIRECTED:
+        return dict(zip(names, out_degrees))
+
+    # (in, out) pairs like graph.degree
+    return dict(zip(names, zip(sparse_backend.degree_vector(graph, 'in').tolist(), out_degrees)))
+
+
 def compute_diameter(graph, start_node='first'):  # start_node = 'first' or 'random'
     assert start_node in ['first', 'random']
 
+    bfs = FrontierBFS(graph)
+
     if start_node == 'first':
-        start_node = next(iter(graph.nodes))
+        start_node = bfs.node_id(next(iter(graph.nodes)))
     elif start_node == 'random':
-        start_node = random.choice(list(graph.nodes))
+        start_node = random.randrange(bfs.num_nodes)
+
+    diameter, src, dest = double_sweep(bfs, start_node)
+    if src is None:
+        return np.inf, None, None
+
+    names = frozen_node_names(graph, bfs.frozen)
+    return diameter, names[src], names[dest]
 
-    # Run BFS from arbitrary node
-    _, out = breadth_first_search(graph, next(iter(graph.nodes)))
+
+def double_sweep(bfs, start_node):
+    # Run BFS from the start node
+    distance = bfs.distances(start_node)
 
     # Check if graph is connected
-    if len(out) < len(graph.nodes):
+    if (distance == UNVISITED).any():
         return np.inf, None, None
 
     # Get farthest node from first traversal
-    src, _ = max(out, key=lambda o: o[1])
+    src = int(distance.argmax())
 
     # Get farthest distance from second traversal
-    _, out = breadth_first_search(graph, src)
-    dest, diameter = max(out, key=lambda o: o[1])
+    distance = bfs.distances(src)
+    dest = int(distance.argmax())
 
-    return diameter, src, dest
+    return int(distance[dest]), src, dest
 
 
-def compute_girth(graph):
-    def _bfs(starting_node, graph):
-        shortest_cycle = np.inf  # + [optional] tail
+def _sweep_diameters(bfs, start_nodes):
+    profile = active()
+    before = bfs.counters()
+    diameters = [double_sweep(bfs, start_node)[0] for start_node in start_nodes]
 
-        visited = set()  # No nodes yet visited
-        node_dist = {}
-        q = Queue()
+    if profile is not None:
+        profile.count_since('sample_diameters', before, bfs.counters())
+    return diameters
 
-        q.put([starting_node, 0])  # [node, distance]
-        node_dist[starting_node] = 0
-        visited.add(starting_node)
 
-        while not q.empty():
-            node, distance = q.get()
+def exact_diameter(graph, time_budget=None):
+    # iFUB (Crescenzi et al., 2013): BFS from a central node u, then compute
+    # eccentricities of the nodes farthest from u, level by level. A node at
+    # distance i from u has eccentricity <= 2i, so once the best eccentricity
+    # found exceeds 2 (i - 1), no closer node can beat it. Returns (lower,
+    # upper) bounds of the diameter, equal unless time_budget (s) ran out.
+    assert graph.edge_type is EdgeType.UNDIRECTED
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    bfs = FrontierBFS(graph)
+    if bfs.num_nodes == 0:
+        return np.inf, np.inf  # No start node, like a disconnected graph
 
-            for neigh in graph.get_neighbours(node):
-                if neigh in visited:
-                    neigh_dist = node_dist[neigh]
-                    if neigh_dist < distance:
-                        continue  # era ta-su mă
+    # Central node: midpoint of a double sweep from the highest degree node
+    lower, src, dest = double_sweep(bfs, int(np.argmax(bfs.degrees)))
+    if src is None:
+        return np.inf, np.inf
 
-                    if neigh_dist == distance:
-                        shortest_cycle = 2 * neigh_dist + 1
-                    elif neigh_dist == distance + 1:
-                        shortest_cycle = 2 * neigh_dist
+    from_src, from_dest = bfs.distances(src), bfs.distances(dest)
+    on_path = np.flatnonzero((from_src + from_dest == lower) & (from_src == lower // 2))
+    center = int(on_path[0])
 
-                    return shortest_cycle
+    distance = bfs.distances(center)
+    eccentricity = int(distance.max())
+    lower = max(lower, eccentricity)
+    upper = 2 * eccentricity
 
-                if neigh not in visited:
-                    visited.add(neigh)
-                    node_dist[neigh] = distance + 1
-                    q.put([neigh, distance + 1])
+    # Farthest levels first
+    order = np.argsort(-distance, kind='stable')
+    level_bounds = np.searchsorted(-distance[order], np.arange(-eccentricity, 0), side='right')
 
-        return shortest_cycle
+    level_start = 0
+    for level, level_end in zip(range(eccentricity, 0, -1), level_bounds.tolist()):
+        for node in order[level_start:level_end].tolist():
+            if deadline is not None and time.monotonic() > deadline:
+                return lower, upper
+            lower = max(lower, int(bfs.distances(node).max()))
 
-    girth = np.inf
+        level_start = level_end
+        upper = max(lower, 2 * (level - 1))
+        if lower >= upper:
+            break
 
-    for node in graph.nodes:
-        shortest_cycle = _bfs(node, graph)
-        girth = min(girth, shortest_cycle)
+    return lower, lower
+
+
+def sample_diameters(graph, num_samples, n_jobs=1, seed=None):
+    # Double sweep lower bounds of the diameter from random start nodes
+    rng = random if seed is None else random.Random(seed)
+    frozen = graph.freeze()
+    start_nodes = [rng.randrange(frozen.num_nodes) for _ in range(num_samples)]
 
+    chunks = split_chunks(start_nodes, n_jobs)
+    setup = functools.partial(attach_frontier_bfs, frozen.edge_type)
+    diameters = parallel_map(graph_arrays(frozen), setup, _sweep_diameters, chunks, n_jobs)
+
+    return [diameter for chunk in diameters for diameter in chunk]
+
+
+def compute_girth(graph, n_jobs=1):
+    girth, _ = find_girth(graph, n_jobs=n_jobs)
     return girth
 
 
 def main():
+    from synthetic_data import SyntheticGraphGenerator
+
     pp = pprint.PrettyPrinter(indent=4)
 
     random_graph = SyntheticGraphGenerator.create_random_edge_graph(num_nodes=10, edge_prob=0.1)
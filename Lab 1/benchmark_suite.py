@@ -0,0 +1,213 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from advanced_algorithms import clustering_coefficients, compute_average_distance, count_triangles
+from basic_algorithms import (breadth_first_search, compute_degree_sequence, compute_diameter, compute_girth,
+                              depth_first_search, get_connected_components)
+from data import DATASETS, load_dataset
+from synthetic_data import SyntheticGraphGenerator
+
+
+# Reproducible timings of every algorithm on seeded synthetic graphs and on
+# the SNAP datasets. Each case runs in a forked process, so its peak RSS is
+# not hidden by the cases before it. Results can be saved as a baseline and
+# later runs compared against it.
+
+RESULTS_PATH = './benchmark_results'
+SCALES = {'1k': 10 ** 3, '10k': 10 ** 4, '100k': 10 ** 5, '1m': 10 ** 6}
+AVERAGE_DEGREE = 10  # Of the random graphs
+SEED = 0
+TOLERANCE = 0.25  # Relative slowdown (or memory growth) flagged as a regression
+NOISE = {'time': 1e-3, 'alloc_peak': 1 << 16}  # Smaller absolute changes are never flagged
+
+FAMILIES = {
+    'random': lambda n: SyntheticGraphGenerator.create_random_edge_graph(
+        n, AVERAGE_DEGREE / (n - 1), seed=SEED, frozen=True),
+    'grid': lambda n: SyntheticGraphGenerator.create_grid_graph(int(np.sqrt(n)), int(np.sqrt(n)), frozen=True),
+    'kleinberg': lambda n: SyntheticGraphGenerator.create_kleinberg_graph(
+        int(np.sqrt(n)), int(np.sqrt(n)), seed=SEED, frozen=True),
+    'tree': lambda n: SyntheticGraphGenerator.create_tree_graph(n, seed=SEED, frozen=True),
+}
+
+CASES = {
+    'dfs': lambda graph: depth_first_search(graph, 0),
+    'bfs': lambda graph: breadth_first_search(graph, 0),
+    'components': get_connected_components,
+    'degree_sequence': compute_degree_sequence,
+    'diameter': compute_diameter,
+    'girth': compute_girth,
+    'triangles': count_triangles,
+    'clustering': lambda graph: clustering_coefficients(graph, plot=False),
+    'average_distance': lambda graph: compute_average_distance(graph, seed=SEED),
+}
+
+
+def current_rss():
+    # Resident set size in bytes (Linux only, 0 elsewhere)
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return 0
+
+
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kB on Linux
+
+
+def _run_case(func, graph, repeat, conn):
+    base_rss = current_rss()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(graph)
+        times.append(time.perf_counter() - start)
+    rss = peak_rss()
+
+    # Separate run, tracing allocations slows the code down
+    tracemalloc.start()
+    func(graph)
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    conn.send({
+        'time': min(times),
+        'median_time': float(np.median(times)),
+        'peak_rss': rss,
+        'extra_rss': max(rss - base_rss, 0),  # Growth over the RSS at fork time
+        'alloc_peak': alloc_peak,
+    })
+    conn.close()
+
+
+def measure_case(func, graph, repeat=3):
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(func, graph, repeat, child_conn))
+    process.start()
+    child_conn.close()
+
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = None  # Crashed or killed (e.g. out of memory)
+    process.join()
+
+    return result
+
+
+def iter_graphs(families, scales, datasets, archives_path=None):
+    # (name, graph) pairs, each graph is built once for all cases
+    for scale in scales:
+        for family in families:
+            yield f'{family}-{scale}', FAMILIES[family](SCALES[scale])
+
+    for ds in DATASETS:
+        if ds['name'] in datasets:
+            try:
+                yield ds['name'], load_dataset(ds, offline=True, archives_path=archives_path)
+            except FileNotFoundError as error:
+                print(f'Skipping {ds["name"]}: {error}')
+
+
+def run_suite(families, scales, datasets, cases, repeat=3, archives_path=None):
+    results = {}
+    for graph_name, graph in iter_graphs(families, scales, datasets, archives_path):
+        for case in cases:
+            key = f'{case}/{graph_name}'
+            results[key] = measure_case(CASES[case], graph, repeat)
+            print(format_result(key, results[key]))
+
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Cases slower, or with a larger peak allocation, than the baseline by more than `tolerance`
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if result is None or reference is None:
+            continue
+
+        for metric in ['time', 'alloc_peak']:
+            growth = result[metric] - reference[metric]
+            if growth > reference[metric] * tolerance and growth > NOISE[metric]:
+                regressions.append((key, metric, reference[metric], result[metric]))
+
+    return regressions
+
+
+def format_result(key, result):
+    if result is None:
+        return f'    {key:40} failed'
+    return (f'    {key:40} {result["time"] * 1000:10.1f} ms  rss +{result["extra_rss"] / 2**20:8.1f} MiB'
+            f'  alloc {result["alloc_peak"] / 2**20:8.1f} MiB')
+
+
+def machine_info():
+    return {'python': sys.version.split()[0], 'numpy': np.__version__, 'platform': sys.platform,
+            'cpu_count': os.cpu_count()}
+
+
+def save_results(file_path, results):
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, 'w') as results_file:
+        json.dump({'machine': machine_info(), 'results': results}, results_file, indent=2)
+
+
+def load_results(file_path):
+    with open(file_path) as results_file:
+        return json.load(results_file)['results']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every algorithm and compare against a baseline.')
+    parser.add_argument('--families', nargs='+', default=list(FAMILIES), choices=list(FAMILIES))
+    parser.add_argument('--scales', nargs='+', default=['1k', '10k'], choices=list(SCALES))
+    parser.add_argument('--datasets', nargs='*', default=[ds['name'] for ds in DATASETS],
+                        help='Only used if their archives are already downloaded')
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--archives-path', default=None)
+    parser.add_argument('--output', default=os.path.join(RESULTS_PATH, 'latest.json'))
+    parser.add_argument('--baseline', default=os.path.join(RESULTS_PATH, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    results = run_suite(args.families, args.scales, args.datasets, args.cases, args.repeat, args.archives_path)
+    save_results(args.output, results)
+
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --save-baseline first')
+        return 0
+
+    regressions = compare(results, load_results(args.baseline), args.tolerance)
+    for key, metric, reference, value in regressions:
+        print(f'REGRESSION {key}: {metric} {reference:.4g} -> {value:.4g} ({value / reference - 1:+.0%})')
+    if not regressions:
+        print('No regressions')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+import gc
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from advanced_algorithms import compute_average_distance, count_triangles
+from basic_algorithms import breadth_first_search, compute_girth, sample_diameters
+from data import DATASETS
+from graph import FrozenGraph, Graph, EdgeType
+from traversal import FrontierBFS
+
+
+HEAVY_MODULES = {'matplotlib', 'pandas', 'scipy', 'powerlaw', 'wget'}  # Should only load on demand
+
+
+def _legacy_create_from_edge_list(file_path, header_size, edge_type=EdgeType.UNDIRECTED):
+    # Line-by-line loader the vectorized one replaced, kept as a reference
+    graph = Graph(edge_type)
+
+    with open(file_path, 'r') as edges_file:
+        for _ in range(header_size):
+            next(edges_file)
+
+        edges = []
+        for line in edges_file:
+            src, dest = re.split(' |\t', line.strip())
+            edges.append([src, dest])
+            if edge_type is EdgeType.UNDIRECTED:
+                edges.append([dest, src])
+
+    for src, dest in edges:
+        graph.add_node(src)
+        graph.add_node(dest)
+        graph[src].append(dest)
+
+    return graph
+
+
+def measure(func, *args, **kwargs):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def write_random_edge_list(file_path, num_nodes, num_edges, header_size=0, seed=0):
+    rng = np.random.default_rng(seed)
+    edges = rng.integers(0, num_nodes, size=(num_edges, 2))
+
+    with open(file_path, 'w') as edges_file:
+        for i in range(header_size):
+            edges_file.write(f'# header line {i}\n')
+        np.savetxt(edges_file, edges, fmt='%d', delimiter='\t')
+
+
+def random_frozen_graph(num_nodes, num_edges, seed=0):
+    rng = np.random.default_rng(seed)
+    edges = rng.integers(0, num_nodes, size=(num_edges, 2))
+    return FrozenGraph.from_edges(edges[:, 0], edges[:, 1], num_nodes=num_nodes)
+
+
+def benchmark_edge_list_loader():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for ds in DATASETS:
+            file_path = os.path.join(tmp_dir, f'{ds["name"]}.txt')
+            write_random_edge_list(file_path, ds['num_nodes'], ds['num_edges'], ds['header_size'])
+
+            legacy, legacy_time, legacy_peak = measure(
+                _legacy_create_from_edge_list, file_path, ds['header_size'], ds['edge_type'])
+            graph, graph_time, graph_peak = measure(
+                Graph.create_from_edge_list, file_path, ds['header_size'], ds['edge_type'])
+            assert graph.adjacency_list == legacy.adjacency_list
+
+            print(f'{ds["name"]} ({ds["num_nodes"]} nodes, {ds["num_edges"]} edges):')
+            print(f'    legacy loader:     {legacy_time:8.3f}s  peak {legacy_peak / 2**20:8.1f} MiB')
+            print(f'    vectorized loader: {graph_time:8.3f}s  peak {graph_peak / 2**20:8.1f} MiB')
+
+
+def benchmark_bfs(num_queries=20, seed=0):
+    rng = np.random.default_rng(seed)
+    cases = [(ds['name'], ds['num_nodes'], ds['num_edges']) for ds in DATASETS]
+    cases.append(('random_200k', 200000, 2000000))
+
+    for name, num_nodes, num_edges in cases:
+        frozen = random_frozen_graph(num_nodes, num_edges, seed)
+        graph = frozen.to_graph()
+        pairs = rng.integers(0, num_nodes, size=(num_queries, 2)).tolist()
+
+        start = time.perf_counter()
+        for src, _ in pairs:
+            breadth_first_search(graph, src)
+        bfs_time = (time.perf_counter() - start) / num_queries
+
+        bfs = FrontierBFS(frozen)
+        start = time.perf_counter()
+        for src, _ in pairs:
+            bfs.distances(src)
+        frontier_time = (time.perf_counter() - start) / num_queries
+
+        start = time.perf_counter()
+        for src, dest in pairs:
+            bfs.distance(src, dest)
+        bidirectional_time = (time.perf_counter() - start) / num_queries
+
+        print(f'{name} ({num_nodes} nodes, {num_edges} edges), per query:')
+        print(f'    breadth_first_search:             {bfs_time * 1000:9.2f} ms')
+        print(f'    direction-optimizing distances:   {frontier_time * 1000:9.2f} ms')
+        print(f'    bidirectional point-to-point:     {bidirectional_time * 1000:9.2f} ms')
+
+
+def benchmark_parallel_scaling(num_nodes=20000, num_edges=200000, max_jobs=None, seed=0):
+    frozen = random_frozen_graph(num_nodes, num_edges, seed)
+    max_jobs = max_jobs or os.cpu_count() or 1
+
+    cases = {
+        'girth': lambda n_jobs: compute_girth(frozen, n_jobs=n_jobs),
+        'triangles': lambda n_jobs: count_triangles(frozen, n_jobs=n_jobs)[0],
+        'average distance': lambda n_jobs: compute_average_distance(frozen, n_jobs=n_jobs, seed=seed),
+        'diameter samples': lambda n_jobs: sample_diameters(frozen, 20, n_jobs=n_jobs, seed=seed),
+    }
+
+    print(f'Parallel scaling ({num_nodes} nodes, {num_edges} edges):')
+    for name, case in cases.items():
+        serial_result, serial_time = None, None
+        for n_jobs in range(1, max_jobs + 1):
+            start = time.perf_counter()
+            result = case(n_jobs)
+            elapsed = time.perf_counter() - start
+
+            if n_jobs == 1:
+                serial_result, serial_time = result, elapsed
+            assert result == serial_result
+
+            print(f'    {name:18} n_jobs={n_jobs:<3} {elapsed:8.3f}s  speedup {serial_time / elapsed:5.2f}x')
+
+
+def benchmark_sparse_backend(num_nodes=100000, num_edges=500000, num_sources=64, seed=0):
+    import sparse_backend
+    from advanced_algorithms import clustering_coefficients
+
+    frozen = random_frozen_graph(num_nodes, num_edges, seed)
+    sources = np.random.default_rng(seed).integers(0, num_nodes, size=num_sources)
+    frozen.to_sparse()  # Built once per graph, not part of the timings
+
+    def frontier_distances():
+        bfs = FrontierBFS(frozen)
+        return np.stack([bfs.distances(source) for source in sources])
+
+    cases = {
+        'triangles': lambda backend: count_triangles(frozen, backend=backend),
+        'clustering': lambda backend: clustering_coefficients(frozen, plot=False, backend=backend),
+        f'{num_sources} BFS': lambda backend: (frontier_distances() if backend == 'python'
+                                               else sparse_backend.multi_source_distances(frozen, sources)),
+    }
+
+    print(f'Sparse matrix backend ({num_nodes} nodes, {num_edges} edges):')
+    for name, case in cases.items():
+        python_result, python_time, _ = measure(case, 'python')
+        sparse_result, sparse_time, _ = measure(case, 'sparse')
+        assert np.array_equal(python_result, sparse_result) if name.endswith('BFS') else python_result == sparse_result
+        print(f'    {name:12} python {python_time:8.3f}s  sparse {sparse_time:8.3f}s')
+
+
+def benchmark_scale_free(sizes=(10 ** 4, 10 ** 5, 10 ** 6), seed=0):
+    import powerlaw
+    import power_law  # Imported up front, like powerlaw, so scipy's import is not timed
+    from analysis import fit_scale_free
+
+    def powerlaw_fit(degree_sequence):
+        results = powerlaw.Fit(np.sort(degree_sequence), xmin=1, discrete=True, verbose=False)
+        R, _ = results.distribution_compare('power_law', 'lognormal')
+        return R > 0, results.power_law.alpha
+
+    rng = np.random.default_rng(seed)
+    print('Scale-free fit (xmin=1), powerlaw on the degree sequence vs the degree histogram:')
+    for size in sizes:
+        degree_sequence = np.minimum(rng.zipf(2.5, size), size - 1)  # Degrees of a simple graph
+        expected, powerlaw_time, powerlaw_peak = measure(powerlaw_fit, degree_sequence)
+        result, histogram_time, histogram_peak = measure(fit_scale_free, np.bincount(degree_sequence))
+        assert result.is_scale_free == expected[0] and abs(result.alpha - expected[1]) < 1e-3
+
+        print(f'    {size:8} nodes  powerlaw {powerlaw_time:8.3f}s  peak {powerlaw_peak / 2**20:8.1f} MiB'
+              f'  histogram {histogram_time:8.3f}s  peak {histogram_peak / 2**20:8.1f} MiB')
+
+
+def benchmark_bulk_edges(num_nodes=100000, num_edges=1000000, seed=0):
+    # Random pairs with repeats and self-loops, added one by one and in bulk
+    edges = np.random.default_rng(seed).integers(0, num_nodes, size=(num_edges, 2))
+    pairs = edges.tolist()
+
+    def one_by_one(simple):
+        graph = Graph(simple=simple)
+        for node in range(num_nodes):
+            graph.add_node(node)
+        for src, dest in pairs:
+            graph.add_edge(src, dest)
+        return graph
+
+    def bulk(simple=False, **kwargs):
+        graph = Graph(simple=simple)
+        graph.add_nodes(range(num_nodes))
+        graph.add_edges(edges, **kwargs)
+        return graph
+
+    cases = {
+        'add_edge': lambda: one_by_one(False),
+        'add_edges': lambda: bulk(),
+        'add_edge, simple graph': lambda: one_by_one(True),
+        'add_edges, sort dedup': lambda: bulk(deduplicate=True, self_loops=False),
+        'add_edges, hash dedup': lambda: bulk(deduplicate=True, self_loops=False, method='hash'),
+        'add_edges, simple graph': lambda: bulk(True),
+    }
+
+    print(f'Edge insertion ({num_nodes} nodes, {num_edges} random pairs):')
+    results = {}
+    for name, case in cases.items():
+        graph, elapsed, peak = measure(case)
+        results[name] = graph.adjacency_list
+        print(f'    {name:24} {elapsed:8.3f}s  peak {peak / 2**20:8.1f} MiB  '
+              f'{sum(map(len, graph.adjacency_list.values())) // 2} edges')
+
+    assert results['add_edge'] == results['add_edges']
+    assert results['add_edge, simple graph'] == results['add_edges, simple graph']
+    assert results['add_edges, sort dedup'] == results['add_edges, hash dedup'] == results['add_edges, simple graph']
+
+
+def _pickled_num_edges(graph):
+    return sum(map(len, graph.adjacency_list.values()))
+
+
+def _shared_num_edges(name):
+    from snapshot import SharedSnapshot
+
+    shared = SharedSnapshot.attach(name)
+    num_edges = shared.graph.num_edges
+    shared.close()
+    return num_edges
+
+
+def _dataset_graph(ds, seed=0):
+    # The SNAP graph if its archive is already downloaded, a random graph of the same size otherwise
+    from data import load_dataset
+
+    try:
+        return ds['name'], load_dataset(ds, offline=True).to_graph()
+    except FileNotFoundError:
+        frozen = random_frozen_graph(ds['num_nodes'], ds['num_edges'], seed)
+        return f'random graph of {ds["name"]} size', frozen.to_graph()
+
+
+def benchmark_snapshot_handoff(seed=0):
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import resource_tracker
+    from snapshot import SharedSnapshot
+
+    # Workers forked after the tracker started share it, otherwise their own
+    # tracker would unlink the blocks they attached to when they exit
+    resource_tracker.ensure_running()
+
+    print('Graph handoff, pickling the adjacency lists vs attaching a flat snapshot:')
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        pool.submit(int).result()  # Start the worker before timing
+
+        for ds in DATASETS:
+            name, graph = _dataset_graph(ds, seed)
+
+            data, dump_time, _ = measure(pickle.dumps, graph, protocol=pickle.HIGHEST_PROTOCOL)
+            _, load_time, load_peak = measure(pickle.loads, data)
+            buffer, to_buffer_time, _ = measure(graph.to_buffer)
+            _, attach_time, attach_peak = measure(FrozenGraph.from_buffer, buffer)
+
+            # One worker process receiving the graph
+            start = time.perf_counter()
+            expected = pool.submit(_pickled_num_edges, graph).result()
+            pickled_handoff = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with SharedSnapshot.create(graph) as shared:
+                assert pool.submit(_shared_num_edges, shared.name).result() == expected
+            shared_handoff = time.perf_counter() - start
+
+            print(f'    {name}:')
+            print(f'        pickle    {len(data) / 2**20:8.1f} MiB  dumps {dump_time:8.3f}s  '
+                  f'loads {load_time:8.3f}s  peak {load_peak / 2**20:8.1f} MiB  worker {pickled_handoff:8.3f}s')
+            print(f'        snapshot  {len(buffer) / 2**20:8.1f} MiB  write {to_buffer_time:8.3f}s  '
+                  f'attach {attach_time:8.3f}s  peak {attach_peak / 2**20:8.1f} MiB  worker {shared_handoff:8.3f}s')
+
+
+def import_time(statement):
+    # Cumulative `python -X importtime` cost of a statement in a fresh
+    # interpreter, and the heavy dependencies it imported
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stderr
+
+    total, modules = 0, set()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_time, _, name = line[len('import time:'):].split('|')
+        total += int(self_time)
+        modules.add(name.strip().split('.')[0])
+
+    return total / 1e6, sorted(modules & HEAVY_MODULES)
+
+
+def benchmark_import_time(names=None):
+    import cna
+    names = names or cna.__all__
+
+    baseline, _ = import_time('import numpy')
+    print(f'Import time per entry point (import numpy alone: {baseline * 1000:.0f} ms):')
+    for name in names:
+        elapsed, heavy = import_time(f'from cna import {name}')
+        print(f'    {name:38} {elapsed * 1000:7.0f} ms  {", ".join(heavy)}')
+
+
+def main():
+    benchmark_import_time()
+    benchmark_edge_list_loader()
+    benchmark_bfs()
+    benchmark_parallel_scaling()
+    benchmark_sparse_backend()
+    benchmark_scale_free()
+    benchmark_snapshot_handoff()
+    benchmark_bulk_edges()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import importlib
+
+
+# Single entry point for the public API. Names are resolved on first access
+# (PEP 562 module __getattr__), so `from cna import breadth_first_search`
+# only imports the modules behind it, never plotting, pandas or the
+# dataset downloader unless asked for.
+_EXPORTS = {
+    'graph': ['EdgeType', 'Graph', 'FrozenGraph'],
+    'synthetic_data': ['SyntheticGraphGenerator'],
+    'basic_algorithms': ['depth_first_search', 'breadth_first_search', 'get_connected_components',
+                         'compute_degree_sequence', 'compute_diameter', 'exact_diameter', 'sample_diameters',
+                         'compute_girth'],
+    'advanced_algorithms': ['count_triangles', 'clustering_coefficients', 'approximate_clustering',
+                            'compute_average_distance', 'sample_distances'],
+    'analysis': ['distribution_of_connected_components', 'scale_free_classification', 'diameter_classification',
+                 'girth_classification'],
+    'girth': ['find_girth'],
+    'components': ['strongly_connected_components', 'weakly_connected_components'],
+    'power_law': ['fit_power_law', 'compare_alternatives'],
+    'sparse_backend': ['multi_source_distances'],
+    'sampling': ['WedgeSampler', 'stream_triangles'],
+    'snapshot': ['SharedSnapshot', 'load_snapshot', 'save_snapshot'],
+    'hyperanf': ['hyperanf'],
+    'traversal': ['TraversalEngine', 'FrontierBFS'],
+    'union_find': ['DisjointSet', 'stream_components'],
+    'session': ['GraphAnalysis'],
+    'instrumentation': ['Profile', 'profiling'],
+    'data': ['DATASETS', 'load_dataset', 'prepare_data'],
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+# Submodules reachable as attributes, e.g. cna.plotting
+_SUBMODULES = set(_EXPORTS) | {'plotting', 'report', 'parallel', 'triangles', 'edge_list', 'benchmarks',
+                               'benchmark_suite'}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        value = getattr(importlib.import_module(_MODULES[name]), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(name)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    globals()[name] = value  # Later lookups do not go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | _SUBMODULES)
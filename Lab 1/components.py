@@ -0,0 +1,79 @@
+import numpy as np
+
+from instrumentation import phase
+
+
+# Component labels of every node id of graph.freeze(). Weak components ignore
+# edge directions (union-find), strong ones need a path both ways.
+
+
+def weakly_connected_components(graph):
+    # Union-find root of every node
+    return graph.freeze().components().labels()
+
+
+def strongly_connected_components(graph):
+    # Iterative Tarjan, O(n + m) without recursion limits. Components are
+    # numbered 0 .. k-1 in reverse topological order of the condensation
+    # (a component only has edges to components with smaller numbers).
+    frozen = graph.freeze()
+    indptr, indices = frozen.indptr.tolist(), frozen.indices.tolist()
+    num_nodes = frozen.num_nodes
+
+    index = [-1] * num_nodes  # Discovery order
+    low = [0] * num_nodes  # Smallest index reachable through the DFS subtree
+    on_stack = [False] * num_nodes
+    component = np.full(num_nodes, -1, dtype=np.int64)
+    stack = []
+    num_components = 0
+    counter = 0
+
+    with phase('components.tarjan'):
+        for root in range(num_nodes):
+            if index[root] != -1:
+                continue
+
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, indptr[root])]  # (node, next neighbour position)
+
+            while work:
+                node, pos = work[-1]
+                end = indptr[node + 1]
+
+                while pos < end:
+                    neigh = indices[pos]
+                    pos += 1
+                    if index[neigh] == -1:
+                        # Descend, resume `node` at `pos` afterwards
+                        work[-1] = (node, pos)
+                        index[neigh] = low[neigh] = counter
+                        counter += 1
+                        stack.append(neigh)
+                        on_stack[neigh] = True
+                        work.append((neigh, indptr[neigh]))
+                        break
+                    if on_stack[neigh] and index[neigh] < low[node]:
+                        low[node] = index[neigh]
+                else:
+                    # Every neighbour done
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if low[node] < low[parent]:
+                            low[parent] = low[node]
+
+                    if low[node] == index[node]:
+                        # `node` is the root of a component: pop it off the stack
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component[member] = num_components
+                            if member == node:
+                                break
+                        num_components += 1
+
+    return component
+
@@ -1,49 +1,163 @@
-import wget
-import os, shutil, subprocess
+import hashlib
+import json
+import os
+import shutil
 
-from graph import Graph, EdgeType
+from graph import FrozenGraph, EdgeType
+from snapshot import load_snapshot, save_snapshot
 
 
 DATASETS_PATH = './data'
+CACHE_PATH = os.path.join(DATASETS_PATH, 'cache')
+CACHE_FORMAT_VERSION = 2
 DATASETS = [
     {
         'name': 'fb_graph',
         'url': 'https://snap.stanford.edu/data/facebook_combined.txt.gz',
         'edge_type': EdgeType.UNDIRECTED,
         'header_size': 0,
+        'num_nodes': 4039,
+        'num_edges': 88234,
     },
     {
         'name': 'collaboration_network',
         'url': 'https://snap.stanford.edu/data/ca-GrQc.txt.gz',
         'edge_type': EdgeType.UNDIRECTED,
         'header_size': 4,
-    }
+        'num_nodes': 5242,
+        'num_edges': 14496,
+    },
+    {
+        'name': 'wiki_vote',
+        'url': 'https://snap.stanford.edu/data/wiki-Vote.txt.gz',
+        'edge_type': EdgeType.DIRECTED,
+        'header_size': 4,
+        'num_nodes': 7115,
+        'num_edges': 103689,
+    },
 ]
 
 
-def prepare_data():
-    graphs = {}
+def file_hash(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
 
-    # Clean data directoroy
-    shutil.rmtree(DATASETS_PATH)
+    return digest.hexdigest()
 
-    if not os.path.exists(DATASETS_PATH):
-        os.makedirs(DATASETS_PATH)
 
-    for ds in DATASETS:
-        # Download dataset
-        filename, extension = os.path.splitext(wget.download(ds['url'], DATASETS_PATH))
+def fetch_archive(ds, offline=False, archives_path=None):
+    archives_path = archives_path or DATASETS_PATH
+    archive = os.path.join(archives_path, os.path.basename(ds['url']))
+
+    if not os.path.exists(archive):
+        if offline:
+            raise FileNotFoundError(f'Missing archive for {ds["name"]} in offline mode: {archive}')
+
+        import wget  # Only needed for downloads
+
+        os.makedirs(archives_path, exist_ok=True)
+        wget.download(ds['url'], archive)
+
+    return archive
+
+
+def cache_metadata(ds, source_hash=None):
+    metadata = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'header_size': ds['header_size'],
+        'edge_type': ds['edge_type'].name,
+    }
+    if source_hash is not None:
+        metadata['source_sha256'] = source_hash
+    return metadata
+
+
+def source_stat(archive):
+    # Size and modification time, checked before hashing the whole archive
+    stat = os.stat(archive)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def save_graph_cache(graph, cache_dir, metadata):
+    os.makedirs(cache_dir, exist_ok=True)
+    save_snapshot(graph, os.path.join(cache_dir, 'graph.snapshot'))
+
+    # Metadata is written last and marks the cache entry as complete
+    write_cache_metadata(cache_dir, dict(metadata, num_nodes=graph.num_nodes, num_edges=graph.num_edges))
 
-        # Extract archive
-        assert extension == '.gz'
-        subprocess.call(['gzip', '-d', filename])
 
-        # Create graph
-        graph = Graph.create_from_edge_list(file_path=filename,
-                                            header_size=ds['header_size'],
-                                            edge_type=ds['edge_type'])
+def write_cache_metadata(cache_dir, metadata):
+    tmp_path = os.path.join(cache_dir, 'meta.json.tmp')
+    with open(tmp_path, 'w') as meta_file:
+        json.dump(metadata, meta_file, indent=4)
+    os.replace(tmp_path, os.path.join(cache_dir, 'meta.json'))
 
-        graphs[ds['name']] = graph
+
+def read_cache_metadata(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), 'r') as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+
+
+def load_graph_cache(cache_dir):
+    # Read-only mapping, processes loading the same cache share its pages
+    return load_snapshot(os.path.join(cache_dir, 'graph.snapshot'))
+
+
+def cache_entries(ds):
+    if not os.path.exists(CACHE_PATH):
+        return []
+    return [os.path.join(CACHE_PATH, entry) for entry in os.listdir(CACHE_PATH)
+            if entry.startswith(f'{ds["name"]}-')]
+
+
+def metadata_matches(cached, metadata):
+    return cached is not None and all(cached.get(key) == value for key, value in metadata.items())
+
+
+def load_dataset(ds, offline=False, archives_path=None):
+    archive = fetch_archive(ds, offline, archives_path)
+    stat = source_stat(archive)
+
+    # An entry built from an archive of the same size and mtime is trusted
+    # without hashing it again
+    for cache_dir in cache_entries(ds):
+        if metadata_matches(read_cache_metadata(cache_dir), dict(cache_metadata(ds), **stat)):
+            return load_graph_cache(cache_dir)
+
+    metadata = cache_metadata(ds, file_hash(archive))
+    cache_dir = os.path.join(CACHE_PATH, f'{ds["name"]}-{metadata["source_sha256"][:16]}')
+
+    cached = read_cache_metadata(cache_dir)
+    if metadata_matches(cached, metadata):
+        # Same content, only the size / mtime record is out of date
+        write_cache_metadata(cache_dir, dict(cached, **stat))
+    else:
+        # Drop entries built from older sources or cache formats
+        for entry in cache_entries(ds):
+            shutil.rmtree(entry)
+
+        graph = FrozenGraph.create_from_edge_list(file_path=archive,
+                                                  header_size=ds['header_size'],
+                                                  edge_type=ds['edge_type'])
+        save_graph_cache(graph, cache_dir, dict(metadata, **stat))
+
+    return load_graph_cache(cache_dir)
+
+
+def prepare_data(offline=False, archives_path=None, frozen=False):
+    # offline: only use archives already present in `archives_path` (defaults to DATASETS_PATH)
+    # frozen: return the memory-mapped FrozenGraph (nodes are ids, labels in
+    # graph.labels) instead of a Graph keyed by the original node labels
+    graphs = {}
+
+    for ds in DATASETS:
+        graph = load_dataset(ds, offline, archives_path)
+        graphs[ds['name']] = graph if frozen else graph.to_graph()
 
     return graphs
 
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+CHUNK_SIZE = 1 << 20  # Lines parsed per chunk
+
+
+def read_edge_chunks(file_path, header_size=0, chunk_size=CHUNK_SIZE):
+    # Whitespace separated `src dest` lines, `#` comments are ignored and
+    # `.gz` archives are decompressed on the fly
+    import pandas as pd  # Slow to import, only needed when parsing
+
+    try:
+        # Labels are kept verbatim: no NA parsing of labels like `NA` or `null`
+        reader = pd.read_csv(file_path, sep=r'\s+', comment='#', header=None, usecols=[0, 1],
+                             skiprows=header_size, dtype=str, chunksize=chunk_size,
+                             compression='infer', keep_default_na=False, na_filter=False)
+    except pd.errors.EmptyDataError:
+        return  # No edges
+
+    with reader:
+        for chunk in reader:
+            yield chunk[0].to_numpy(), chunk[1].to_numpy()
+
+
+class LabelInterner:
+    # Maps node labels to contiguous ids in order of first appearance
+    def __init__(self):
+        self.label_ids = {}
+        self.labels = []
+
+    def __len__(self):
+        return len(self.labels)
+
+    def intern(self, values):
+        import pandas as pd
+
+        codes, uniques = pd.factorize(values)
+        assert (codes >= 0).all(), 'Missing node label'
+
+        # Only the distinct labels of the chunk go through the dictionary
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for code, label in enumerate(uniques.tolist()):
+            node_id = self.label_ids.get(label)
+            if node_id is None:
+                node_id = len(self.labels)
+                self.label_ids[label] = node_id
+                self.labels.append(label)
+            mapping[code] = node_id
+
+        return mapping[codes]
+
+
+def read_edge_list(file_path, header_size=0, chunk_size=CHUNK_SIZE):
+    interner = LabelInterner()
+    src_chunks, dest_chunks = [], []
+
+    for src, dest in read_edge_chunks(file_path, header_size, chunk_size):
+        # Interleave endpoints so ids follow the order nodes appear in the file
+        ids = interner.intern(np.stack([src, dest], axis=1).ravel())
+        ids = ids.astype(np.int64 if len(interner) > np.iinfo(np.int32).max else np.int32)
+        src_chunks.append(ids[0::2])
+        dest_chunks.append(ids[1::2])
+
+    if src_chunks:
+        src = np.concatenate(src_chunks)
+        dest = np.concatenate(dest_chunks)
+    else:
+        src = dest = np.empty(0, dtype=np.int32)
+
+    return src, dest, interner.labels
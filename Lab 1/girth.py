@@ -0,0 +1,218 @@
+import functools
+import numpy as np
+
+from collections import deque
+
+from graph import EdgeType, frozen_node_names
+from instrumentation import active, phase
+from parallel import attach_traversal_engine, graph_arrays, parallel_map, resolve_jobs, split_chunks
+from triangles import count_triangles_per_node
+from traversal import UNVISITED
+
+
+def two_core(frozen):
+    # Peel nodes of degree <= 1 until none is left; no cycle goes through them
+    degrees = frozen.degrees().copy()
+    src = np.repeat(np.arange(frozen.num_nodes), frozen.degrees())
+    dest = np.asarray(frozen.indices)
+    removed = np.zeros(frozen.num_nodes, dtype=bool)
+
+    peel = np.flatnonzero(degrees <= 1)
+    while len(peel) > 0:
+        removed[peel] = True
+
+        # Every edge of a peeled node lowers the degree of its other end
+        peeled = removed[src]
+        np.subtract.at(degrees, dest[peeled & ~removed[dest]], 1)
+        src, dest = src[~peeled], dest[~peeled]
+
+        peel = np.flatnonzero((degrees <= 1) & ~removed)
+
+    return ~removed
+
+
+def _cycle_through(parent, node, neigh):
+    # Cycle closed by the non-tree edge (node, neigh): both tree paths up to
+    # their lowest common ancestor
+    node_path, neigh_path = [node], [neigh]
+    node_seen = {node}
+    while parent[node_path[-1]] != UNVISITED:
+        node_path.append(parent[node_path[-1]])
+        node_seen.add(node_path[-1])
+
+    while neigh_path[-1] not in node_seen:
+        neigh_path.append(parent[neigh_path[-1]])
+
+    lca = neigh_path[-1]
+    return node_path[:node_path.index(lca) + 1] + neigh_path[-2::-1]
+
+
+def _shortest_cycle(engine, starting_node, bound):
+    # Shortest cycle of length < bound found by a BFS from starting_node:
+    # returns (length, node, neigh) of its closing edge, or (bound, None, None),
+    # and the number of nodes whose neighbours were scanned
+    indptr, indices, node_dist = engine.indptr, engine.indices, engine.distance
+    frontier = deque([starting_node])
+    best = bound, None, None
+
+    engine.reset()
+    engine.visit(starting_node, 0)
+
+    while frontier:
+        node = frontier.popleft()
+        distance = node_dist[node]
+
+        # Cycles found from here on have length >= 2 * distance + 1
+        if 2 * distance + 1 >= best[0]:
+            return best, engine.num_visited - len(frontier) - 1
+
+        for neigh in indices[indptr[node]:indptr[node + 1]]:
+            neigh_dist = node_dist[neigh]
+            if neigh_dist != UNVISITED:
+                if neigh_dist < distance:
+                    continue  # era ta-su mă
+
+                length = 2 * neigh_dist + 1 if neigh_dist == distance else 2 * neigh_dist
+                if length < best[0]:
+                    best = length, node, neigh
+                    if length == 2 * distance + 1:
+                        return best, engine.num_visited - len(frontier)  # Shortest possible at this depth
+                continue
+
+            engine.visit(neigh, distance + 1, node)
+            frontier.append(neigh)
+
+    return best, engine.num_visited - len(frontier)
+
+
+def _shortest_directed_cycle(engine, starting_node, bound):
+    # Directed version: only an edge back to starting_node closes a cycle
+    # through it, of length distance + 1, so the first one found is the shortest
+    indptr, indices, node_dist = engine.indptr, engine.indices, engine.distance
+    frontier = deque([starting_node])
+
+    engine.reset()
+    engine.visit(starting_node, 0)
+
+    while frontier:
+        node = frontier.popleft()
+        distance = node_dist[node]
+        if distance + 1 >= bound:
+            break
+
+        for neigh in indices[indptr[node]:indptr[node + 1]]:
+            if neigh == starting_node:
+                return (distance + 1, node, neigh), engine.num_visited - len(frontier)
+            if node_dist[neigh] == UNVISITED:
+                engine.visit(neigh, distance + 1, node)
+                frontier.append(neigh)
+
+    return (bound, None, None), engine.num_visited - len(frontier)
+
+
+def _girth_of_sources(engine, task):
+    # Keep the best cycle of the chunk as bound for the following searches
+    sources, bound, stop_at = task
+    best_length, best_cycle = bound, None
+    profile = active()
+    directed = engine.frozen.edge_type is EdgeType.DIRECTED
+    shortest_cycle = _shortest_directed_cycle if directed else _shortest_cycle
+
+    for done, node in enumerate(sources, 1):
+        (length, node, neigh), expanded = shortest_cycle(engine, node, best_length)
+        if profile is not None:
+            indptr = engine.indptr
+            profile.count('girth.bfs_runs')
+            profile.count('girth.vertices_visited', engine.num_visited)
+            profile.count('girth.edges_scanned', sum(indptr[v + 1] - indptr[v]
+                                                     for v in engine.visited_nodes()[:expanded]))
+            profile.report_progress('girth.sources', done, len(sources))
+
+        if node is not None:
+            best_length, best_cycle = length, _cycle_through(engine.parent, node, neigh)
+            if directed:
+                best_cycle.reverse()  # Tree path back to the source, listed in edge order
+
+            if best_length <= stop_at:
+                break
+
+    return best_length, best_cycle
+
+
+def _simple_cycles(frozen):
+    # Self-loops (length 1) and parallel edges (length 2)
+    src = np.repeat(np.arange(frozen.num_nodes), frozen.degrees())
+    indices = np.asarray(frozen.indices)
+
+    loops = np.flatnonzero(src == indices)
+    if len(loops) > 0:
+        return 1, [int(src[loops[0]])]
+
+    forward = src < indices
+    keys = np.sort(src[forward] * frozen.num_nodes + indices[forward])
+    repeated = np.flatnonzero(keys[1:] == keys[:-1])
+    if len(repeated) > 0:
+        key = int(keys[repeated[0]])
+        return 2, [key // frozen.num_nodes, key % frozen.num_nodes]
+
+    return np.inf, None
+
+
+def _find_triangle(frozen, node):
+    neighbours = set(frozen.get_neighbours(node).tolist()) - {node}
+    for neigh in neighbours:
+        common = neighbours.intersection(frozen.get_neighbours(neigh).tolist()) - {neigh}
+        if common:
+            return [node, neigh, min(common)]
+
+
+def find_girth(graph, threshold=None, n_jobs=1):
+    # Returns (girth, cycle) with the nodes of a shortest cycle. With a
+    # threshold only cycles of length <= threshold are looked for, and the
+    # search stops at the first one: girth <= threshold is then decided, and
+    # np.inf means there is no such cycle. Cycles of directed graphs follow
+    # the edge directions (a self-loop has length 1, u -> v -> u length 2).
+    frozen = graph.freeze()
+    names = frozen_node_names(graph, frozen)
+    limit = np.inf if threshold is None else threshold
+
+    def _result(length, cycle):
+        if length > limit or cycle is None:
+            return np.inf, None
+        return length, [names[node] for node in cycle]
+
+    core, core_ids, min_length = frozen, None, 1
+    if frozen.edge_type is EdgeType.UNDIRECTED:
+        with phase('girth.simple_cycles'):
+            length, cycle = _simple_cycles(frozen)
+        if cycle is not None or limit < 3:
+            return _result(length, cycle)
+
+        # Triangles end the search right away
+        with phase('girth.triangles'):
+            total, per_node = count_triangles_per_node(frozen, n_jobs)
+        if total > 0:
+            return _result(3, _find_triangle(frozen, int(np.argmax(per_node > 0))))
+
+        with phase('girth.two_core'):
+            core_ids = np.flatnonzero(two_core(frozen))
+            core = frozen.subgraph(core_ids)
+        min_length = 4
+
+    # Bounded BFS from every node of the core, highest degree first
+    sources = np.argsort(-core.degrees(), kind='stable').tolist()
+    bound = limit + 1 if threshold is not None else np.inf
+    stop_at = min_length if threshold is None else max(min_length, threshold)
+
+    n_jobs = resolve_jobs(n_jobs)
+    chunks = [sources] if n_jobs == 1 else split_chunks(sources, n_jobs)
+    tasks = [(chunk, bound, stop_at) for chunk in chunks]
+    setup = functools.partial(attach_traversal_engine, core.edge_type)
+    with phase('girth.bfs'):
+        results = parallel_map(graph_arrays(core), setup, _girth_of_sources, tasks, n_jobs, task='girth')
+
+    length, cycle = min(results, key=lambda result: result[0], default=(np.inf, None))
+    if cycle is not None and core_ids is not None:
+        cycle = core_ids[cycle].tolist()
+
+    return _result(length, cycle)
@@ -1,6 +1,11 @@
-import re
+import numpy as np
 
+from collections import Counter
 from enum import Enum
+from itertools import chain
+
+from edge_list import CHUNK_SIZE, read_edge_list
+from union_find import DisjointSet
 
 
 class EdgeType(Enum):
@@ -9,38 +14,57 @@ class EdgeType(Enum):
 
 
 class Graph:
-    def __init__(self, edge_type=EdgeType.UNDIRECTED):
-        self.adjacency_list = {}
+    def __init__(self, edge_type=EdgeType.UNDIRECTED, simple=False):
         self.nodes = set()
         self.edge_type = edge_type
+        self.simple = simple  # No self-loops or parallel edges, adding one again is a no-op
+        self._neighbour_sets = {}  # Only kept for simple graphs, O(1) edge lookups
+        self._components = None  # Union-find kept current once tracking is enabled
+        self._frozen = None  # (version, snapshot) of the last freeze()
+        self._sparse = None  # (version, adjacency matrix) of the last to_sparse()
+        self._reverse = None  # (version, transposed snapshot) of the last reverse()
+        self.version = 0  # Bumped by every mutation, lets caches detect stale results
+        self.adjacency_list = {}
+
+    @property
+    def adjacency_list(self):
+        return self._adjacency_list
+
+    @adjacency_list.setter
+    def adjacency_list(self, adjacency_list):
+        # Replacing the whole adjacency list recounts the degrees
+        if self.simple:
+            # Keep the first copy of every edge, without self-loops
+            adjacency_list = {node: list(dict.fromkeys(neigh for neigh in neighbours if neigh != node))
+                              for node, neighbours in adjacency_list.items()}
+            self._neighbour_sets = {node: set(neighbours) for node, neighbours in adjacency_list.items()}
+
+        self._adjacency_list = adjacency_list
+        self.version += 1
+        self._in_degree = {}  # Only kept for directed graphs, out-degree is len(neighbours)
+        self._degree_cache = {}
+
+        if self.edge_type is EdgeType.DIRECTED:
+            self._in_degree = dict.fromkeys(adjacency_list, 0)
+            for neighbours in adjacency_list.values():
+                for neigh in neighbours:
+                    self._in_degree[neigh] = self._in_degree.get(neigh, 0) + 1
+
+        if self._components is not None:
+            self.track_components()
 
     @classmethod
-    def create_from_edge_list(cls, file_path, header_size, edge_type=EdgeType.UNDIRECTED):
-        graph = cls(edge_type)  # Construct null graph of given type
-
-        with open(file_path, 'r') as edges_file:
-            # Skip header lines
-            for _ in range(header_size):
-                next(edges_file)
-
-            # Extract all edges
-            edges = []
-            for line in edges_file:
-                src, dest = re.split(' |\t', line.strip())
-                edges.append([src, dest])
-                if edge_type is EdgeType.UNDIRECTED:
-                    edges.append([dest, src])
-
-        # Construct adjacency list
-        for src, dest in edges:
-            # Update nodes set
-            graph.add_node(src)
-            graph.add_node(dest)
-
-            # Add new neighbour
-            graph[src].append(dest)
+    def create_from_edge_list(cls, file_path, header_size, edge_type=EdgeType.UNDIRECTED,
+                              chunk_size=CHUNK_SIZE, simple=False):
+        # Parse in bulk into CSR arrays, then expand into adjacency lists in one pass
+        frozen = FrozenGraph.create_from_edge_list(file_path, header_size, edge_type, chunk_size)
+        return frozen.to_graph(graph_cls=cls, simple=simple)
 
-        return graph
+    @classmethod
+    def from_edges(cls, src, dest, labels=None, num_nodes=None, edge_type=EdgeType.UNDIRECTED, simple=False):
+        # Bulk construction from edge arrays of node ids (indices into `labels`)
+        frozen = FrozenGraph.from_edges(src, dest, labels, num_nodes, edge_type)
+        return frozen.to_graph(graph_cls=cls, simple=simple)
 
     def __getitem__(self, node):
         return self.get_neighbours(node)
@@ -49,10 +73,50 @@ class Graph:
         assert node in self.adjacency_list
         return self.adjacency_list.get(node, [])
 
+    def get_in_neighbours(self, node):
+        # Nodes with an edge to `node`, from the transposed snapshot
+        assert node in self.adjacency_list
+        if self.edge_type is not EdgeType.DIRECTED:
+            return self.get_neighbours(node)
+
+        reverse = self.reverse()
+        return [reverse.labels[neigh] for neigh in reverse.get_neighbours(reverse.node_id(node)).tolist()]
+
     def add_node(self, node):
         self.nodes.add(node)
         if node not in self.adjacency_list:
             self.adjacency_list[node] = []
+            if self.edge_type is EdgeType.DIRECTED:
+                self._in_degree[node] = 0
+            if self.simple:
+                self._neighbour_sets[node] = set()
+            if self._components is not None:
+                self._component_ids[node] = self._components.add()
+            self._degree_cache.clear()
+            self.version += 1
+
+    def add_nodes(self, nodes):
+        # Bulk add_node for an array or any iterable, new nodes keep their
+        # order of first appearance
+        if isinstance(nodes, np.ndarray):
+            nodes = nodes.tolist()
+        nodes = list(dict.fromkeys(nodes))
+        self.nodes.update(nodes)
+
+        new_nodes = [node for node in nodes if node not in self.adjacency_list]
+        if not new_nodes:
+            return
+
+        self.adjacency_list.update((node, []) for node in new_nodes)
+        if self.edge_type is EdgeType.DIRECTED:
+            self._in_degree.update(dict.fromkeys(new_nodes, 0))
+        if self.simple:
+            self._neighbour_sets.update((node, set()) for node in new_nodes)
+        if self._components is not None:
+            first = self._components.add(len(new_nodes))
+            self._component_ids.update(zip(new_nodes, range(first, first + len(new_nodes))))
+        self._degree_cache.clear()
+        self.version += 1
 
     def add_edge(self, src, dest):
         self.add_oriented_edge(src, dest)
@@ -64,5 +128,436 @@ class Graph:
         assert src in self.adjacency_list
         assert src in self.nodes
         assert dest in self.nodes
+        if self.simple:
+            if src == dest or dest in self._neighbour_sets[src]:
+                return  # Would be a self-loop or a parallel edge
+            self._neighbour_sets[src].add(dest)
 
         self.get_neighbours(src).append(dest)
+        if self.edge_type is EdgeType.DIRECTED:
+            self._in_degree[dest] += 1
+        if self._components is not None:
+            self._components.union(self._component_ids[src], self._component_ids[dest])
+        self._degree_cache.clear()
+        self.version += 1
+
+    def add_edges(self, edges, deduplicate=False, self_loops=True, method='sort'):
+        # Bulk add_edge for an (m, 2) array or an iterable of (src, dest)
+        # pairs, missing endpoints are added first. deduplicate skips the
+        # repeats within the batch and the edges already in the graph, by
+        # sorting (labels of one type) or hashing (any labels). Simple
+        # graphs always skip parallel edges and self-loops. Returns the
+        # number of edges added.
+        assert method in ['sort', 'hash']
+        src, dest = edge_columns(edges)
+        self.add_nodes(chain.from_iterable(zip(src, dest)))
+        undirected = self.edge_type is EdgeType.UNDIRECTED
+
+        if self.simple:
+            src, dest = self._append_simple(src, dest)
+        else:
+            if not self_loops:
+                kept = [i for i, (u, v) in enumerate(zip(src, dest)) if u != v]
+                src, dest = [src[i] for i in kept], [dest[i] for i in kept]
+            if deduplicate:
+                kept = self._new_edges(src, dest, method)
+                src, dest = [src[i] for i in kept], [dest[i] for i in kept]
+
+            # Same neighbour order as calling add_edge on every pair
+            adjacency_list = self.adjacency_list
+            for u, v in zip(src, dest):
+                adjacency_list[u].append(v)
+                if undirected:
+                    adjacency_list[v].append(u)
+
+        if not src:
+            return 0
+
+        if not undirected:
+            for node, count in Counter(dest).items():
+                self._in_degree[node] += count
+        if self._components is not None:
+            ids = self._component_ids
+            self._components.union_edges([ids[u] for u in src], [ids[v] for v in dest])
+        self._degree_cache.clear()
+        self.version += 1
+
+        return len(src)
+
+    def _append_simple(self, src, dest):
+        # One pass: the neighbour sets catch self-loops, edges already in the
+        # graph and repeats within the batch alike. Returns the added edges.
+        adjacency_list, neighbour_sets = self.adjacency_list, self._neighbour_sets
+        undirected = self.edge_type is EdgeType.UNDIRECTED
+        added_src, added_dest = [], []
+
+        for u, v in zip(src, dest):
+            neighbours = neighbour_sets[u]
+            if u == v or v in neighbours:
+                continue
+
+            neighbours.add(v)
+            adjacency_list[u].append(v)
+            if undirected:
+                neighbour_sets[v].add(u)
+                adjacency_list[v].append(u)
+            added_src.append(u)
+            added_dest.append(v)
+
+        return added_src, added_dest
+
+    def _new_edges(self, src, dest, method):
+        # Positions of the first copy of every edge of the batch that is not
+        # in the graph yet (either orientation for undirected graphs)
+        undirected = self.edge_type is EdgeType.UNDIRECTED
+
+        if method == 'sort':
+            # Compact ids of the labels, then one key per edge; the first
+            # index of every distinct key keeps the input order
+            labels = src + dest
+            assert len(set(map(type, labels))) <= 1, "method='sort' needs labels of a single type"
+            _, ids = np.unique(np.array(labels), return_inverse=True)
+            ids = ids.reshape(-1).astype(np.int64)
+            lo, hi = ids[:len(src)], ids[len(src):]
+            if undirected:
+                lo, hi = np.minimum(lo, hi), np.maximum(lo, hi)
+            _, first = np.unique(lo * (int(ids.max(initial=0)) + 1) + hi, return_index=True)
+            candidates = np.sort(first).tolist()
+        else:
+            seen = set()
+            candidates = []
+            for i, (u, v) in enumerate(zip(src, dest)):
+                if (u, v) in seen or (undirected and (v, u) in seen):
+                    continue
+                seen.add((u, v))
+                candidates.append(i)
+
+        # Edges already in the graph, one neighbour set per source that has any
+        adjacency_list = self.adjacency_list
+        existing = {}
+        kept = []
+        for i in candidates:
+            u = src[i]
+            if adjacency_list[u]:
+                if u not in existing:
+                    existing[u] = set(adjacency_list[u])
+                if dest[i] in existing[u]:
+                    continue
+            kept.append(i)
+
+        return kept
+
+    def has_edge(self, src, dest):
+        # O(1) for simple graphs, a scan of the neighbours of src otherwise
+        if self.simple:
+            return dest in self._neighbour_sets[src]
+        return dest in self.adjacency_list[src]
+
+    def degree(self, node):
+        if self.edge_type is EdgeType.DIRECTED:
+            return self._in_degree[node], len(self.adjacency_list[node])
+
+        return len(self.adjacency_list[node])
+
+    def degree_vector(self, direction='out'):
+        # Degrees ordered like the ids of freeze() (insertion order); for
+        # undirected graphs `direction` makes no difference
+        assert direction in ['in', 'out']
+        key = ('vector', direction)
+        if key not in self._degree_cache:
+            if self.edge_type is EdgeType.DIRECTED and direction == 'in':
+                degrees = self._in_degree.values()
+            else:
+                degrees = map(len, self.adjacency_list.values())
+
+            self._degree_cache[key] = np.fromiter(degrees, dtype=np.int64, count=len(self.adjacency_list))
+        return self._degree_cache[key]
+
+    def degree_histogram(self, direction='out'):
+        # histogram[d] = number of nodes of degree d, cached until the next mutation
+        key = ('histogram', direction)
+        if key not in self._degree_cache:
+            self._degree_cache[key] = np.bincount(self.degree_vector(direction))
+        return self._degree_cache[key]
+
+    def track_components(self):
+        # Union-find over the current edges (weakly connected components for
+        # directed graphs), updated by every later add_node / add_edge
+        frozen = self.freeze()
+        self._component_ids = dict(zip(frozen.labels, frozen.nodes))
+        self._components = DisjointSet(frozen.num_nodes)
+        self._components.union_edges(np.repeat(frozen.nodes, frozen.degrees()), frozen.indices)
+
+        return self._components
+
+    def component_sizes(self):
+        if self._components is None:
+            return self.freeze().component_sizes()
+        return self._components.component_sizes()
+
+    def freeze(self):
+        # CSR snapshot, rebuilt only after a mutation
+        if self._frozen is None or self._frozen[0] != self.version:
+            self._frozen = (self.version, FrozenGraph.from_graph(self))
+        return self._frozen[1]
+
+    def reverse(self):
+        # freeze() with every edge reversed (in-neighbours in CSR arrays),
+        # built in bulk on first use and rebuilt after a mutation
+        if self._reverse is None or self._reverse[0] != self.version:
+            self._reverse = (self.version, self.freeze().reverse())
+        return self._reverse[1]
+
+    def to_sparse(self):
+        # Adjacency matrix of freeze(), rebuilt after a mutation
+        if self._sparse is None or self._sparse[0] != self.version:
+            self._sparse = (self.version, self.freeze().to_sparse())
+        return self._sparse[1]
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        # Mutable copy of a snapshot written by to_buffer()
+        return FrozenGraph.from_buffer(buffer).to_graph(graph_cls=cls)
+
+    def to_buffer(self, buffer=None):
+        return self.freeze().to_buffer(buffer)
+
+
+class FrozenGraph:
+    # Immutable CSR snapshot of a graph. Nodes are contiguous integer ids,
+    # original labels are kept in `labels` (labels[node_id] -> label).
+    version = 0  # Never changes, see Graph.version
+
+    def __init__(self, indptr, indices, labels=None, edge_type=EdgeType.UNDIRECTED):
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_type = edge_type
+        self.nodes = range(len(indptr) - 1)
+        self.labels = labels if labels is not None else self.nodes
+        self._label_ids = None
+        self._degree_cache = {}
+        self._sparse = None
+        self._reverse = None
+
+    @classmethod
+    def from_graph(cls, graph):
+        # Intern labels in insertion order of the adjacency list
+        labels = list(graph.adjacency_list)
+        labels.extend(node for node in graph.nodes if node not in graph.adjacency_list)
+        label_ids = {label: node_id for node_id, label in enumerate(labels)}
+
+        degrees = [len(graph.adjacency_list.get(label, [])) for label in labels]
+        indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+
+        indices = np.fromiter((label_ids[neigh]
+                               for label in labels
+                               for neigh in graph.adjacency_list.get(label, [])),
+                              dtype=node_id_dtype(len(labels)), count=int(indptr[-1]))
+
+        frozen = cls(indptr, indices, labels, graph.edge_type)
+        frozen._label_ids = label_ids
+        return frozen
+
+    @classmethod
+    def from_edges(cls, src, dest, labels=None, num_nodes=None, edge_type=EdgeType.UNDIRECTED):
+        if num_nodes is None:
+            num_nodes = len(labels) if labels is not None else 0
+            if len(src) > 0:
+                num_nodes = max(num_nodes, int(src.max()) + 1, int(dest.max()) + 1)
+
+        if edge_type is EdgeType.UNDIRECTED:
+            # Interleave both directions so neighbours keep the input order
+            src, dest = np.stack([src, dest], axis=1).ravel(), np.stack([dest, src], axis=1).ravel()
+
+        return cls.from_adjacency_entries(src, dest, labels, num_nodes, edge_type)
+
+    @classmethod
+    def from_adjacency_entries(cls, src, dest, labels=None, num_nodes=None,
+                               edge_type=EdgeType.UNDIRECTED):
+        # `dest` is appended to the neighbours of `src` as is, no mirroring
+        if num_nodes is None:
+            num_nodes = len(labels) if labels is not None else 0
+            if len(src) > 0:
+                num_nodes = max(num_nodes, int(src.max()) + 1, int(dest.max()) + 1)
+
+        # Stable counting sort by source node
+        order = np.argsort(src, kind='stable')
+        indices = dest[order].astype(node_id_dtype(num_nodes), copy=False)
+        del order
+
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=indptr[1:])
+
+        return cls(indptr, indices, labels, edge_type)
+
+    @classmethod
+    def create_from_edge_list(cls, file_path, header_size, edge_type=EdgeType.UNDIRECTED,
+                              chunk_size=CHUNK_SIZE):
+        src, dest, labels = read_edge_list(file_path, header_size, chunk_size)
+        return cls.from_edges(src, dest, labels, edge_type=edge_type)
+
+    def __getitem__(self, node):
+        return self.get_neighbours(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get_neighbours(self, node):
+        # Zero-copy view into the neighbours array
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def get_in_neighbours(self, node):
+        return self.reverse().get_neighbours(node)
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def degree(self, node):
+        if self.edge_type is EdgeType.DIRECTED:
+            return int(self.degree_vector('in')[node]), int(self.indptr[node + 1] - self.indptr[node])
+
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def degree_vector(self, direction='out'):
+        assert direction in ['in', 'out']
+        key = ('vector', direction)
+        if key not in self._degree_cache:
+            if self.edge_type is EdgeType.DIRECTED and direction == 'in':
+                self._degree_cache[key] = np.bincount(self.indices, minlength=self.num_nodes)
+            else:
+                self._degree_cache[key] = self.degrees()
+        return self._degree_cache[key]
+
+    def degree_histogram(self, direction='out'):
+        key = ('histogram', direction)
+        if key not in self._degree_cache:
+            self._degree_cache[key] = np.bincount(self.degree_vector(direction))
+        return self._degree_cache[key]
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        # Number of stored (oriented) adjacency entries
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+    def components(self):
+        components = DisjointSet(self.num_nodes)
+        components.union_edges(np.repeat(self.nodes, self.degrees()), self.indices)
+        return components
+
+    def component_sizes(self):
+        return self.components().component_sizes()
+
+    def subgraph(self, nodes):
+        # Induced subgraph on the sorted node ids `nodes`, renumbered 0 .. k-1
+        nodes = np.asarray(nodes, dtype=np.int64)
+        new_ids = np.full(self.num_nodes, -1, dtype=np.int64)
+        new_ids[nodes] = np.arange(len(nodes))
+
+        src = new_ids[np.repeat(self.nodes, self.degrees())]
+        dest = new_ids[self.indices]
+        kept = (src >= 0) & (dest >= 0)
+        labels = [self.labels[node] for node in nodes.tolist()]
+
+        return type(self).from_adjacency_entries(src[kept], dest[kept], labels, len(nodes), self.edge_type)
+
+    def label(self, node):
+        return self.labels[node]
+
+    def node_id(self, label):
+        if self._label_ids is None:
+            self._label_ids = {label: node_id for node_id, label in enumerate(self.labels)}
+        return self._label_ids[label]
+
+    def freeze(self):
+        return self
+
+    def reverse(self):
+        # Transposed snapshot with the same ids and labels, cached; its
+        # neighbours are the in-neighbours of this graph
+        if self.edge_type is not EdgeType.DIRECTED:
+            return self
+        if self._reverse is None:
+            src = np.repeat(np.arange(self.num_nodes, dtype=self.indices.dtype), self.degrees())
+            self._reverse = type(self).from_adjacency_entries(self.indices, src, self.labels, self.num_nodes,
+                                                              self.edge_type)
+            self._reverse._label_ids = self._label_ids
+            self._reverse._reverse = self
+        return self._reverse
+
+    def to_sparse(self):
+        # scipy.sparse CSR adjacency matrix, A[u, v] = times v appears among
+        # the neighbours of u (int8 unless an edge repeats more than 127 times)
+        if self._sparse is None:
+            from scipy import sparse  # Only needed by the matrix backend
+
+            shape = (self.num_nodes, self.num_nodes)
+            data = np.ones(self.num_edges, dtype=np.int32)
+            matrix = sparse.csr_matrix((data, self.indices, self.indptr), shape=shape, copy=True)
+            matrix.sum_duplicates()
+            if matrix.nnz == 0 or matrix.data.max() <= np.iinfo(np.int8).max:
+                matrix.data = matrix.data.astype(np.int8)
+
+            self._sparse = matrix
+        return self._sparse
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        # Zero-copy: the arrays are read-only views into `buffer`, see snapshot
+        from snapshot import attach_snapshot
+
+        return attach_snapshot(buffer, graph_cls=cls)
+
+    def to_buffer(self, buffer=None):
+        # Flat snapshot (header, label table, offsets, neighbours) written
+        # into `buffer`, or into a new bytearray
+        from snapshot import dump_snapshot
+
+        return dump_snapshot(self, buffer)
+
+    def to_graph(self, graph_cls=Graph, simple=False):
+        # simple drops self-loops and parallel edges, keeping the first copy
+        labels = self.labels.tolist() if isinstance(self.labels, np.ndarray) else self.labels
+        labels = np.fromiter(labels, dtype=object, count=self.num_nodes)
+
+        graph = graph_cls(self.edge_type, simple=simple)
+
+        # Translate all neighbour ids to labels at once, then slice per node
+        neighbour_labels = labels[self.indices].tolist()
+        indptr = self.indptr.tolist()
+
+        adjacency_list = {}
+        for node in self.nodes:
+            adjacency_list[labels[node]] = neighbour_labels[indptr[node]:indptr[node + 1]]
+
+        graph.nodes.update(adjacency_list)
+        graph.adjacency_list = adjacency_list  # Also counts the degrees
+
+        return graph
+
+
+def edge_columns(edges):
+    # (src, dest) label lists of an (m, 2) array or an iterable of pairs
+    if isinstance(edges, np.ndarray):
+        edges = edges.reshape(-1, 2)
+        return edges[:, 0].tolist(), edges[:, 1].tolist()
+
+    pairs = list(edges)
+    return [u for u, _ in pairs], [v for _, v in pairs]
+
+
+def frozen_node_names(graph, frozen):
+    # Names `graph` uses for the nodes of its frozen snapshot, indexed by id
+    return frozen.nodes if frozen is graph else frozen.labels
+
+
+def node_id_dtype(num_nodes):
+    return np.int32 if num_nodes < np.iinfo(np.int32).max else np.int64
@@ -0,0 +1,117 @@
+import numpy as np
+
+from collections import namedtuple
+
+
+CHUNK_BYTES = 1 << 26  # Bound on the neighbour registers gathered at once
+
+NeighbourhoodFunction = namedtuple('NeighbourhoodFunction', [
+    'neighbourhood',  # N(t): estimated ordered pairs (u, v) with d(u, v) <= t
+    'distance_distribution',  # Estimated pairs at distance exactly t, t >= 1
+    'average_distance',
+    'effective_diameter',  # 90th percentile of the distance distribution
+    'diameter',  # Iterations until no counter changed, only a lower bound of the diameter
+])
+
+
+def _splitmix64(values):
+    values = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _hll_alpha(num_registers):
+    return {16: 0.673, 32: 0.697, 64: 0.709}.get(num_registers, 0.7213 / (1 + 1.079 / num_registers))
+
+
+def estimate_cardinalities(registers):
+    # HyperLogLog estimate for every row of registers, with the small range correction
+    num_registers = registers.shape[1]
+    raw = _hll_alpha(num_registers) * num_registers ** 2 / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+
+    zeros = (registers == 0).sum(axis=1)
+    small = (raw <= 2.5 * num_registers) & (zeros > 0)
+    raw[small] = num_registers * np.log(num_registers / zeros[small])
+
+    return raw
+
+
+def init_registers(num_nodes, log2m, seed=0):
+    # Counter of node v starts as the singleton {v}
+    hashes = _splitmix64(np.arange(num_nodes, dtype=np.uint64) ^ np.uint64(seed))
+    bucket = (hashes & np.uint64((1 << log2m) - 1)).astype(np.int64)
+    rest = hashes >> np.uint64(log2m)
+
+    # Register value = position of the lowest set bit of the remaining hash
+    lowest_bit = (rest & (~rest + np.uint64(1))).astype(np.float64)
+    rank = np.full(num_nodes, 64 - log2m + 1, dtype=np.uint8)
+    nonzero = rest != 0
+    rank[nonzero] = np.log2(lowest_bit[nonzero]).astype(np.uint8) + 1
+
+    registers = np.zeros((num_nodes, 1 << log2m), dtype=np.uint8)
+    registers[np.arange(num_nodes), bucket] = rank
+    return registers
+
+
+def _union_neighbours(frozen, registers, out):
+    # out[v] = max(registers[v], max of registers[u] over neighbours u)
+    indptr, indices = np.asarray(frozen.indptr), np.asarray(frozen.indices)
+    np.copyto(out, registers)
+
+    edges_per_chunk = max(1, CHUNK_BYTES // registers.shape[1])
+    start = 0
+    while start < frozen.num_nodes:
+        # Nodes whose edges fit the chunk (at least one node per chunk)
+        end = int(np.searchsorted(indptr, indptr[start] + edges_per_chunk, side='right')) - 1
+        end = min(max(end, start + 1), frozen.num_nodes)
+
+        nodes = np.arange(start, end)
+        nodes = nodes[indptr[nodes + 1] > indptr[nodes]]  # reduceat needs non-empty segments
+        if len(nodes) > 0:
+            first_edge = indptr[start]
+            gathered = registers[indices[first_edge:indptr[end]]]
+            maxima = np.maximum.reduceat(gathered, indptr[nodes] - first_edge, axis=0)
+            np.maximum(out[nodes], maxima, out=maxima)
+            out[nodes] = maxima
+
+        start = end
+
+
+def hyperanf(graph, log2m=6, max_iterations=None, seed=0):
+    # Approximate neighbourhood function (Boldi, Rosa & Vigna, 2011). Every
+    # node keeps a HyperLogLog counter of 2**log2m one-byte registers (memory
+    # 2 * n * 2**log2m bytes, relative error about 1.04 / sqrt(2**log2m));
+    # iteration t merges the counters of the neighbours, after which each
+    # counter holds the ball of radius t around its node.
+    frozen = graph.freeze()
+    registers = init_registers(frozen.num_nodes, log2m, seed)
+    merged = np.empty_like(registers)
+
+    neighbourhood = [estimate_cardinalities(registers).sum()]
+    while max_iterations is None or len(neighbourhood) <= max_iterations:
+        _union_neighbours(frozen, registers, merged)
+        if np.array_equal(merged, registers):
+            break
+
+        registers, merged = merged, registers
+        # Counters only grow, keep the estimate monotone as well
+        neighbourhood.append(max(neighbourhood[-1], estimate_cardinalities(registers).sum()))
+
+    neighbourhood = np.array(neighbourhood)
+    distribution = np.diff(neighbourhood)
+    reachable_pairs = neighbourhood[-1] - neighbourhood[0]
+    distances = np.arange(1, len(neighbourhood))
+
+    if reachable_pairs > 0:
+        average_distance = (distances * distribution).sum() / reachable_pairs
+
+        # Interpolate the distance at which 90% of the reachable pairs are covered
+        target = neighbourhood[0] + 0.9 * reachable_pairs
+        t = int(np.searchsorted(neighbourhood, target))
+        effective_diameter = t - 1 + (target - neighbourhood[t - 1]) / (neighbourhood[t] - neighbourhood[t - 1])
+    else:
+        average_distance, effective_diameter = np.nan, 0.0
+
+    return NeighbourhoodFunction(neighbourhood, distribution, average_distance,
+                                 effective_diameter, len(neighbourhood) - 1)
@@ -0,0 +1,98 @@
+import json
+import time
+
+from contextlib import contextmanager
+
+
+class Profile:
+    # Counters, phase timings and progress of the instrumented algorithms.
+    # Nothing is recorded unless a Profile is active (see `profiling`); the
+    # algorithms check `active()` once per phase, source or batch, never per
+    # edge, so leaving the hooks in costs next to nothing.
+    def __init__(self, progress=None, progress_interval=1.0):
+        self.counters = {}
+        self.phases = {}  # name -> {'calls': n, 'seconds': s}
+        self.progress = progress  # progress(task, done, total), e.g. to print or log
+        self.progress_interval = progress_interval  # Seconds between two reports of a task
+        self._last_report = {}
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count_since(self, prefix, before, after):
+        # Counter deltas between two snapshots, e.g. of FrontierBFS.counters()
+        for name, value in after.items():
+            self.count(f'{prefix}.{name}', value - before.get(name, 0))
+
+    def add_phase(self, name, seconds, calls=1):
+        stats = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        stats['calls'] += calls
+        stats['seconds'] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def report_progress(self, task, done, total):
+        # Throttled to one report per progress_interval, the final one always goes through
+        if self.progress is None:
+            return
+
+        now = time.monotonic()
+        last = self._last_report.get(task)
+        if done < total and last is not None and now - last < self.progress_interval:
+            return
+
+        self._last_report[task] = now
+        self.progress(task, done, total)
+
+    def merge(self, other):
+        # Add the counters and phases of another profile (or of its to_dict())
+        other = other.to_dict() if isinstance(other, Profile) else other
+        for name, amount in other['counters'].items():
+            self.count(name, amount)
+        for name, stats in other['phases'].items():
+            self.add_phase(name, stats['seconds'], stats['calls'])
+
+    def to_dict(self):
+        return {'counters': dict(self.counters), 'phases': {name: dict(stats) for name, stats in self.phases.items()}}
+
+    def dump(self, file_path):
+        with open(file_path, 'w') as profile_file:
+            json.dump(self.to_dict(), profile_file, indent=2)
+
+
+_active = None
+
+
+def active():
+    # Profile receiving the counters, None when instrumentation is off
+    return _active
+
+
+@contextmanager
+def profiling(profile=None, progress=None, progress_interval=1.0):
+    # with profiling() as profile: count_triangles(graph)
+    global _active
+    profile = profile if profile is not None else Profile(progress, progress_interval)
+
+    previous, _active = _active, profile
+    try:
+        yield profile
+    finally:
+        _active = previous
+
+
+@contextmanager
+def phase(name):
+    # Times the block in the active profile, does nothing otherwise
+    if _active is None:
+        yield
+        return
+
+    with _active.phase(name):
+        yield
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from graph import FrozenGraph
+from instrumentation import Profile, active, profiling
+from traversal import FrontierBFS, TraversalEngine
+
+
+CHUNKS_PER_JOB = 4  # More chunks than workers evens out unbalanced sources
+
+
+class SharedArrays:
+    # Copies a dict of read-only NumPy arrays into shared memory blocks once;
+    # workers attach to the blocks by name instead of unpickling the arrays
+    def __init__(self, arrays):
+        self._blocks = []
+        self.spec = {}
+
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_arrays(spec, blocks):
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)  # Keep the mapping alive as long as the arrays
+
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+
+    return arrays
+
+
+# Per-worker state, built once by the pool initializer
+_worker_blocks = []
+_worker_state = None
+_worker_profiled = False
+
+
+def _init_worker(spec, setup, profiled):
+    global _worker_state, _worker_profiled
+    _worker_state = setup(attach_arrays(spec, _worker_blocks))
+    _worker_profiled = profiled
+
+
+def _run_chunk(func, chunk):
+    if not _worker_profiled:
+        return func(_worker_state, chunk)
+
+    # Counters of the chunk travel back with its result
+    with profiling(Profile()) as profile:
+        result = func(_worker_state, chunk)
+    return result, profile.to_dict()
+
+
+def resolve_jobs(n_jobs):
+    # n_jobs = -1 uses every core, like joblib/scikit-learn
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def split_chunks(items, n_jobs):
+    # Contiguous chunks, so concatenating the results keeps the input order
+    num_chunks = max(1, min(len(items), resolve_jobs(n_jobs) * CHUNKS_PER_JOB))
+    bounds = np.linspace(0, len(items), num_chunks + 1).astype(int)
+    return [items[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def parallel_map(arrays, setup, func, chunks, n_jobs=1, task=None):
+    # Runs func(setup(arrays), chunk) for every chunk and returns the results
+    # in chunk order. setup and func must be module-level (picklable) callables.
+    # With a profile active, finished chunks are reported as progress of `task`
+    # (funcs may report finer progress within their chunk).
+    n_jobs = resolve_jobs(n_jobs)
+    profile = active()
+
+    if n_jobs == 1 or len(chunks) <= 1:
+        state = setup(arrays)
+        if profile is None or task is None:
+            return [func(state, chunk) for chunk in chunks]
+
+        results = []
+        for chunk in chunks:
+            results.append(func(state, chunk))
+            profile.report_progress(task, len(results), len(chunks))
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor  # Not needed by serial callers
+
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), initializer=_init_worker,
+                                 initargs=(shared.spec, setup, profile is not None)) as pool:
+            if profile is None:
+                return list(pool.map(_run_chunk, [func] * len(chunks), chunks))
+
+            results = []
+            for result, chunk_profile in pool.map(_run_chunk, [func] * len(chunks), chunks):
+                results.append(result)
+                profile.merge(chunk_profile)
+                if task is not None:
+                    profile.report_progress(task, len(results), len(chunks))
+            return results
+
+
+def graph_arrays(frozen):
+    return {'indptr': frozen.indptr, 'indices': frozen.indices}
+
+
+def attach_graph(edge_type, arrays):
+    return FrozenGraph(arrays['indptr'], arrays['indices'], edge_type=edge_type)
+
+
+def attach_traversal_engine(edge_type, arrays):
+    return TraversalEngine(attach_graph(edge_type, arrays))
+
+
+def attach_frontier_bfs(edge_type, arrays):
+    return FrontierBFS(attach_graph(edge_type, arrays))
@@ -0,0 +1,85 @@
+import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+import pandas as pd
+
+from matplotlib.ticker import MaxNLocator
+
+
+# Figures for the result objects of analysis / advanced_algorithms. This is
+# the only module importing matplotlib and pandas; with `path` the figure is
+# saved and closed instead of shown, which works without a display.
+
+
+def _finish(fig, path):
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
+
+
+def plot_component_distribution(result, name='', path=None):
+    fig = plt.figure()
+
+    # Plot count for unique sizes
+    cc_sizes = pd.Series(result.counts, index=result.sizes)
+    cc_sizes.plot(kind='bar', rot=0)
+
+    plt.title(f'Connected components size distribution\n{name}')
+    plt.gca().yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    BIG = mpatches.Patch(color='green', label='Big component')
+    MEH = mpatches.Patch(color='red', label='Not big enough')
+    plt.legend(handles=[BIG, MEH])
+
+    if result.big_component:
+        plt.gca().get_xticklabels()[-1].set_color("green")
+    else:
+        plt.gca().get_xticklabels()[-1].set_color("red")
+
+    plt.xlabel('Size')
+    plt.ylabel('Count')
+
+    plt.tight_layout()
+
+    _finish(fig, path)
+
+
+def plot_degree_distribution(result, name='', path=None):
+    fig = plt.figure(figsize=(17, 6.5), dpi=100)
+    ax = fig.add_subplot(111, frame_on=False)
+    ax.tick_params(labelcolor="none", bottom=False, left=False)
+
+    ax1 = fig.add_subplot(121)
+    ax2 = fig.add_subplot(122)
+
+    degree_count = pd.Series(result.counts, index=result.degrees)
+    degree_count.plot(kind='line', ax=ax1)
+    degree_count.plot(kind='line', loglog=True, ax=ax2)
+
+    ax.set_xlabel('Degree')
+    ax.set_ylabel('Count')
+
+    ax1.set_title('Linear scale')
+    ax2.set_title('Logarithmic scale')
+    ax.set_title(f'Scale-free analysis: Degree distribution\n{name}\n\n')
+
+    _finish(fig, path)
+
+
+def plot_clustering_distribution(result, name='', path=None):
+    fig = plt.figure()
+
+    # Make bar plot for coefficient count
+    coeffs = pd.Series(result.counts, index=result.values)
+    coeffs.plot(kind='bar', rot=45, width=1.3)
+
+    plt.title(f'Clustering coefficients distribution\n{name}')
+    plt.gca().yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    plt.xlabel('Clustering coefficient')
+    plt.ylabel('Count')
+
+    plt.tight_layout()
+
+    _finish(fig, path)
@@ -0,0 +1,226 @@
+import sys
+import numpy as np
+
+from collections import namedtuple
+from scipy import optimize, special
+
+from instrumentation import phase
+from parallel import parallel_map, resolve_jobs, split_chunks
+
+
+# Discrete power-law fits on the degree histogram (Clauset, Shalizi and
+# Newman 2009). Every statistic only needs the (degree, count) pairs, so the
+# cost depends on the number of distinct degrees instead of the number of nodes.
+
+MIN_ALPHA = 1.0 + 1e-6  # The discrete power law needs alpha > 1
+MAX_ALPHA = 3.0  # Same default bound as powerlaw, scale-free degree exponents are below 3
+GOLDEN_STEPS = 80  # Golden-section steps, enough for double precision
+MIN_TAIL = 10  # Smallest tail (nodes with degree >= xmin) tried by the xmin search
+CELLS_PER_CHUNK = 1 << 20  # Bound on the (xmin, degree) KS matrix computed at once
+MIN_LOG_LIKELIHOOD = sys.float_info.min_10_exp * np.log(10)  # Floor for zero probabilities, like powerlaw
+
+PowerLawFit = namedtuple('PowerLawFit', [
+    'alpha',
+    'xmin',
+    'ks_distance',  # Between the tail and the fitted distribution
+    'num_tail',  # Nodes with degree >= xmin
+    'at_bound',  # Alpha stopped at max_alpha, the tail decays at least that fast
+])
+
+LikelihoodRatio = namedtuple('LikelihoodRatio', [
+    'R',  # Log-likelihood ratio, > 0 favours the power law
+    'p',  # Vuong significance of the sign of R
+])
+
+
+def histogram_support(degree_histogram, xmin=1):
+    # Distinct degrees >= xmin and their counts
+    degree_histogram = np.asarray(degree_histogram)
+    degrees = np.flatnonzero(degree_histogram)
+    degrees = degrees[degrees >= max(xmin, 1)]
+    return degrees, degree_histogram[degrees].astype(np.float64)
+
+
+def _tail_sums(degrees, counts):
+    # Tail size and sum of log degrees of the degrees >= degrees[i], with a
+    # trailing 0 for an empty tail
+    num_tail = np.append(np.cumsum(counts[::-1])[::-1], 0.0)
+    log_sum = np.append(np.cumsum((counts * np.log(degrees))[::-1])[::-1], 0.0)
+    return num_tail, log_sum
+
+
+def _log_likelihood(alpha, xmin, num_tail, log_sum):
+    # Discrete power law p(d) = d^-alpha / zeta(alpha, xmin)
+    return -alpha * log_sum - num_tail * np.log(special.zeta(alpha, xmin))
+
+
+def power_law_alphas(xmins, num_tail, log_sum, max_alpha=MAX_ALPHA):
+    # Maximum likelihood alpha for every xmin at once. The log-likelihood is
+    # concave in alpha, so a vectorized golden-section search finds it.
+    ratio = (np.sqrt(5) - 1) / 2
+    lo = np.full(len(xmins), MIN_ALPHA)
+    hi = np.full(len(xmins), float(max_alpha))
+
+    a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    fa, fb = _log_likelihood(a, xmins, num_tail, log_sum), _log_likelihood(b, xmins, num_tail, log_sum)
+    for _ in range(GOLDEN_STEPS):
+        left = fa > fb  # Maximum in [lo, b]
+        hi = np.where(left, b, hi)
+        lo = np.where(left, lo, a)
+
+        a_new, b_new = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+        f_new = _log_likelihood(np.where(left, a_new, b_new), xmins, num_tail, log_sum)
+        a, b = np.where(left, a_new, b), np.where(left, a, b_new)
+        fa, fb = np.where(left, f_new, fb), np.where(left, fa, f_new)
+
+    return (lo + hi) / 2
+
+
+def _ks_distances(histogram, task):
+    # Power-law fit and KS distance of the tail for a chunk of candidate xmins
+    xmins, max_alpha = task
+    degrees, counts = histogram['degrees'], histogram['counts']
+    num_tail, log_sum = _tail_sums(degrees, counts)
+    first = np.searchsorted(degrees, xmins)
+    xmins = np.asarray(xmins, dtype=np.float64)
+    alphas = power_law_alphas(xmins, num_tail[first], log_sum[first], max_alpha)
+
+    # One row per candidate; degrees below its xmin are masked out
+    in_tail = degrees[None, :] >= xmins[:, None]
+    tail_counts = np.where(in_tail, counts[None, :], 0.0)
+    empirical = np.cumsum(tail_counts, axis=1) / num_tail[first][:, None]
+
+    with np.errstate(invalid='ignore'):
+        survival = special.zeta(alphas[:, None], degrees[None, :] + 1.0) / special.zeta(alphas, xmins)[:, None]
+    distances = np.where(in_tail, np.abs(empirical - (1 - survival)), 0.0).max(axis=1)
+
+    return alphas, distances
+
+
+def _attach_histogram(arrays):
+    return arrays
+
+
+def fit_power_law(degree_histogram, xmin=None, n_jobs=1, min_tail=MIN_TAIL, max_alpha=MAX_ALPHA):
+    # Fit with the given xmin, or with the xmin minimizing the KS distance
+    # (every distinct degree whose tail has at least min_tail nodes)
+    degrees, counts = histogram_support(degree_histogram, xmin or 1)
+    assert len(degrees) > 0, 'No degrees to fit'
+    histogram = {'degrees': degrees, 'counts': counts}
+    num_tail, _ = _tail_sums(degrees, counts)
+
+    if xmin is not None:
+        (alpha,), (distance,) = _ks_distances(histogram, (np.array([xmin]), max_alpha))
+        return PowerLawFit(alpha, xmin, distance, int(num_tail[0]), bool(alpha >= max_alpha - 1e-6))
+
+    candidates = degrees[num_tail[:-1] >= min_tail]
+    if len(candidates) == 0:
+        candidates = degrees[:1]  # Tiny sample, only the smallest degree
+
+    # Chunks bound the KS matrices; workers only need the two small arrays
+    chunk_size = max(1, CELLS_PER_CHUNK // len(degrees))
+    n_jobs = resolve_jobs(n_jobs)
+    chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+    if n_jobs > 1 and len(chunks) < n_jobs:
+        chunks = split_chunks(candidates, n_jobs)
+    tasks = [(chunk, max_alpha) for chunk in chunks]
+
+    with phase('power_law.xmin_search'):
+        results = parallel_map(histogram, _attach_histogram, _ks_distances, tasks, n_jobs, task='power_law')
+    alphas = np.concatenate([alpha for alpha, _ in results])
+    distances = np.concatenate([distance for _, distance in results])
+
+    # Fits stuck at the alpha bound are not trusted, like in powerlaw; when
+    # every fit is, the best of them is returned with at_bound set
+    at_bound = alphas >= max_alpha - 1e-6
+    if not at_bound.all():
+        distances = np.where(at_bound, np.inf, distances)
+    best = int(np.argmin(distances))
+    return PowerLawFit(alphas[best], int(candidates[best]), distances[best],
+                       int(num_tail[np.searchsorted(degrees, candidates[best])]), bool(at_bound[best]))
+
+
+def _power_law_log_pmf(degrees, fit):
+    return -fit.alpha * np.log(degrees) - np.log(special.zeta(fit.alpha, fit.xmin))
+
+
+def _lognormal_log_pmf(degrees, xmin, mu, sigma):
+    # Mass of [d - 0.5, d + 0.5] under a lognormal truncated at xmin - 0.5,
+    # the 'round' discretization of powerlaw
+    upper = special.ndtr((mu - np.log(degrees - 0.5)) / sigma)
+    lower = special.ndtr((mu - np.log(degrees + 0.5)) / sigma)
+    norm = special.ndtr((mu - np.log(xmin - 0.5)) / sigma)
+    with np.errstate(divide='ignore'):
+        return np.maximum(np.log(upper - lower) - np.log(norm), MIN_LOG_LIKELIHOOD)
+
+
+def fit_lognormal(degrees, counts, xmin):
+    # Maximum likelihood (mu, sigma), sigma optimized in log space to stay positive
+    log_degrees = np.log(degrees)
+    mean = np.average(log_degrees, weights=counts)
+    std = np.sqrt(np.average((log_degrees - mean) ** 2, weights=counts))
+
+    def negative_log_likelihood(params):
+        return -np.dot(counts, _lognormal_log_pmf(degrees, xmin, params[0], np.exp(params[1])))
+
+    result = optimize.minimize(negative_log_likelihood, [mean, np.log(max(std, 1e-3))], method='Nelder-Mead',
+                               options={'xatol': 1e-6, 'fatol': 1e-8})
+    return result.x[0], np.exp(result.x[1])
+
+
+def _exponential_log_pmf(degrees, xmin, rate):
+    # p(d) = (1 - e^-rate) e^(-rate (d - xmin))
+    return np.log(-np.expm1(-rate)) - rate * (degrees - xmin)
+
+
+def fit_exponential(degrees, counts, xmin):
+    # Closed form maximum likelihood rate of the discrete exponential
+    excess = np.average(degrees, weights=counts) - xmin
+    return np.log1p(1 / excess) if excess > 0 else np.inf
+
+
+def loglikelihood_ratio(log_pmf1, log_pmf2, counts):
+    # Vuong test on the per-degree log-likelihoods, weighted by the counts
+    num_tail = counts.sum()
+    difference = log_pmf1 - log_pmf2
+    R = np.dot(counts, difference)
+    variance = np.dot(counts, (difference - R / num_tail) ** 2) / num_tail
+
+    if variance == 0:
+        return LikelihoodRatio(R, 1.0)
+    return LikelihoodRatio(R, special.erfc(abs(R) / np.sqrt(2 * num_tail * variance)))
+
+
+def compare_alternatives(degree_histogram, fit):
+    # Likelihood ratio tests of the power-law fit against a lognormal and an exponential tail
+    degrees, counts = histogram_support(degree_histogram, fit.xmin)
+    power_law = _power_law_log_pmf(degrees, fit)
+
+    mu, sigma = fit_lognormal(degrees, counts, fit.xmin)
+    rate = fit_exponential(degrees, counts, fit.xmin)
+    if np.isinf(rate):
+        exponential = np.zeros(len(degrees))  # Every tail degree equals xmin
+    else:
+        exponential = _exponential_log_pmf(degrees, fit.xmin, rate)
+
+    return {
+        'lognormal': loglikelihood_ratio(power_law, _lognormal_log_pmf(degrees, fit.xmin, mu, sigma), counts),
+        'exponential': loglikelihood_ratio(power_law, exponential, counts),
+    }
+
+
+def main():
+    from synthetic_data import SyntheticGraphGenerator
+
+    graph = SyntheticGraphGenerator.create_random_edge_graph(5000, 0.001, seed=0, frozen=True)
+    histogram = graph.degree_histogram()
+
+    for xmin in [1, None]:
+        fit = fit_power_law(histogram, xmin)
+        print(fit)
+        for name, ratio in compare_alternatives(histogram, fit).items():
+            print(f'    vs {name}: R = {ratio.R:.3f}, p = {ratio.p:.3g}')
+
+
+if __name__ == '__main__':
+    main()
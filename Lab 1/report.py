@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from advanced_algorithms import clustering_distribution
+from analysis import component_distribution, degree_distribution, diameter_type, fit_scale_free, girth_type
+from data import DATASETS, load_dataset
+from graph import EdgeType, FrozenGraph
+from session import GraphAnalysis
+from synthetic_data import SyntheticGraphGenerator
+
+
+# Same synthetic networks as the notebook
+SYNTHETIC_GRAPHS = {
+    'random': lambda seed: SyntheticGraphGenerator.create_random_edge_graph(5000, 0.001, seed=seed, frozen=True),
+    'grid': lambda seed: SyntheticGraphGenerator.create_grid_graph(65, 75, frozen=True),
+    'kleinberg': lambda seed: SyntheticGraphGenerator.create_kleinberg_graph(65, 75, seed=seed, frozen=True),
+    'tree': lambda seed: SyntheticGraphGenerator.create_tree_graph(5000, seed=seed, frozen=True),
+    'split': lambda seed: SyntheticGraphGenerator.create_split_graph(250, 4750, prob=0.0001),
+}
+
+# Scalar metrics of every graph, one row of the summary table
+SUMMARY_COLUMNS = ['name', 'num_nodes', 'num_edges', 'big_component', 'is_scale_free', 'alpha', 'diameter',
+                   'diameter_type', 'girth_type', 'triangles', 'average_clustering', 'average_distance',
+                   'distance_label', 'seconds']
+
+
+def to_json(value):
+    # Plain JSON types; non-finite floats (e.g. the diameter of a
+    # disconnected graph) become null
+    if hasattr(value, '_asdict'):
+        return to_json(value._asdict())
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def analyse_graph(graph, name, n_jobs=1, seed=None, num_samples=20, num_distance_samples=1000):
+    # The analysis.main suite on one graph, without plotting
+    start = time.perf_counter()
+    session = GraphAnalysis(graph, n_jobs=n_jobs)
+    frozen = session.frozen
+    num_nodes = frozen.num_nodes
+
+    diameter = np.array(session.sample_diameters(num_samples, seed)).mean()
+    girth, _ = session.girth(threshold=4)
+    triangles, _ = session.triangles()
+    coefficients = session.clustering_coefficients()
+    average_distance, distance_label = session.average_distance(num_distance_samples, seed, backend='sparse')
+
+    num_edges = frozen.num_edges
+    if frozen.edge_type is EdgeType.UNDIRECTED:
+        num_edges //= 2
+
+    return {
+        'name': name,
+        'num_nodes': num_nodes,
+        'num_edges': num_edges,
+        'components': component_distribution(session.component_sizes(), num_nodes),
+        'degrees': degree_distribution(session.degree_histogram()),
+        'scale_free': fit_scale_free(session.degree_histogram(), n_jobs=n_jobs),
+        'diameter': diameter,
+        'diameter_type': diameter_type(diameter, num_nodes),
+        'girth_type': girth_type(girth),
+        'triangles': triangles,
+        'clustering': clustering_distribution(coefficients),
+        'average_clustering': coefficients.mean() if num_nodes > 0 else 0.0,
+        'average_distance': average_distance,
+        'distance_label': distance_label,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def summary_row(report):
+    row = dict(report, big_component=report['components'].big_component)
+    row['is_scale_free'], row['alpha'] = report['scale_free']
+    return to_json({key: row[key] for key in SUMMARY_COLUMNS})
+
+
+def save_plots(report, output_path):
+    import matplotlib
+    matplotlib.use('Agg')  # Never needs a display
+    import plotting
+
+    name = report['name']
+    plotting.plot_component_distribution(report['components'], name,
+                                         os.path.join(output_path, f'{name}_components.png'))
+    plotting.plot_degree_distribution(report['degrees'], name, os.path.join(output_path, f'{name}_degrees.png'))
+    plotting.plot_clustering_distribution(report['clustering'], name,
+                                          os.path.join(output_path, f'{name}_clustering.png'))
+
+
+def iter_graphs(args):
+    # (name, graph) for every graph requested on the command line
+    for ds in DATASETS:
+        if ds['name'] in args.dataset:
+            yield ds['name'], load_dataset(ds, args.offline, args.archives_path)
+
+    edge_type = EdgeType.DIRECTED if args.directed else EdgeType.UNDIRECTED
+    for file_path in args.edge_list:
+        name = os.path.basename(file_path).split('.')[0]
+        yield name, FrozenGraph.create_from_edge_list(file_path, args.header_size, edge_type)
+
+    for kind in args.synthetic:
+        yield kind, SYNTHETIC_GRAPHS[kind](args.seed)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Headless analysis reports for many graphs.')
+    parser.add_argument('--dataset', action='append', default=[], choices=[ds['name'] for ds in DATASETS])
+    parser.add_argument('--edge-list', action='append', default=[], help='Whitespace separated edge list file')
+    parser.add_argument('--header-size', type=int, default=0, help='Lines to skip in every --edge-list')
+    parser.add_argument('--directed', action='store_true', help='Read --edge-list files as directed')
+    parser.add_argument('--synthetic', action='append', default=[], choices=list(SYNTHETIC_GRAPHS))
+    parser.add_argument('--output', default='./reports', help='Directory for the reports')
+    parser.add_argument('--format', nargs='+', default=['json'], choices=['json', 'parquet'])
+    parser.add_argument('--png', action='store_true', help='Also save the plots as PNG files')
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--num-samples', type=int, default=20, help='Double sweeps for the diameter')
+    parser.add_argument('--distance-samples', type=int, default=1000,
+                        help='BFS sources (at most) for the average distance')
+    parser.add_argument('--offline', action='store_true', help='Never download datasets')
+    parser.add_argument('--archives-path', default=None)
+
+    args = parser.parse_args(argv)
+    if not (args.dataset or args.edge_list or args.synthetic):
+        # Same graphs as the notebook
+        args.dataset = [ds['name'] for ds in DATASETS]
+        args.synthetic = list(SYNTHETIC_GRAPHS)
+
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+
+    summary = []
+    for name, graph in iter_graphs(args):
+        report = analyse_graph(graph, name, args.n_jobs, args.seed, args.num_samples, args.distance_samples)
+        summary.append(summary_row(report))
+        print(f'{name}: {report["num_nodes"]} nodes, {report["seconds"]:.2f}s')
+
+        if 'json' in args.format:
+            with open(os.path.join(args.output, f'{name}.json'), 'w') as report_file:
+                json.dump(to_json(report), report_file, indent=2)
+        if args.png:
+            save_plots(report, args.output)
+
+    if 'json' in args.format:
+        with open(os.path.join(args.output, 'summary.json'), 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+    if 'parquet' in args.format:
+        import pandas as pd  # Needs pyarrow or fastparquet
+        pd.DataFrame(summary, columns=SUMMARY_COLUMNS).to_parquet(os.path.join(args.output, 'summary.parquet'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import random
+import numpy as np
+
+from collections import namedtuple
+
+from edge_list import CHUNK_SIZE, read_edge_chunks
+from graph import EdgeType
+from instrumentation import active
+from traversal import edge_ranges
+
+
+# Sampling estimators for graphs whose exact triangle counts are too costly:
+# wedge sampling on a loaded graph (Seshadhri, Pinar and Kolda) and a one-pass
+# TRIEST-IMPR reservoir (De Stefani et al.) over an edge list file.
+
+SAMPLE_BATCH = 1 << 16  # Wedges or nodes sampled per vectorized batch
+CHECKS_PER_BATCH = 1 << 22  # Bound on the edge lookups of node_coefficients at once
+
+# Confidence interval holding the true value with probability >= 1 - delta
+Estimate = namedtuple('Estimate', ['value', 'lower', 'upper'])
+
+
+def hoeffding_samples(epsilon, delta):
+    # Samples of a [0, 1] variable for |mean - estimate| <= epsilon with probability >= 1 - delta
+    assert 0 < epsilon < 1 and 0 < delta < 1
+    return int(np.ceil(np.log(2 / delta) / (2 * epsilon ** 2)))
+
+
+class WedgeSampler:
+    # Uniform wedges and nodes of the simple undirected graph (no self-loops
+    # or parallel edges) behind a frozen snapshot. Edges are looked up in the
+    # sorted keys u * n + v, like the forward triangle counting.
+    def __init__(self, frozen, seed=None):
+        assert frozen.edge_type is EdgeType.UNDIRECTED
+        num_nodes = frozen.num_nodes
+        src = np.repeat(np.arange(num_nodes, dtype=np.int64), frozen.degrees())
+        dest = np.asarray(frozen.indices, dtype=np.int64)
+
+        # Sorted keys give the CSR of the simple graph, neighbours sorted too.
+        # Sort and drop repeats by hand, np.unique hashes first and is much slower.
+        keys = np.sort(src[src != dest] * num_nodes + dest[src != dest])
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        self.edge_keys = keys[first]
+        self.indices = self.edge_keys % max(num_nodes, 1)
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.edge_keys // max(num_nodes, 1), minlength=num_nodes), out=self.indptr[1:])
+
+        self.degrees = np.diff(self.indptr)
+        self.wedges = self.degrees * (self.degrees - 1) // 2
+
+        # Local coefficients divide by the degree of graph.degree (with
+        # parallel edges and self-loops), like clustering_coefficients
+        entries = frozen.degrees()
+        self._max_triangles = entries * (entries - 1) / 2
+        self._cumulative_wedges = np.cumsum(self.wedges)
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def num_nodes(self):
+        return len(self.degrees)
+
+    @property
+    def num_wedges(self):
+        return int(self._cumulative_wedges[-1]) if self.num_nodes > 0 else 0
+
+    def has_edges(self, src, dest):
+        keys = src * self.num_nodes + dest
+        found = np.searchsorted(self.edge_keys, keys)
+        found[found == len(self.edge_keys)] = 0
+        return self.edge_keys[found] == keys if len(self.edge_keys) > 0 else np.zeros(len(keys), dtype=bool)
+
+    def closed_wedges(self, num_samples):
+        # Closed ones among num_samples uniform wedges: the centre is drawn
+        # with probability proportional to its wedges, then two distinct neighbours
+        closed = 0
+        for start in range(0, num_samples, SAMPLE_BATCH):
+            size = min(SAMPLE_BATCH, num_samples - start)
+            centres = np.searchsorted(self._cumulative_wedges, self.rng.integers(self.num_wedges, size=size),
+                                      side='right')
+
+            degrees = self.degrees[centres]
+            first = self.rng.integers(degrees)
+            second = self.rng.integers(degrees - 1)
+            second += second >= first
+
+            offsets = self.indptr[centres]
+            closed += int(self.has_edges(self.indices[offsets + first], self.indices[offsets + second]).sum())
+
+        return closed
+
+    def sample_nodes(self, num_samples):
+        return self.rng.integers(self.num_nodes, size=num_samples)
+
+    def node_coefficients(self, nodes):
+        # Exact local clustering coefficients of the given nodes, checking
+        # every neighbour of a neighbour against the node's neighbours
+        coefficients = np.zeros(len(nodes))
+
+        # Lookups needed by each node: the sum of its neighbours' degrees
+        cumulative = np.concatenate([[0], np.cumsum(self.degrees[self.indices])])
+        cost = np.cumsum(cumulative[self.indptr[nodes + 1]] - cumulative[self.indptr[nodes]])
+        start = 0
+        while start < len(nodes):
+            done = cost[start - 1] if start > 0 else 0
+            end = max(int(np.searchsorted(cost, done + CHECKS_PER_BATCH, side='right')), start + 1)
+            batch = nodes[start:end]
+
+            # Pairs (v, u) for u in N(v), then (v, w) for w in N(u)
+            owners = np.repeat(np.arange(len(batch)), self.degrees[batch])
+            middle = self.indices[edge_ranges(self.indptr[batch], self.degrees[batch])]
+            owners = np.repeat(owners, self.degrees[middle])
+            ends = self.indices[edge_ranges(self.indptr[middle], self.degrees[middle])]
+
+            closed = np.bincount(owners[self.has_edges(batch[owners], ends)], minlength=len(batch))
+            max_triangles = self._max_triangles[batch]
+            np.divide(closed / 2, max_triangles, out=coefficients[start:end], where=max_triangles > 0)
+            start = end
+
+        return coefficients
+
+
+def hoeffding_estimate(value, epsilon, low=0.0, high=1.0):
+    return Estimate(value, max(low, value - epsilon), min(high, value + epsilon))
+
+
+def triest_estimates(edges, memory, num_estimators, seed=None):
+    # TRIEST-IMPR: every estimator keeps a uniform reservoir of `memory`
+    # edges and, for each new edge, adds the triangles it closes in the
+    # reservoir, weighted by the inverse probability that both other edges
+    # are still sampled. One pass, O(memory * num_estimators) space.
+    assert memory >= 2 and num_estimators >= 1
+    rng = random if seed is None else random.Random(seed)
+    reservoirs = [[] for _ in range(num_estimators)]
+    samples = [{} for _ in range(num_estimators)]  # Adjacency sets of the reservoirs
+    estimates = [0.0] * num_estimators
+    profile = active()
+
+    seen = 0
+    for u, v in edges:
+        if u == v:
+            continue
+        seen += 1
+        weight = max(1.0, (seen - 1) * (seen - 2) / (memory * (memory - 1)))
+
+        for i in range(num_estimators):
+            sample = samples[i]
+            neighbours_u, neighbours_v = sample.get(u), sample.get(v)
+            if neighbours_u is not None and neighbours_v is not None:
+                if v in neighbours_u:
+                    continue  # Repeated edge
+                estimates[i] += weight * len(neighbours_u & neighbours_v)
+
+            reservoir = reservoirs[i]
+            if len(reservoir) < memory:
+                reservoir.append((u, v))
+            elif rng.random() < memory / seen:
+                slot = rng.randrange(memory)
+                for old, other in [reservoir[slot], reservoir[slot][::-1]]:
+                    sample[old].discard(other)
+                    if not sample[old]:
+                        del sample[old]
+                reservoir[slot] = (u, v)
+            else:
+                continue
+
+            sample.setdefault(u, set()).add(v)
+            sample.setdefault(v, set()).add(u)
+
+    if profile is not None:
+        profile.count('triest.edges', seen)
+
+    return np.array(estimates)
+
+
+def stream_triangles(file_path, header_size=0, memory=1 << 20, num_estimators=8, delta=0.05, seed=None,
+                     both_directions=False, chunk_size=CHUNK_SIZE):
+    # Triangle count of an undirected edge list file in a single pass,
+    # without loading the graph. Set both_directions if every edge is listed
+    # as `u v` and `v u`. The interval is Chebyshev's on the mean of the
+    # independent estimators (using their sample variance).
+    assert num_estimators >= 2
+
+    def edges():
+        for src, dest in read_edge_chunks(file_path, header_size, chunk_size):
+            for u, v in zip(src.tolist(), dest.tolist()):
+                if not both_directions or u < v:
+                    yield u, v
+
+    estimates = triest_estimates(edges(), memory, num_estimators, seed)
+    mean = estimates.mean()
+    margin = estimates.std(ddof=1) / np.sqrt(num_estimators * delta)
+
+    return Estimate(mean, max(0.0, mean - margin), mean + margin)
@@ -0,0 +1,175 @@
+import numpy as np
+import sys
+
+from collections import OrderedDict
+
+from advanced_algorithms import compute_average_distance, count_triangles, label_average_distance, sample_distances
+from basic_algorithms import exact_diameter, sample_diameters
+from components import strongly_connected_components
+from girth import find_girth
+from graph import EdgeType, frozen_node_names
+from hyperanf import hyperanf
+from instrumentation import active
+from traversal import FrontierBFS
+
+
+MEMORY_BUDGET = 1 << 28  # Bytes of memoized results kept per session
+
+
+def result_nbytes(value):
+    # Rough memory footprint of a memoized result
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_nbytes(key) + result_nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class GraphAnalysis:
+    # Lazy view of the metrics of one graph. Every metric is computed on first
+    # access and memoized (least recently used results are evicted once they
+    # exceed `memory_budget` bytes); all of them are dropped as soon as the
+    # graph is mutated. Per-node results are arrays indexed by the node ids
+    # of `frozen`, `node_names` maps them back to the graph's nodes.
+    # Sampled metrics are memoized as well, so with seed=None the same random
+    # sample is returned until the graph changes.
+    def __init__(self, graph, memory_budget=MEMORY_BUDGET, n_jobs=1):
+        self.graph = graph
+        self.memory_budget = memory_budget
+        self.n_jobs = n_jobs
+
+        self._results = OrderedDict()  # key -> (result, nbytes), oldest first
+        self._version = graph.version
+        self._frozen = None  # Pinned outside the budget, every metric needs it
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        self._results.clear()
+        self._version = self.graph.version
+        self._frozen = None
+        self.nbytes = 0
+
+    def _check_version(self):
+        if self.graph.version != self._version:
+            self.invalidate()
+
+    def _memo(self, key, compute):
+        self._check_version()
+
+        profile = active()
+        if key in self._results:
+            self.hits += 1
+            if profile is not None:
+                profile.count('session.cache_hits')
+            self._results.move_to_end(key)
+            return self._results[key][0]
+
+        self.misses += 1
+        if profile is not None:
+            profile.count('session.cache_misses')
+        result = compute()
+        nbytes = result_nbytes(result)
+        if nbytes > self.memory_budget:
+            return result  # Never fits, do not flush the cache for it
+
+        self._results[key] = result, nbytes
+        self.nbytes += nbytes
+        while self.nbytes > self.memory_budget:
+            _, (_, evicted) = self._results.popitem(last=False)
+            self.nbytes -= evicted
+
+        return result
+
+    @property
+    def frozen(self):
+        self._check_version()
+        if self._frozen is None:
+            self._frozen = self.graph.freeze()
+        return self._frozen
+
+    @property
+    def node_names(self):
+        return frozen_node_names(self.graph, self.frozen)
+
+    def degrees(self, direction='out'):
+        return self._memo(('degrees', direction), lambda: self.frozen.degree_vector(direction))
+
+    def degree_histogram(self, direction='out'):
+        return self._memo(('degree_histogram', direction), lambda: np.bincount(self.degrees(direction)))
+
+    def component_labels(self):
+        # Root id of the (weakly) connected component of every node
+        return self._memo('component_labels', lambda: self.frozen.components().labels())
+
+    def strong_component_labels(self):
+        # Strongly connected component of every node (weak ones if undirected)
+        return self._memo('strong_component_labels', lambda: strongly_connected_components(self.frozen)
+                          if self.frozen.edge_type is EdgeType.DIRECTED else self.component_labels())
+
+    def component_sizes(self):
+        def _sizes():
+            labels = self.component_labels()
+            return np.bincount(labels)[np.flatnonzero(labels == np.arange(len(labels)))]
+
+        return self._memo('component_sizes', _sizes)
+
+    def triangles(self):
+        # (total, triangles of every node)
+        def _triangles():
+            total, per_node = count_triangles(self.frozen, self.n_jobs)
+            return total, np.fromiter(per_node.values(), dtype=np.int64, count=len(per_node))
+
+        return self._memo('triangles', _triangles)
+
+    def clustering_coefficients(self):
+        def _clustering():
+            # Same definition as advanced_algorithms.clustering_coefficients
+            if self.frozen.edge_type is EdgeType.DIRECTED:
+                import sparse_backend  # Loads scipy
+
+                return sparse_backend.clustering_coefficients(self.frozen)
+
+            degrees = self.degrees().astype(np.float64)
+            max_triangles = degrees * (degrees - 1) / 2
+            _, per_node = self.triangles()
+            return np.divide(per_node, max_triangles, out=np.zeros(len(degrees)), where=max_triangles > 0)
+
+        return self._memo('clustering_coefficients', _clustering)
+
+    def distances(self, source):
+        # BFS distances from the node id `source`, UNVISITED if unreachable
+        def _distances():
+            return FrontierBFS(self.frozen).distances(source).copy()
+
+        return self._memo(('distances', source), _distances)
+
+    def sample_diameters(self, num_samples=20, seed=None):
+        return self._memo(('sample_diameters', num_samples, seed),
+                          lambda: sample_diameters(self.frozen, num_samples, self.n_jobs, seed))
+
+    def exact_diameter(self, time_budget=None):
+        return self._memo(('exact_diameter', time_budget), lambda: exact_diameter(self.frozen, time_budget))
+
+    def hyperanf(self, log2m=6, seed=0):
+        return self._memo(('hyperanf', log2m, seed), lambda: hyperanf(self.frozen, log2m, seed=seed))
+
+    def average_distance(self, num_samples=1000, seed=None, method='sources', backend='python'):
+        if method == 'sources':
+            # Shares the cached sample with sample_distances()
+            sample = self.sample_distances(max_sources=num_samples, seed=seed, backend=backend)
+            return label_average_distance(self.frozen, sample.average_distance)
+        return self._memo(('average_distance', num_samples, seed, method), lambda: compute_average_distance(
+            self.frozen, num_samples, self.n_jobs, seed, method))
+
+    def sample_distances(self, ci_width=0.1, confidence=0.95, max_sources=1000, seed=None, backend='python'):
+        # Both backends give the same sample, so they share the cache entry
+        return self._memo(('sample_distances', ci_width, confidence, max_sources, seed), lambda: sample_distances(
+            self.frozen, ci_width, confidence, max_sources, self.n_jobs, seed, backend))
+
+    def girth(self, threshold=None):
+        # (girth, cycle as node ids)
+        return self._memo(('girth', threshold), lambda: find_girth(self.frozen, threshold, self.n_jobs))
@@ -0,0 +1,204 @@
+import struct
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from graph import EdgeType, FrozenGraph
+
+
+# Flat buffer layout of a frozen graph, readable in place from bytes, a
+# memory-mapped file or a shared memory block:
+#
+#   header | label table | offsets (indptr) | neighbours (indices)
+#
+# Sections start on ALIGNMENT boundaries, so the arrays are views into the
+# buffer and attaching costs O(1) whatever the size of the graph.
+
+MAGIC = b'CNAGRAPH'
+FORMAT_VERSION = 1
+ALIGNMENT = 64  # Cache line, also keeps every array aligned for its dtype
+HEADER = struct.Struct('<8sIIqq16s16sqqqq')  # See _header_fields
+
+
+def label_table(labels):
+    # Integer or fixed-width string array of the labels, None if they are the ids themselves
+    if isinstance(labels, range) and labels.start == 0 and labels.step == 1:
+        return None
+    if len(labels) == 0:
+        return None
+
+    if isinstance(labels, np.ndarray):
+        table = labels
+    else:
+        labels = list(labels)
+        table = np.array(labels)
+        if table.dtype.kind == 'U':
+            # NumPy silently turns mixed labels into strings
+            assert all(isinstance(label, str) for label in labels), 'Labels must all be integers or all strings'
+
+    assert table.dtype.kind in 'iuU', f'Cannot store {table.dtype} labels in a snapshot'
+    return table
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _layout(frozen):
+    # (offset, array) of every section and the total size in bytes
+    arrays = [label_table(frozen.labels), np.asarray(frozen.indptr, dtype=np.int64), np.asarray(frozen.indices)]
+
+    sections, offset = [], _align(HEADER.size)
+    for array in arrays:
+        sections.append((offset, array))
+        offset = _align(offset + (array.nbytes if array is not None else 0))
+
+    return sections, offset
+
+
+def _write(frozen, sections, size, buffer):
+    (labels_offset, labels), (indptr_offset, _), (indices_offset, indices) = sections
+    labels_dtype = labels.dtype.str if labels is not None else ''
+
+    buffer = memoryview(buffer).cast('B')
+    assert len(buffer) >= size, f'Snapshot needs {size} bytes, the buffer has {len(buffer)}'
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, frozen.edge_type.value, frozen.num_nodes,
+                     frozen.num_edges, indices.dtype.str.encode(), labels_dtype.encode(), labels_offset,
+                     indptr_offset, indices_offset, size)
+
+    for offset, array in sections:
+        if array is not None and array.nbytes > 0:
+            array = np.ascontiguousarray(array)
+            buffer[offset:offset + array.nbytes] = array.reshape(-1).view(np.uint8)
+
+
+def _header_fields(buffer):
+    (magic, version, edge_type, num_nodes, num_edges, indices_dtype, labels_dtype, labels_offset, indptr_offset,
+     indices_offset, size) = HEADER.unpack_from(buffer)
+
+    if magic != MAGIC:
+        raise ValueError('Not a graph snapshot')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Snapshot format {version}, expected {FORMAT_VERSION}')
+    if memoryview(buffer).nbytes < size:
+        raise ValueError(f'Truncated snapshot, {memoryview(buffer).nbytes} of {size} bytes')
+
+    return {
+        'edge_type': EdgeType(edge_type),
+        'num_nodes': num_nodes,
+        'num_edges': num_edges,
+        'indices_dtype': indices_dtype.rstrip(b'\0').decode(),
+        'labels_dtype': labels_dtype.rstrip(b'\0').decode(),
+        'labels_offset': labels_offset,
+        'indptr_offset': indptr_offset,
+        'indices_offset': indices_offset,
+        'size': size,
+    }
+
+
+def snapshot_size(graph):
+    return _layout(graph.freeze())[1]
+
+
+def dump_snapshot(graph, buffer=None):
+    # Snapshot of graph.freeze() written into `buffer` (any writable buffer
+    # of at least the snapshot size), or into a new bytearray
+    frozen = graph.freeze()
+    sections, size = _layout(frozen)
+    if buffer is None:
+        buffer = bytearray(size)
+
+    _write(frozen, sections, size, buffer)
+    return buffer
+
+
+def attach_snapshot(buffer, graph_cls=FrozenGraph):
+    # Frozen graph whose arrays are read-only views into `buffer`, nothing
+    # is copied. The buffer must stay alive (and unchanged) while it is used.
+    fields = _header_fields(buffer)
+    num_nodes = fields['num_nodes']
+
+    def view(dtype, count, offset):
+        array = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=offset)
+        array.flags.writeable = False
+        return array
+
+    indptr = view(np.int64, num_nodes + 1, fields['indptr_offset'])
+    indices = view(fields['indices_dtype'], fields['num_edges'], fields['indices_offset'])
+    labels = None
+    if fields['labels_dtype']:
+        labels = view(fields['labels_dtype'], num_nodes, fields['labels_offset'])
+
+    return graph_cls(indptr, indices, labels, fields['edge_type'])
+
+
+def save_snapshot(graph, file_path):
+    # Written through a memory map, the file is the only copy of the arrays
+    frozen = graph.freeze()
+    sections, size = _layout(frozen)
+    output = np.memmap(file_path, dtype=np.uint8, mode='w+', shape=(size,))
+    _write(frozen, sections, size, output)
+    output.flush()
+    del output
+
+
+def load_snapshot(file_path):
+    # Read-only mapping: processes loading the same file share its pages
+    return attach_snapshot(np.memmap(file_path, dtype=np.uint8, mode='r'))
+
+
+class SharedSnapshot:
+    # Snapshot in a shared memory block. The creating process writes it once
+    # and other processes attach to it by name, reading the arrays in place
+    # instead of unpickling a copy each. Every reference to `graph` must be
+    # dropped before close(); the creator also unlinks the block.
+    def __init__(self, block, owner):
+        self._block = block
+        self._owner = owner
+        self.name = block.name
+        self.graph = attach_snapshot(block.buf)
+
+    @classmethod
+    def create(cls, graph):
+        frozen = graph.freeze()
+        sections, size = _layout(frozen)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        _write(frozen, sections, size, block.buf)
+        return cls(block, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def close(self):
+        if self._block is None:
+            return
+
+        self.graph = None
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+        self._block = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    from synthetic_data import SyntheticGraphGenerator
+
+    graph = SyntheticGraphGenerator.create_random_edge_graph(1000, 0.01, seed=0)
+    buffer = dump_snapshot(graph)
+    print(f'{len(buffer)} bytes for {graph.freeze().num_edges} adjacency entries')
+
+    with SharedSnapshot.create(graph) as shared:
+        attached = SharedSnapshot.attach(shared.name)
+        print(attached.graph.num_nodes, attached.graph.num_edges)
+        attached.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import numpy as np
+
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from graph import EdgeType
+from traversal import UNVISITED
+
+
+# Matrix versions of the degree, triangle, clustering and BFS computations on
+# graph.to_sparse(), every product runs in scipy's compiled code. Results are
+# identical to the reference functions (selected with backend='sparse').
+
+ROW_BLOCK_WEDGES = 1 << 23  # Bound on the entries of A[rows] @ A computed at once
+FRONTIER_CELLS = 1 << 26  # Bound on the (node, source) frontier matrix of multi-source BFS
+DISTANCE_CELLS = 1 << 23  # Bound on the (source, node) float distances of one csgraph call
+
+
+def degree_vector(graph, direction='out'):
+    # Row sums (column sums for in-degrees of directed graphs)
+    assert direction in ['in', 'out']
+    matrix = graph.to_sparse()
+    axis = 0 if graph.edge_type is EdgeType.DIRECTED and direction == 'in' else 1
+    return np.asarray(matrix.sum(axis=axis, dtype=np.int64)).ravel()
+
+
+def simple_adjacency(matrix):
+    # 0/1 matrix without self-loops or parallel edges
+    binary = sparse.csr_matrix((np.ones(matrix.nnz, dtype=np.int64), matrix.indices, matrix.indptr),
+                               shape=matrix.shape)
+    return (sparse.triu(binary, 1) + sparse.tril(binary, -1)).tocsr()
+
+
+def _row_blocks(matrix):
+    # Row ranges whose product rows (A[rows] @ A) hold about ROW_BLOCK_WEDGES entries
+    row_degrees = np.diff(matrix.indptr)
+    wedges = np.cumsum(matrix @ row_degrees.astype(np.int64))
+    if len(wedges) == 0:
+        return []
+
+    bounds = np.searchsorted(wedges, np.arange(ROW_BLOCK_WEDGES, wedges[-1], ROW_BLOCK_WEDGES))
+    bounds = np.unique(np.concatenate([[0], bounds, [len(wedges)]]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def _closed_walks(left, right, mask):
+    # Row sums of (left @ right) * mask, a row block at a time
+    sums = np.zeros(left.shape[0], dtype=np.int64)
+    for start, end in _row_blocks(left):
+        product = left[start:end] @ right
+        sums[start:end] = np.asarray(product.multiply(mask[start:end]).sum(axis=1)).ravel()
+    return sums
+
+
+def triangles_per_node(graph):
+    # Undirected: diag(A^3) / 2 = ((A @ A) * A) @ 1 / 2 on the simple graph,
+    # like the forward algorithm. Directed: closed walks of length 3 without
+    # the back-and-forth u -> v -> u -> u, halved.
+    matrix = graph.to_sparse()
+
+    if graph.edge_type is EdgeType.UNDIRECTED:
+        simple = simple_adjacency(matrix)
+        per_node = _closed_walks(simple, simple, simple) // 2
+        return int(per_node.sum()) // 3, per_node
+
+    matrix = matrix.astype(np.int64)
+    transposed = matrix.T.tocsr()
+    walks = _closed_walks(matrix, matrix, transposed)
+    back_and_forth = np.asarray(matrix.multiply(transposed).sum(axis=1)).ravel() * matrix.diagonal()
+    per_node = (walks - back_and_forth) // 2
+
+    return int(per_node.sum()) // 3, per_node
+
+
+def clustering_coefficients(graph):
+    # Triangles over the possible pairs of neighbours, 0 for degrees below 2.
+    # Directed graphs use Fagiolo's definition on the simple graph: directed
+    # triangles diag(S^3) / 2 with S = A + A^T, over the d (d - 1) - 2 d<->
+    # triangles possible with total degree d and d<-> reciprocated edges.
+    if graph.edge_type is EdgeType.UNDIRECTED:
+        degrees = degree_vector(graph)
+        _, triangles = triangles_per_node(graph)
+        max_triangles = degrees * (degrees - 1) / 2
+    else:
+        simple = simple_adjacency(graph.to_sparse())
+        transposed = simple.T.tocsr()
+        symmetric = (simple + transposed).tocsr()
+        triangles = _closed_walks(symmetric, symmetric, symmetric) / 2
+
+        degrees = np.diff(simple.indptr) + np.diff(transposed.indptr)
+        reciprocated = np.asarray(simple.multiply(transposed).sum(axis=1)).ravel()
+        max_triangles = (degrees * (degrees - 1) - 2 * reciprocated).astype(np.float64)
+
+    coefficients = np.zeros(len(degrees))
+    np.divide(triangles, max_triangles, out=coefficients, where=max_triangles > 0)
+    return coefficients
+
+
+def multi_source_distances(graph, sources):
+    # Distances from every source (one row each), UNVISITED if unreachable.
+    # Each level is one product over the boolean semiring: the next frontier
+    # of all sources at once is A^T @ frontier.
+    transposed = graph.to_sparse().T.tocsr().astype(bool)
+    num_nodes = transposed.shape[0]
+    sources = np.asarray(sources, dtype=np.int64)
+    distances = np.full((len(sources), num_nodes), UNVISITED, dtype=np.int32)
+
+    block_size = max(1, FRONTIER_CELLS // max(num_nodes, 1))
+    for start in range(0, len(sources), block_size):
+        block = sources[start:start + block_size]
+        columns = np.arange(len(block))
+
+        frontier = np.zeros((num_nodes, len(block)), dtype=bool)
+        frontier[block, columns] = True
+        visited = frontier.copy()
+        block_distances = distances[start:start + len(block)]
+        block_distances[columns, block] = 0
+
+        level = 0
+        while frontier.any():
+            level += 1
+            frontier = transposed @ frontier
+            frontier &= ~visited
+            visited |= frontier
+
+            nodes, found = np.nonzero(frontier)
+            block_distances[found, nodes] = level
+
+    return distances
+
+
+def source_distances(graph, sources):
+    # Same result as multi_source_distances(), one compiled BFS per source
+    # (csgraph). Much faster on high-diameter graphs, where the frontier
+    # products above take one sparse product per level.
+    matrix = graph.to_sparse()
+    num_nodes = matrix.shape[0]
+    sources = np.asarray(sources, dtype=np.int64)
+    distances = np.full((len(sources), num_nodes), UNVISITED, dtype=np.int32)
+
+    block_size = max(1, DISTANCE_CELLS // max(num_nodes, 1))
+    for start in range(0, len(sources), block_size):
+        block = sources[start:start + block_size]
+        found = csgraph.shortest_path(matrix, method='D', directed=True, unweighted=True, indices=block)
+        reachable = np.isfinite(found)
+        distances[start:start + len(block)][reachable] = found[reachable]
+
+    return distances
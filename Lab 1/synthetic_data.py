@@ -1,123 +1,201 @@
 import numpy as np
 import pprint
 
-from graph import Graph, EdgeType
+from graph import FrozenGraph, Graph, EdgeType, node_id_dtype
 
 
-class SyntheticGraphGenerator:
-    def __init__(self):
-        pass
+def make_rng(seed=None):
+    # Without a seed, derive one from the global NumPy state, so that
+    # np.random.seed() keeps making the generators reproducible
+    if seed is None:
+        seed = np.random.randint(np.iinfo(np.int32).max)
+    return np.random.default_rng(seed)
 
-    @staticmethod
-    def create_random_edge_graph(num_nodes, edge_prob):
-        graph = Graph(edge_type=EdgeType.UNDIRECTED)
-        for i in range(num_nodes):
-            # Update nodes set
-            graph.add_node(i)
 
-            # Add edge i, j with probabilitty `edge_prob`
-            for j in range(i + 1, num_nodes):
-                rnd = np.random.rand()
-                if rnd <= edge_prob:
-                    graph.add_node(j)
-                    graph.add_edge(i, j)
+def sample_bernoulli_positions(rng, num_trials, prob):
+    # Indices of the successes among `num_trials` Bernoulli(prob) trials,
+    # drawn as geometric gaps between successes (Batagelj & Brandes, 2005)
+    if prob <= 0 or num_trials == 0:
+        return np.empty(0, dtype=np.int64)
+    if prob >= 1:
+        return np.arange(num_trials, dtype=np.int64)
 
-        return graph
+    chunks = []
+    last = -1
+    expected = num_trials * prob
+    batch_size = int(expected + 5 * np.sqrt(expected)) + 16
 
-    @staticmethod
-    def create_grid_graph(n, m):
-        graph = Graph(edge_type=EdgeType.UNDIRECTED)
+    while last < num_trials:
+        positions = last + np.cumsum(rng.geometric(prob, size=batch_size))
+        chunks.append(positions[positions < num_trials])
+        last = positions[-1]
 
-        # Define grid direction offsets
-        dx = [1, 0, -1, 0]
-        dy = [0, 1, 0, -1]
+    return np.concatenate(chunks)
 
-        for i in range(n):
-            for j in range(m):
-                src = f'{i}_{j}'  # Construct src node id
-                graph.add_node(src)
 
-                # Connect to all 4 neighbours
-                for k in range(4):
-                    # Compute grid coordinates
-                    neigh_i = i + dy[k]
-                    neigh_j = j + dx[k]
+def upper_triangle_pairs(positions, num_nodes):
+    # Row-major index k of pair (i, j), i < j  ->  (i, j)
+    # Row i starts at i * (2n - i - 1) / 2
+    def row_start(i):
+        return i * (2 * num_nodes - i - 1) // 2
 
-                    # Make sure we are still in the grid
-                    if neigh_i < 0 or neigh_i >= n:
-                        continue
-                    if neigh_j < 0 or neigh_j >= m:
-                        continue
+    b = 2 * num_nodes - 1
+    rows = np.floor((b - np.sqrt(b * b - 8.0 * positions)) / 2).astype(np.int64)
 
-                    dest = f'{neigh_i}_{neigh_j}'  # Construct dest node id
-                    graph.add_node(dest)
-                    graph.add_oriented_edge(src, dest)
+    # Fix floating point rounding at row boundaries
+    rows -= row_start(rows) > positions
+    rows += row_start(rows + 1) <= positions
+
+    cols = positions - row_start(rows) + rows + 1
+    return rows, cols
+
+
+def sample_distinct(rng, groups, group_sizes):
+    # One uniform draw in [0, group_sizes[k]) for every entry k, with no
+    # repeated value inside a group: duplicates are redrawn until all are
+    # distinct, which leaves every subset of a group equally likely
+    values = rng.integers(0, group_sizes)
+    redraw = np.arange(len(values))
+
+    while len(redraw) > 0:
+        keys = groups * (int(group_sizes.max()) + 1) + values
+        _, first = np.unique(keys, return_index=True)
+        duplicate = np.ones(len(values), dtype=bool)
+        duplicate[first] = False
+
+        redraw = np.flatnonzero(duplicate)
+        values[redraw] = rng.integers(0, group_sizes[redraw])
+
+    return values
+
+
+class GridLabels:
+    # Lazy `i_j` labels for the ids of an n x m grid
+    def __init__(self, n, m):
+        self.n = n
+        self.m = m
+
+    def __len__(self):
+        return self.n * self.m
+
+    def __getitem__(self, node):
+        if not 0 <= node < len(self):
+            raise IndexError(node)
+        return f'{node // self.m}_{node % self.m}'
+
+    def __iter__(self):
+        return (f'{i}_{j}' for i in range(self.n) for j in range(self.m))
 
-        return graph
+
+class SyntheticGraphGenerator:
+    def __init__(self):
+        pass
 
     @staticmethod
-    def create_kleinberg_graph(n, m, clustering_exponent=2):
-        # Start from the grid graph
-        graph = SyntheticGraphGenerator.create_grid_graph(n, m)
+    def create_random_edge_graph(num_nodes, edge_prob, seed=None, frozen=False):
+        rng = make_rng(seed)
 
-        all_nodes = []
-        for i in range(n):
-            for j in range(m):
-                all_nodes.append([i, j, f'{i}_{j}'])
+        # Positions of the edges among all n * (n - 1) / 2 pairs, i < j
+        num_pairs = num_nodes * (num_nodes - 1) // 2
+        positions = sample_bernoulli_positions(rng, num_pairs, edge_prob)
 
-        for it, (src_i, src_j, src) in enumerate(all_nodes):
-            for (dest_i, dest_j, dest) in all_nodes[it + 1:]:
-                # Compute edge probability for `small world` effect
-                dist = np.abs(src_i - dest_i) + 1 + np.abs(src_j - dest_j) + 1
-                prob = 1 / dist ** clustering_exponent
+        # Invert the row-major enumeration of the upper triangle
+        src, dest = upper_triangle_pairs(positions, num_nodes)
 
-                # Add edge with probability
-                rnd = np.random.rand()
-                if rnd <= prob:
-                    graph.add_edge(src, dest)
+        graph = FrozenGraph.from_edges(src, dest, num_nodes=num_nodes, edge_type=EdgeType.UNDIRECTED)
+        return graph if frozen else graph.to_graph()
 
-        return graph
+    @staticmethod
+    def create_grid_graph(n, m, frozen=False):
+        # Node (i, j) gets id i * m + j and keeps the label `i_j`
+        ids = np.arange(n * m, dtype=node_id_dtype(n * m)).reshape(n, m)
+
+        # Neighbours in direction order: right, down, left, up
+        neighbours = np.full((n, m, 4), -1, dtype=ids.dtype)
+        neighbours[:, :-1, 0] = ids[:, 1:]
+        neighbours[:-1, :, 1] = ids[1:, :]
+        neighbours[:, 1:, 2] = ids[:, :-1]
+        neighbours[1:, :, 3] = ids[:-1, :]
+
+        # Make sure we are still in the grid
+        neighbours = neighbours.reshape(n * m, 4)
+        inside = neighbours >= 0
+
+        indptr = np.zeros(n * m + 1, dtype=np.int64)
+        np.cumsum(inside.sum(axis=1), out=indptr[1:])
+        graph = FrozenGraph(indptr, neighbours[inside], GridLabels(n, m), EdgeType.UNDIRECTED)
+
+        return graph if frozen else graph.to_graph()
 
     @staticmethod
-    def create_tree_graph(num_nodes):
-        graph = Graph(edge_type=EdgeType.UNDIRECTED)
-        graph.add_node(0)  # Root node
-        for i in range(1, num_nodes):
-            graph.add_node(i)
-            # Chooose parent at random amongst the i-1 nodes already introduced
-            parent = np.random.randint(0, i)
-            graph.add_edge(i, parent)
+    def create_kleinberg_graph(n, m, clustering_exponent=2, seed=None, frozen=False):
+        rng = make_rng(seed)
 
-        return graph
+        # Start from the grid graph
+        grid = SyntheticGraphGenerator.create_grid_graph(n, m, frozen=True)
+
+        # Every pair of cells (i1, j1) < (i2, j2) in row-major order differs
+        # by an offset (di, dj); all pairs with the same offset share the
+        # edge probability 1 / (|di| + 1 + |dj| + 1) ** clustering_exponent
+        di, dj = np.meshgrid(np.arange(n), np.arange(-m + 1, m), indexing='ij')
+        di, dj = di.ravel(), dj.ravel()
+        forward = (di > 0) | (dj > 0)
+        di, dj = di[forward], dj[forward]
+
+        num_placements = (n - di) * (m - np.abs(dj))
+        prob = 1 / (di + 1 + np.abs(dj) + 1) ** clustering_exponent
+
+        # Number of edges for each offset, then which placements get them
+        num_edges = rng.binomial(num_placements, np.minimum(prob, 1))
+        offset = np.repeat(np.arange(len(di)), num_edges)
+        placement = sample_distinct(rng, offset, num_placements[offset])
+
+        # Placement -> top-left cell of the pair
+        width = m - np.abs(dj[offset])
+        src_i = placement // width
+        src_j = placement % width + np.maximum(0, -dj[offset])
+        dest_i, dest_j = src_i + di[offset], src_j + dj[offset]
+
+        # Long-range edges follow the grid neighbours, in the same order as
+        # a scan over all pairs would add them
+        order = np.lexsort((dest_j, dest_i, src_j, src_i))
+        src, dest = (src_i * m + src_j)[order], (dest_i * m + dest_j)[order]
+        src, dest = np.stack([src, dest], axis=1).ravel(), np.stack([dest, src], axis=1).ravel()
+
+        graph = FrozenGraph.from_adjacency_entries(
+            np.concatenate([np.repeat(np.arange(n * m), grid.degrees()), src]),
+            np.concatenate([grid.indices, dest]),
+            grid.labels, n * m, EdgeType.UNDIRECTED)
+
+        return graph if frozen else graph.to_graph()
+
+    @staticmethod
+    def create_tree_graph(num_nodes, seed=None, frozen=False):
+        rng = make_rng(seed)
+        num_nodes = max(num_nodes, 1)  # Root node
+
+        # Chooose parent at random amongst the i-1 nodes already introduced,
+        # for all nodes at once
+        nodes = np.arange(1, num_nodes)
+        parents = (rng.random(num_nodes - 1) * nodes).astype(nodes.dtype)
+
+        graph = FrozenGraph.from_edges(nodes, parents, num_nodes=num_nodes, edge_type=EdgeType.UNDIRECTED)
+        return graph if frozen else graph.to_graph()
 
     @staticmethod
     def create_split_graph(clique_size, stable_set_size, prob=0.3):
         graph = Graph(edge_type=EdgeType.UNDIRECTED)
+        clique_nodes = [f'clq_#{i}' for i in range(clique_size)]
+        stable_set_nodes = [f'ss_#{i}' for i in range(stable_set_size)]
+        graph.add_nodes(clique_nodes + stable_set_nodes)
+
+        # Clique: every node to all previous ones
+        graph.add_edges((node, neigh) for i, node in enumerate(clique_nodes) for neigh in clique_nodes[:i])
 
-        # Create clique
-        clique_nodes = []
-        for i in range(clique_size):
-            node = f'clq_#{i}'
-            graph.add_node(node)
-            clique_nodes.append(node)
-
-            # Add edges to all previous nodes
-            for neigh in clique_nodes[:-1]:
-                graph.add_edge(node, neigh)
-
-        # Create stable set
-        stable_set_nodes = []
-        for i in range(stable_set_size):
-            node = f'ss_#{i}'
-            graph.add_node(node)
-            stable_set_nodes.append(node)
-
-        # Add edges between clique and stable set
-        for clq_node in clique_nodes:
-            for ss_node in stable_set_nodes:
-                rnd = np.random.rand()
-                if rnd <= prob:
-                    graph.add_edge(clq_node, ss_node)
+        # Edges between clique and stable set, one draw per pair in row-major
+        # order (the same stream as drawing them one at a time)
+        rows, cols = np.nonzero(np.random.rand(clique_size, stable_set_size) <= prob)
+        graph.add_edges((clique_nodes[i], stable_set_nodes[j]) for i, j in zip(rows.tolist(), cols.tolist()))
 
         return graph
 
@@ -0,0 +1,808 @@
+import random
+import numpy as np
+import pytest
+
+from graph import EdgeType, Graph
+
+
+# Fast paths checked against plain reference implementations, on small random
+# graphs and on hand-picked corner cases. Run with `python -m pytest -q` from
+# this directory.
+
+TRIALS = 100
+random_seeds = pytest.mark.parametrize('seed', range(TRIALS))
+
+
+def random_edges(seed, edge_type=None, max_nodes=12, max_edges=30):
+    # (edge_type, num_nodes, edges) with repeated edges and self-loops
+    rng = random.Random(seed)
+    edge_type = edge_type or rng.choice(list(EdgeType))
+    num_nodes = rng.randint(1, max_nodes)
+    edges = [(rng.randrange(num_nodes), rng.randrange(num_nodes)) for _ in range(rng.randint(0, max_edges))]
+    return edge_type, num_nodes, edges
+
+
+def graph_from_edges(edge_type, num_nodes, edges):
+    # Graph built one node and edge at a time
+    graph = Graph(edge_type)
+    for node in range(num_nodes):
+        graph.add_node(node)
+    for src, dest in edges:
+        graph.add_edge(src, dest)
+
+    return graph
+
+
+def random_graph(seed, edge_type=None, max_nodes=12, max_edges=30):
+    return graph_from_edges(*random_edges(seed, edge_type, max_nodes, max_edges))
+
+# CSR snapshot
+
+
+def assert_same_graph(frozen, graph):
+    # Same nodes, and the same neighbours in the same order, through the labels
+    assert frozen.num_nodes == len(graph.nodes)
+    assert frozen.num_edges == sum(map(len, graph.adjacency_list.values()))
+    for node, neighbours in graph.adjacency_list.items():
+        node_id = frozen.node_id(node)
+        assert frozen.label(node_id) == node
+        assert [frozen.label(neigh) for neigh in frozen.get_neighbours(node_id).tolist()] == neighbours
+
+
+@random_seeds
+def test_freeze_matches_adjacency_list(seed):
+    graph = random_graph(seed)
+    frozen = graph.freeze()
+    assert_same_graph(frozen, graph)
+    assert frozen.to_graph().adjacency_list == graph.adjacency_list
+
+
+def test_freeze_empty_graph():
+    frozen = Graph().freeze()
+    assert frozen.num_nodes == frozen.num_edges == 0
+    assert frozen.indptr.tolist() == [0]
+    assert frozen.to_graph().adjacency_list == {}
+
+
+def test_freeze_isolated_nodes():
+    graph = Graph()
+    for node in ['a', 'b', 'c']:
+        graph.add_node(node)
+    graph.add_edge('a', 'c')
+
+    frozen = graph.freeze()
+    assert frozen.degrees().tolist() == [1, 0, 1]
+    assert frozen.get_neighbours(frozen.node_id('b')).tolist() == []
+    assert_same_graph(frozen, graph)
+
+
+def test_freeze_self_loops():
+    # add_edge stores an undirected self-loop twice, a directed one once
+    for edge_type, expected in [(EdgeType.UNDIRECTED, [0, 0]), (EdgeType.DIRECTED, [0])]:
+        graph = Graph(edge_type)
+        graph.add_node(0)
+        graph.add_edge(0, 0)
+        frozen = graph.freeze()
+        assert frozen.get_neighbours(0).tolist() == expected
+        assert frozen.to_graph().adjacency_list == {0: expected}
+
+# Edge list loader
+
+
+def reference_edge_list(file_path, header_size, edge_type):
+    # Line by line regex parser of the original Graph.create_from_edge_list
+    import re
+
+    graph = Graph(edge_type)
+    with open(file_path, 'r') as edges_file:
+        for _ in range(header_size):
+            next(edges_file)
+        for line in edges_file:
+            src, dest = re.split(' |\t', line.strip())
+            graph.add_node(src)
+            graph.add_node(dest)
+            graph.add_oriented_edge(src, dest)
+            if edge_type is EdgeType.UNDIRECTED:
+                graph.add_oriented_edge(dest, src)
+
+    return graph
+
+
+@random_seeds
+def test_edge_list_loader_matches_regex_parser(seed, tmp_path):
+    edge_type, _, edges = random_edges(seed, max_nodes=50, max_edges=200)
+    rng = random.Random(seed)
+    lines = ['# Header line'] * 2
+    lines += [rng.choice(' \t').join([str(src * 7), str(dest * 7)]) for src, dest in edges]
+    file_path = tmp_path / 'edges.txt'
+    file_path.write_text('\n'.join(lines) + '\n')
+
+    expected = reference_edge_list(file_path, 2, edge_type)
+    for chunk_size in [3, 1 << 20]:
+        graph = Graph.create_from_edge_list(str(file_path), 2, edge_type, chunk_size=chunk_size)
+        assert graph.adjacency_list == expected.adjacency_list
+        assert list(graph.adjacency_list) == list(expected.adjacency_list)
+
+
+def test_edge_list_loader_reads_archives(tmp_path):
+    import gzip
+
+    file_path = tmp_path / 'edges.txt.gz'
+    with gzip.open(file_path, 'wt') as edges_file:
+        edges_file.write('# FromNodeId\tToNodeId\nb\ta\na\tc\n')
+
+    graph = Graph.create_from_edge_list(str(file_path), 1, EdgeType.DIRECTED)
+    assert graph.adjacency_list == {'b': ['a'], 'a': ['c'], 'c': []}
+
+
+@random_seeds
+def test_from_edges_matches_add_edge(seed):
+    from graph import FrozenGraph
+
+    edge_type, num_nodes, edges = random_edges(seed)
+    src, dest = np.array(edges, dtype=np.int64).reshape(-1, 2).T
+    frozen = FrozenGraph.from_edges(src, dest, num_nodes=num_nodes, edge_type=edge_type)
+    assert_same_graph(frozen, graph_from_edges(edge_type, num_nodes, edges))
+
+
+def test_edge_list_loader_without_edges(tmp_path):
+    file_path = tmp_path / 'edges.txt'
+    file_path.write_text('# Header line\n')
+    assert Graph.create_from_edge_list(str(file_path), 1).adjacency_list == {}
+
+
+def test_edge_list_loader_keeps_na_like_labels(tmp_path):
+    from union_find import stream_components
+
+    file_path = tmp_path / 'edges.txt'
+    file_path.write_text('01 2\nNA 3\nnan 1\nnull N/A\nNone 01\n')
+    expected = reference_edge_list(file_path, 0, EdgeType.UNDIRECTED)
+    assert Graph.create_from_edge_list(str(file_path), 0).adjacency_list == expected.adjacency_list
+
+    components, labels = stream_components(str(file_path))
+    assert labels == ['01', '2', 'NA', '3', 'nan', '1', 'null', 'N/A', 'None']
+    assert components.num_components == 4
+
+# Dataset cache
+
+
+def test_dataset_cache_skips_hashing_unchanged_archives(tmp_path, monkeypatch):
+    import gzip
+    import data
+
+    ds = dict(data.DATASETS[0], url='https://example.org/edges.txt.gz', header_size=1)
+    archive = tmp_path / 'edges.txt.gz'
+    with gzip.open(archive, 'wt') as edges_file:
+        edges_file.write('# header\n10 20\n20 30\n30 10\n')
+
+    hashed = []
+    monkeypatch.setattr(data, 'CACHE_PATH', str(tmp_path / 'cache'))
+    monkeypatch.setattr(data, 'file_hash', lambda path: hashed.append(path) or 'f' * 64)
+
+    graphs = [data.load_dataset(ds, offline=True, archives_path=str(tmp_path)) for _ in range(2)]
+    assert len(hashed) == 1
+    assert [graph.labels.tolist() for graph in graphs] == [['10', '20', '30']] * 2
+
+    # Labelled Graph by default, like the original prepare_data
+    monkeypatch.setattr(data, 'DATASETS', [ds])
+    graph = data.prepare_data(offline=True, archives_path=str(tmp_path))[ds['name']]
+    assert graph.adjacency_list == {'10': ['20', '30'], '20': ['10', '30'], '30': ['20', '10']}
+
+# Traversals
+
+
+def reference_dfs(neighbours, source):
+    # Recursive DFS of the original implementation
+    visited, output = set(), []
+
+    def dfs(node):
+        visited.add(node)
+        output.append(node)
+        for neigh in neighbours[node]:
+            if neigh not in visited:
+                dfs(neigh)
+
+    dfs(source)
+    return visited, output
+
+
+def reference_distances(neighbours, source):
+    distances, queue = {source: 0}, [source]
+    for node in queue:
+        for neigh in neighbours[node]:
+            if neigh not in distances:
+                distances[neigh] = distances[node] + 1
+                queue.append(neigh)
+
+    return distances
+
+
+@random_seeds
+def test_traversals_match_reference(seed):
+    from basic_algorithms import breadth_first_search, depth_first_search
+
+    graph = random_graph(seed)
+    frozen = graph.freeze()
+    source = random.Random(seed).randrange(len(graph.nodes))
+
+    for reverse in [False, True]:
+        directed = graph.edge_type is EdgeType.DIRECTED
+        neighbours = reference_in_neighbours(graph) if reverse and directed else graph.adjacency_list
+        assert depth_first_search(graph, source, reverse) == reference_dfs(neighbours, source)
+        assert depth_first_search(frozen, source, reverse) == reference_dfs(neighbours, source)
+
+        visited, output = breadth_first_search(graph, source, reverse)
+        distances = [distance for _, distance in output]
+        assert distances == sorted(distances)
+        assert dict(output) == reference_distances(neighbours, source)
+        assert visited == set(dict(output))
+        assert breadth_first_search(frozen, source, reverse) == (visited, output)
+
+
+def test_connected_components_with_isolated_nodes():
+    from basic_algorithms import get_connected_components
+
+    graph = Graph()
+    for node in 'abcde':
+        graph.add_node(node)
+    graph.add_edge('a', 'b')
+    graph.add_edge('e', 'd')
+    graph.add_edge('d', 'd')
+
+    components = get_connected_components(graph)
+    assert sorted(map(sorted, components)) == [['a', 'b'], ['c'], ['d', 'e']]
+
+
+def test_freeze_is_cached_until_mutation():
+    graph = random_graph(0, EdgeType.UNDIRECTED)
+    frozen = graph.freeze()
+    assert graph.freeze() is frozen
+
+    graph.add_node('new')
+    assert graph.freeze() is not frozen
+    assert graph.freeze().num_nodes == frozen.num_nodes + 1
+
+
+@random_seeds
+def test_sparse_source_distances_match_reference(seed):
+    from advanced_algorithms import sample_distances
+    from session import GraphAnalysis
+    from sparse_backend import source_distances
+
+    graph = random_graph(seed)
+    sources = list(range(len(graph.nodes)))
+    distances = source_distances(graph.freeze(), sources)
+    for source in sources:
+        expected = reference_distances(graph.adjacency_list, source)
+        assert {node: d for node, d in enumerate(distances[source].tolist()) if d >= 0} == expected
+
+    # Both backends draw the same sources and give the same sample
+    python = sample_distances(graph, max_sources=8, seed=seed)
+    sparse = sample_distances(graph, max_sources=8, seed=seed, backend='sparse')
+    for field, other in zip(python, sparse):
+        assert np.array_equal(field, other, equal_nan=True)
+
+    # average_distance reuses the cached sample of sample_distances
+    session = GraphAnalysis(graph)
+    sample = session.sample_distances(max_sources=8, seed=seed, backend='sparse')
+    assert session.sample_distances(max_sources=8, seed=seed) is sample
+    assert np.array_equal(session.average_distance(8, seed)[0], sample.average_distance, equal_nan=True)
+
+# Triangles
+
+
+def reference_triangles(graph):
+    # Every triple of distinct, pairwise adjacent nodes
+    from itertools import combinations
+
+    neighbours = {node: set(graph.adjacency_list[node]) - {node} for node in graph.nodes}
+    per_node = {node: 0 for node in graph.nodes}
+    total = 0
+    for a, b, c in combinations(sorted(graph.nodes), 3):
+        if b in neighbours[a] and c in neighbours[a] and c in neighbours[b]:
+            total += 1
+            for node in [a, b, c]:
+                per_node[node] += 1
+
+    return total, per_node
+
+
+@random_seeds
+def test_triangles_match_brute_force(seed):
+    from advanced_algorithms import count_triangles
+    from triangles import OrientedGraph
+
+    graph = random_graph(seed, EdgeType.UNDIRECTED, max_edges=40)
+    expected = reference_triangles(graph)
+    assert count_triangles(graph) == expected
+    assert count_triangles(graph, backend='sparse') == expected
+
+    # One wedge per batch
+    oriented = OrientedGraph.from_frozen(graph.freeze())
+    assert oriented.count(chunk_size=1).sum() == 3 * expected[0]
+
+
+def test_triangles_ignore_self_loops_and_parallel_edges():
+    from advanced_algorithms import count_triangles
+
+    # K4 has 4 triangles, each node is in 3 of them
+    graph = graph_from_edges(EdgeType.UNDIRECTED, 4, [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+    graph.add_edge(0, 1)
+    graph.add_edge(2, 2)
+    assert count_triangles(graph) == (4, {0: 3, 1: 3, 2: 3, 3: 3})
+
+    # A star has none
+    graph = graph_from_edges(EdgeType.UNDIRECTED, 4, [(0, 1), (0, 2), (0, 3)])
+    assert count_triangles(graph) == (0, {0: 0, 1: 0, 2: 0, 3: 0})
+
+
+def test_triangles_in_parallel():
+    from advanced_algorithms import count_triangles
+
+    graph = random_graph(0, EdgeType.UNDIRECTED, max_nodes=40, max_edges=200)
+    assert count_triangles(graph, n_jobs=2) == reference_triangles(graph)
+
+# Connected components
+
+
+def reference_components(num_nodes, edges):
+    # Smallest node of the component of every node, by repeated relaxation
+    component = list(range(num_nodes))
+    changed = True
+    while changed:
+        changed = False
+        for src, dest in edges:
+            low = min(component[src], component[dest])
+            if component[src] != low or component[dest] != low:
+                component[src] = component[dest] = low
+                changed = True
+
+    return component
+
+
+@random_seeds
+def test_union_find_matches_reference(seed):
+    from union_find import DisjointSet
+
+    _, num_nodes, edges = random_edges(seed)
+    expected = reference_components(num_nodes, edges)
+    expected_sizes = sorted(np.bincount(expected)[np.unique(expected)].tolist())
+
+    batch = DisjointSet(num_nodes)
+    src, dest = np.array(edges, dtype=np.int64).reshape(-1, 2).T
+    batch.union_edges(src, dest)
+    assert batch.labels().tolist() == expected  # Min-label hooking keeps the smallest id as root
+    assert sorted(batch.component_sizes().tolist()) == expected_sizes
+    assert batch.num_components == len(expected_sizes)
+
+    # Single unions on a set grown one element at a time
+    single = DisjointSet()
+    for node in range(num_nodes):
+        single.add()
+    for edge in edges:
+        single.union(*edge)
+    assert [expected[single.find(node)] for node in range(num_nodes)] == expected
+    assert sorted(single.component_sizes().tolist()) == expected_sizes
+
+    # Incremental tracking on the mutable Graph
+    graph = Graph()
+    graph.track_components()
+    for node in range(num_nodes):
+        graph.add_node(node)
+    for edge in edges:
+        graph.add_edge(*edge)
+    assert sorted(graph.component_sizes().tolist()) == expected_sizes
+
+
+def test_stream_components_of_edge_list(tmp_path):
+    from union_find import stream_components
+
+    file_path = tmp_path / 'edges.txt'
+    file_path.write_text('FromNodeId ToNodeId\nx y\n# Comment line\ny z\nw w\nu v\n')
+
+    for chunk_size in [1, 1 << 20]:
+        components, labels = stream_components(str(file_path), header_size=1, chunk_size=chunk_size)
+        assert labels == ['x', 'y', 'z', 'w', 'u', 'v']
+        roots = components.labels().tolist()
+        assert roots[0] == roots[1] == roots[2] and roots[4] == roots[5]
+        assert len(set(roots)) == components.num_components == 3
+        assert sorted(components.component_sizes().tolist()) == [1, 2, 3]
+
+# Exact diameter
+
+
+def reference_eccentricities(graph):
+    # Plain BFS from every node, inf when some node is unreachable
+    eccentricities = {}
+    for source in graph.nodes:
+        distances = reference_distances(graph.adjacency_list, source)
+        eccentricities[source] = max(distances.values()) if len(distances) == len(graph.nodes) else np.inf
+
+    return eccentricities
+
+
+@random_seeds
+def test_exact_diameter_matches_eccentricities(seed):
+    from analysis import estimate_diameter
+    from basic_algorithms import exact_diameter
+
+    graph = random_graph(seed, EdgeType.UNDIRECTED, max_nodes=20)
+    expected = max(reference_eccentricities(graph).values())
+    assert exact_diameter(graph) == (expected, expected)
+    assert estimate_diameter(graph, method='exact') == expected
+
+
+def test_exact_diameter_bounds():
+    from basic_algorithms import exact_diameter
+
+    path = graph_from_edges(EdgeType.UNDIRECTED, 10, [(node, node + 1) for node in range(9)])
+    assert exact_diameter(path) == (9, 9)
+
+    # Out of time right away: only the double sweep bounds
+    lower, upper = exact_diameter(path, time_budget=0)
+    assert lower <= 9 <= upper
+
+    disconnected = graph_from_edges(EdgeType.UNDIRECTED, 3, [(0, 1)])
+    assert exact_diameter(disconnected) == (np.inf, np.inf)
+
+
+def test_exact_diameter_of_empty_graph():
+    from basic_algorithms import exact_diameter
+
+    assert exact_diameter(Graph(EdgeType.UNDIRECTED)) == (np.inf, np.inf)
+
+
+def test_hyperanf_estimate_is_effective_diameter():
+    from analysis import estimate_diameter
+
+    # Path: most pairs are much closer than the ends
+    graph = graph_from_edges(EdgeType.UNDIRECTED, 50, [(node, node + 1) for node in range(49)])
+    assert 0 < estimate_diameter(graph, method='hyperanf') < 49
+
+
+def test_estimate_diameter_rejects_exact_on_directed():
+    from analysis import estimate_diameter
+
+    graph = graph_from_edges(EdgeType.DIRECTED, 3, [(0, 1), (1, 2), (2, 0)])
+    with pytest.raises(ValueError):
+        estimate_diameter(graph, method='exact')
+
+# Girth
+
+
+def reference_girth(num_nodes, edges):
+    # Self-loop, parallel edge, or else the shortest way around any edge
+    keys = [tuple(sorted(edge)) for edge in edges]
+    if any(src == dest for src, dest in keys):
+        return 1
+    if len(set(keys)) < len(keys):
+        return 2
+
+    girth = np.inf
+    for removed in set(keys):
+        others = graph_from_edges(EdgeType.UNDIRECTED, num_nodes, set(keys) - {removed})
+        distances = reference_distances(others.adjacency_list, removed[0])
+        if removed[1] in distances:
+            girth = min(girth, distances[removed[1]] + 1)
+
+    return girth
+
+
+def assert_cycle(graph, cycle, length):
+    assert len(cycle) == length
+    if length > 2:
+        assert len(set(cycle)) == length
+    for node, neigh in zip(cycle, cycle[1:] + cycle[:1]):
+        assert neigh in graph.adjacency_list[node]
+
+
+@random_seeds
+def test_girth_matches_reference(seed):
+    from girth import find_girth
+
+    _, num_nodes, edges = random_edges(seed, EdgeType.UNDIRECTED, max_nodes=16, max_edges=20)
+    if seed % 2:
+        # Random tree and a few more edges: longer cycles, no self-loops or parallel edges
+        rng = random.Random(seed)
+        edges = [(rng.randrange(node), node) for node in range(1, num_nodes)]
+        edges += [(rng.randrange(num_nodes), rng.randrange(num_nodes)) for _ in range(rng.randint(1, 3))]
+        edges = list(dict.fromkeys(tuple(sorted(edge)) for edge in edges if edge[0] != edge[1]))
+
+    graph = graph_from_edges(EdgeType.UNDIRECTED, num_nodes, edges)
+    expected = reference_girth(num_nodes, edges)
+
+    girth, cycle = find_girth(graph)
+    assert girth == expected
+    if cycle is not None:
+        assert_cycle(graph, cycle, girth)
+
+    for threshold in [3, 4]:
+        bounded, _ = find_girth(graph, threshold=threshold)
+        assert expected <= bounded <= threshold if expected <= threshold else bounded == np.inf
+
+
+def test_girth_of_known_graphs():
+    from girth import find_girth
+
+    petersen = [(node, (node + 1) % 5) for node in range(5)] + [(node, node + 5) for node in range(5)]
+    petersen += [(node + 5, (node + 2) % 5 + 5) for node in range(5)]
+    for num_nodes, edges, expected in [(10, petersen, 5),
+                                       (6, [(node, (node + 1) % 6) for node in range(6)], 6),
+                                       (5, [(0, 1), (1, 2), (1, 3), (3, 4)], np.inf),
+                                       (1, [], np.inf)]:
+        graph = graph_from_edges(EdgeType.UNDIRECTED, num_nodes, edges)
+        girth, cycle = find_girth(graph)
+        assert girth == expected
+        if cycle is not None:
+            assert_cycle(graph, cycle, girth)
+
+        # Only girth <= 4 is decided
+        assert find_girth(graph, threshold=4) == (np.inf, None)
+
+# Power-law fit
+
+
+def test_power_law_fit_at_alpha_bound_is_flagged():
+    from analysis import fit_scale_free
+    from power_law import compare_alternatives, fit_power_law
+
+    # Geometric tail, every candidate xmin ends at the alpha bound
+    histogram = [0, 1000000, 10000, 100, 1]
+    fit = fit_power_law(histogram)
+    assert fit.at_bound and np.isfinite(fit.ks_distance)
+    assert fit == fit_power_law(histogram, xmin=fit.xmin)
+
+    # Same answer as powerlaw's distribution_compare, the bound only shows in the fit
+    R, _ = compare_alternatives(histogram, fit)['lognormal']
+    result = fit_scale_free(histogram, xmin=None)
+    assert result.is_scale_free is bool(R > 0) and result.alpha == fit.alpha
+
+    # Candidates below the bound are still preferred
+    fit = fit_power_law(histogram, max_alpha=20)
+    assert not fit.at_bound and fit.alpha < 20
+
+# Approximate clustering
+
+
+def test_approximate_clustering_bounds_hold_together():
+    from advanced_algorithms import approximate_clustering, clustering_coefficients, count_triangles
+    from sampling import hoeffding_samples
+    from synthetic_data import SyntheticGraphGenerator
+
+    graph = SyntheticGraphGenerator.create_random_edge_graph(300, 0.05, seed=0)
+    result = approximate_clustering(graph, epsilon=0.05, delta=0.01, seed=0, plot=False)
+    assert result.num_samples == hoeffding_samples(0.05, 0.01 / 3)
+
+    triangles, _ = count_triangles(graph)
+    average = np.mean(list(clustering_coefficients(graph, plot=False).values()))
+    assert result.triangles.lower <= triangles <= result.triangles.upper
+    assert result.average_clustering.lower <= average <= result.average_clustering.upper
+
+# Directed graphs
+
+
+def reference_in_neighbours(graph):
+    # In-neighbours in order of their source nodes, like the transposed snapshot
+    in_neighbours = {node: [] for node in graph.adjacency_list}
+    for node, neighbours in graph.adjacency_list.items():
+        for neigh in neighbours:
+            in_neighbours[neigh].append(node)
+    return in_neighbours
+
+
+def dense_adjacency(graph):
+    num_nodes = len(graph.nodes)
+    matrix = np.zeros((num_nodes, num_nodes), dtype=np.int64)
+    for node, neighbours in graph.adjacency_list.items():
+        matrix[node, neighbours] = 1
+    return matrix
+
+
+def transitive_closure(reachable):
+    # Warshall, on a boolean matrix that already holds the diagonal
+    reachable = reachable.copy()
+    for middle in range(len(reachable)):
+        reachable |= reachable[:, [middle]] & reachable[[middle], :]
+    return reachable
+
+
+@random_seeds
+def test_strongly_connected_components_match_reachability(seed):
+    from components import strongly_connected_components, weakly_connected_components
+
+    graph = random_graph(seed, EdgeType.DIRECTED, max_edges=20)
+    adjacent = dense_adjacency(graph).astype(bool) | np.eye(len(graph.nodes), dtype=bool)
+    reachable = transitive_closure(adjacent)
+
+    component = strongly_connected_components(graph)
+    assert np.array_equal(component[:, None] == component[None, :], reachable & reachable.T)
+    assert sorted(np.unique(component).tolist()) == list(range(component.max() + 1))
+
+    # Reverse topological order of the condensation
+    for node, neighbours in graph.adjacency_list.items():
+        assert all(component[neigh] <= component[node] for neigh in neighbours)
+
+    weak = weakly_connected_components(graph)
+    assert np.array_equal(weak[:, None] == weak[None, :], transitive_closure(adjacent | adjacent.T))
+
+    in_neighbours = reference_in_neighbours(graph)
+    for node in graph.nodes:
+        assert list(graph.get_in_neighbours(node)) == in_neighbours[node]
+        assert graph.freeze().get_in_neighbours(node).tolist() == in_neighbours[node]
+
+
+def test_strongly_connected_components_of_known_graph():
+    from components import strongly_connected_components
+
+    # Cycle 0 -> 1 -> 2 -> 0 leading into the cycle 3 <-> 4, and an isolated node 5
+    graph = graph_from_edges(EdgeType.DIRECTED, 6, [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 3)])
+    component = strongly_connected_components(graph).tolist()
+    assert component[0] == component[1] == component[2] != component[3] == component[4] != component[5]
+    assert component[3] < component[0]
+    assert graph.get_in_neighbours(3) == [2, 4]
+
+
+def reference_triangles_by_walks(graph):
+    # Closed walks of length 3 not returning to the parent, as in the original
+    # count_triangles (used for directed graphs)
+    num_triangles = {}
+    for start_node in graph.nodes:
+        walks = 0
+        for neigh1 in graph.adjacency_list[start_node]:
+            for neigh2 in graph.adjacency_list[neigh1]:
+                if neigh2 != start_node:
+                    walks += graph.adjacency_list[neigh2].count(start_node)
+        num_triangles[start_node] = walks // 2
+
+    return sum(num_triangles.values()) // 3, num_triangles
+
+
+@random_seeds
+def test_directed_triangles_match_walks(seed):
+    from advanced_algorithms import count_triangles
+
+    graph = random_graph(seed, EdgeType.DIRECTED)
+    assert count_triangles(graph) == reference_triangles_by_walks(graph)
+
+
+@random_seeds
+def test_directed_clustering_matches_fagiolo(seed):
+    from advanced_algorithms import clustering_coefficients
+    from session import GraphAnalysis
+
+    graph = random_graph(seed, EdgeType.DIRECTED)
+    matrix = dense_adjacency(graph)
+    np.fill_diagonal(matrix, 0)
+    symmetric = matrix + matrix.T
+    triangles = np.diag(np.linalg.matrix_power(symmetric, 3)) / 2
+    degrees = matrix.sum(axis=0) + matrix.sum(axis=1)
+    possible = degrees * (degrees - 1) - 2 * np.diag(matrix @ matrix)
+    expected = np.divide(triangles, possible, out=np.zeros(len(degrees)), where=possible > 0)
+
+    coefficients = clustering_coefficients(graph, plot=False)
+    assert np.allclose([coefficients[node] for node in range(len(expected))], expected)
+    assert np.allclose(GraphAnalysis(graph).clustering_coefficients(), expected)
+
+
+@random_seeds
+def test_directed_girth_matches_matrix_powers(seed):
+    from girth import find_girth
+
+    graph = random_graph(seed, EdgeType.DIRECTED, max_edges=15)
+    matrix = dense_adjacency(graph)
+
+    # Shortest closed walk = shortest directed cycle
+    expected, power = np.inf, np.eye(len(matrix), dtype=np.int64)
+    for length in range(1, len(matrix) + 1):
+        power = np.minimum(power @ matrix, 1)
+        if np.trace(power) > 0:
+            expected = length
+            break
+
+    girth, cycle = find_girth(graph)
+    assert girth == expected
+    if cycle is not None:
+        assert len(cycle) == girth
+        for node, neigh in zip(cycle, cycle[1:] + cycle[:1]):
+            assert neigh in graph.adjacency_list[node]
+
+    # A threshold only decides girth <= threshold, with any cycle that short
+    bounded, _ = find_girth(graph, threshold=4)
+    assert expected <= bounded <= 4 if expected <= 4 else bounded == np.inf
+
+
+def test_directed_girth_small_cases():
+    from girth import find_girth
+
+    for edges, expected in [([(0, 1), (1, 2), (2, 0)], 3), ([(0, 1), (1, 0)], 2),
+                            ([(0, 1), (1, 2), (0, 2)], np.inf), ([(1, 1)], 1)]:
+        graph = graph_from_edges(EdgeType.DIRECTED, 3, edges)
+        assert find_girth(graph)[0] == expected
+
+
+def test_approximate_clustering_rejects_directed():
+    from advanced_algorithms import approximate_clustering
+
+    with pytest.raises(AssertionError):
+        approximate_clustering(random_graph(0, EdgeType.DIRECTED), plot=False)
+
+# Bulk edges
+
+
+def reference_add_edges(graph, edges, deduplicate, self_loops, simple):
+    # add_node / add_edge one pair at a time on a multigraph, skipping what
+    # add_edges skips
+    for src, dest in edges:
+        graph.add_node(src)
+        graph.add_node(dest)
+
+    for src, dest in edges:
+        if (not self_loops or simple) and src == dest:
+            continue
+        if (deduplicate or simple) and dest in graph.adjacency_list[src]:
+            continue
+        graph.add_edge(src, dest)
+
+
+@random_seeds
+def test_add_edges_matches_single_edges(seed):
+    rng = random.Random(seed)
+    edge_type = rng.choice(list(EdgeType))
+    num_nodes = rng.randint(1, 8)
+    name = (lambda node: f'n{node}') if rng.random() < 0.3 else (lambda node: node)
+    simple, deduplicate, self_loops = rng.random() < 0.3, rng.random() < 0.5, rng.random() < 0.5
+    method = rng.choice(['sort', 'hash'])
+
+    graph, expected = Graph(edge_type, simple=simple), Graph(edge_type)
+    if rng.random() < 0.3:
+        graph.track_components()
+        expected.track_components()
+
+    for _ in range(3):
+        edges = [(name(rng.randrange(num_nodes)), name(rng.randrange(num_nodes)))
+                 for _ in range(rng.randint(0, 15))]
+        if isinstance(name(0), int) and rng.random() < 0.5:
+            batch = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        else:
+            batch = iter(edges)
+
+        before = sum(map(len, expected.adjacency_list.values()))
+        added = graph.add_edges(batch, deduplicate=deduplicate, self_loops=self_loops, method=method)
+        reference_add_edges(expected, edges, deduplicate, self_loops, simple)
+        after = sum(map(len, expected.adjacency_list.values()))
+        assert added * (2 if edge_type is EdgeType.UNDIRECTED else 1) == after - before
+
+    assert graph.adjacency_list == expected.adjacency_list
+    assert list(graph.adjacency_list) == list(expected.adjacency_list)
+    assert np.array_equal(graph.degree_vector('in'), expected.degree_vector('in'))
+    assert sorted(graph.component_sizes().tolist()) == sorted(expected.component_sizes().tolist())
+    for src, neighbours in expected.adjacency_list.items():
+        assert all(graph.has_edge(src, dest) for dest in neighbours)
+
+
+def test_add_edges_deduplication_cases():
+    for method in ['sort', 'hash']:
+        graph = Graph()
+        graph.add_edges([('a', 'b')])
+
+        # Repeats in the batch, the reverse of an undirected edge, and an edge already there
+        added = graph.add_edges([('b', 'c'), ('c', 'b'), ('b', 'c'), ('b', 'a'), ('c', 'c')],
+                                deduplicate=True, self_loops=False, method=method)
+        assert added == 1
+        assert graph.adjacency_list == {'a': ['b'], 'b': ['a', 'c'], 'c': ['b']}
+        assert graph.add_edges([], deduplicate=True, method=method) == 0
+
+    # Directed graphs keep both orientations
+    graph = Graph(EdgeType.DIRECTED)
+    assert graph.add_edges(np.array([[0, 1], [1, 0], [0, 1]]), deduplicate=True) == 2
+    assert graph.adjacency_list == {0: [1], 1: [0]}
+
+    # Simple graphs drop self-loops and parallel edges on every path
+    graph = Graph(simple=True)
+    graph.add_edges([(0, 0), (0, 1), (1, 0)])
+    graph.add_edge(0, 1)
+    assert graph.adjacency_list == {0: [1], 1: [0]}
+    assert graph.has_edge(1, 0) and not graph.has_edge(0, 0)
+
+    with pytest.raises(AssertionError):
+        Graph().add_edges([(1, 'a')], deduplicate=True, method='sort')
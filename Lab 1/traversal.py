@@ -0,0 +1,301 @@
+import numpy as np
+
+from collections import deque
+
+from graph import EdgeType
+
+
+UNVISITED = -1
+
+
+class TraversalEngine:
+    # Iterative DFS/BFS over a frozen snapshot of the graph. All per-node state
+    # lives in buffers allocated once and reset lazily between traversals, so
+    # running many searches on the same graph does not allocate per vertex.
+    # With reverse=True edges are followed backwards (in-neighbours).
+    def __init__(self, graph, reverse=False):
+        self.graph = graph
+        frozen = graph.freeze()
+        self._labelled = frozen is not graph  # Nodes are labels, not ids
+        self.frozen = frozen.reverse() if reverse else frozen
+
+        # Plain lists are several times faster than NumPy scalars in Python loops
+        self.indptr = self.frozen.indptr.tolist()
+        self.indices = self.frozen.indices.tolist()
+
+        num_nodes = self.frozen.num_nodes
+        self.distance = [UNVISITED] * num_nodes  # BFS distance / DFS depth
+        self.parent = [UNVISITED] * num_nodes
+        self.order = [UNVISITED] * num_nodes  # Order of visiting nodes
+        self.num_visited = 0
+
+        self._cursor = [0] * num_nodes  # Next neighbour to explore in DFS
+        self._frontier = deque()
+
+    @property
+    def num_nodes(self):
+        return len(self.distance)
+
+    def node_id(self, node):
+        if not self._labelled:
+            return int(node)
+        return self.frozen.node_id(node)
+
+    def node_label(self, node_id):
+        if not self._labelled:
+            return node_id
+        return self.frozen.labels[node_id]
+
+    def visited_nodes(self, start=0):
+        # Node ids visited since the last reset, in visiting order
+        return self.order[start:self.num_visited]
+
+    def reset(self):
+        # Only clear entries touched by the previous traversals
+        distance, parent = self.distance, self.parent
+        for node in self.order[:self.num_visited]:
+            distance[node] = UNVISITED
+            parent[node] = UNVISITED
+
+        self.num_visited = 0
+
+    def visit(self, node, distance, parent=UNVISITED):
+        self.distance[node] = distance
+        self.parent[node] = parent
+        self.order[self.num_visited] = node
+        self.num_visited += 1
+
+    def iter_dfs(self, source, reset=True):
+        # Preorder identical to the recursive DFS: each stack entry resumes
+        # scanning its neighbours from where it left off
+        if reset:
+            self.reset()
+
+        indptr, indices = self.indptr, self.indices
+        distance, cursor = self.distance, self._cursor
+
+        self.visit(source, 0)
+        cursor[source] = indptr[source]
+        stack = [source]
+        yield source
+
+        while stack:
+            node = stack[-1]
+            pos, end = cursor[node], indptr[node + 1]
+
+            while pos < end and distance[indices[pos]] != UNVISITED:
+                pos += 1
+
+            if pos == end:
+                stack.pop()
+                continue
+
+            cursor[node] = pos + 1
+            neigh = indices[pos]
+            self.visit(neigh, len(stack), node)
+            cursor[neigh] = indptr[neigh]
+            stack.append(neigh)
+            yield neigh
+
+    def iter_bfs(self, source, reset=True, max_distance=None):
+        if reset:
+            self.reset()
+
+        indptr, indices, distance = self.indptr, self.indices, self.distance
+        frontier = self._frontier
+        frontier.clear()
+
+        self.visit(source, 0)
+        frontier.append(source)
+
+        while frontier:
+            node = frontier.popleft()
+            node_distance = distance[node]
+            yield node
+
+            if max_distance is not None and node_distance >= max_distance:
+                continue
+
+            for neigh in indices[indptr[node]:indptr[node + 1]]:
+                if distance[neigh] == UNVISITED:
+                    self.visit(neigh, node_distance + 1, node)
+                    frontier.append(neigh)
+
+    def dfs(self, source, reset=True):
+        deque(self.iter_dfs(source, reset), maxlen=0)
+        return self.num_visited
+
+    def bfs(self, source, reset=True, max_distance=None):
+        deque(self.iter_bfs(source, reset, max_distance), maxlen=0)
+        return self.num_visited
+
+
+# Direction switching thresholds from Beamer et al., "Direction-Optimizing
+# Breadth-First Search"
+ALPHA = 14
+BETA = 24
+
+
+def edge_ranges(starts, counts):
+    # Positions starts[i] .. starts[i] + counts[i] of all ranges, concatenated
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+
+    shifts = starts - (np.cumsum(counts) - counts)
+    return np.repeat(shifts, counts) + np.arange(total)
+
+
+class FrontierBFS:
+    # Level-synchronous BFS over the CSR arrays, one NumPy operation per level.
+    # Each level is expanded either top-down (scan the frontier's edges) or
+    # bottom-up (unvisited nodes look for a parent in the frontier), whichever
+    # touches fewer edges. With reverse=True edges are followed backwards.
+    def __init__(self, graph, reverse=False):
+        self.graph = graph
+        frozen = graph.freeze()
+        self._labelled = frozen is not graph
+        self.frozen = frozen.reverse() if reverse else frozen
+        self.indptr = np.asarray(self.frozen.indptr)
+        self.indices = np.asarray(self.frozen.indices)
+        self.degrees = np.diff(self.indptr)
+
+        # Buffers for point-to-point queries, reset lazily
+        self._forward = np.full(self.num_nodes, UNVISITED, dtype=np.int32)
+        self._backward = np.full(self.num_nodes, UNVISITED, dtype=np.int32)
+
+        # Running totals over all searches, updated once per level
+        self.searches = 0
+        self.vertices_visited = 0
+        self.edges_scanned = 0
+
+    @property
+    def num_nodes(self):
+        return len(self.degrees)
+
+    def node_id(self, node):
+        if not self._labelled:
+            return int(node)
+        return self.frozen.node_id(node)
+
+    def counters(self):
+        return {'bfs_runs': self.searches, 'vertices_visited': self.vertices_visited,
+                'edges_scanned': self.edges_scanned}
+
+    def _top_down_step(self, frontier, distance, level):
+        neighbours = self.indices[edge_ranges(self.indptr[frontier], self.degrees[frontier])]
+        self.edges_scanned += len(neighbours)
+        neighbours = np.unique(neighbours[distance[neighbours] == UNVISITED])
+        distance[neighbours] = level
+        self.vertices_visited += len(neighbours)
+        return neighbours
+
+    def _bottom_up_step(self, frontier, distance, level):
+        in_frontier = np.zeros(self.num_nodes, dtype=bool)
+        in_frontier[frontier] = True
+
+        pending = np.flatnonzero(distance == UNVISITED)
+        starts, ends = self.indptr[pending], self.indptr[pending + 1]
+        found = []
+
+        # Check neighbours in windows of doubling width, dropping nodes as
+        # soon as they find a parent (vectorized version of the early exit)
+        low, width = 0, 1
+        while len(pending) > 0:
+            window_start = np.minimum(starts + low, ends)
+            window_size = np.minimum(starts + low + width, ends) - window_start
+
+            active = window_size > 0
+            pending, starts, ends = pending[active], starts[active], ends[active]
+            window_start, window_size = window_start[active], window_size[active]
+
+            hits = in_frontier[self.indices[edge_ranges(window_start, window_size)]]
+            self.edges_scanned += len(hits)
+            has_parent = np.zeros(len(pending), dtype=bool)
+            has_parent[np.repeat(np.arange(len(pending)), window_size)[hits]] = True
+
+            found.append(pending[has_parent])
+            pending, starts, ends = pending[~has_parent], starts[~has_parent], ends[~has_parent]
+            low, width = low + width, width * 2
+
+        new_nodes = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        distance[new_nodes] = level
+        self.vertices_visited += len(new_nodes)
+        return new_nodes
+
+    def distances(self, source, direction='auto'):
+        # direction = 'auto', 'top-down' or 'bottom-up'
+        assert direction in ['auto', 'top-down', 'bottom-up']
+        if self.frozen.edge_type is not EdgeType.UNDIRECTED:
+            direction = 'top-down'  # Bottom-up steps need in-neighbours
+
+        distance = np.full(self.num_nodes, UNVISITED, dtype=np.int32)
+        distance[source] = 0
+        self.searches += 1
+        self.vertices_visited += 1
+
+        frontier = np.array([source])
+        unexplored_edges = int(self.indptr[-1]) - int(self.degrees[source])
+        bottom_up = direction == 'bottom-up'
+        level = 0
+
+        while len(frontier) > 0:
+            level += 1
+
+            if direction == 'auto':
+                frontier_edges = int(self.degrees[frontier].sum())
+                if not bottom_up and frontier_edges > unexplored_edges / ALPHA:
+                    bottom_up = True
+                elif bottom_up and len(frontier) < self.num_nodes / BETA:
+                    bottom_up = False
+
+            if bottom_up:
+                frontier = self._bottom_up_step(frontier, distance, level)
+            else:
+                frontier = self._top_down_step(frontier, distance, level)
+            unexplored_edges -= int(self.degrees[frontier].sum())
+
+        return distance
+
+    def distance(self, src, dest):
+        # Shortest path length between two nodes, UNVISITED if not connected
+        if src == dest:
+            return 0
+        if self.frozen.edge_type is not EdgeType.UNDIRECTED:
+            return int(self.distances(src, direction='top-down')[dest])
+
+        return self._bidirectional_distance(src, dest)
+
+    def _bidirectional_distance(self, src, dest):
+        forward, backward = self._forward, self._backward
+        forward[src], backward[dest] = 0, 0
+        self.searches += 1
+        self.vertices_visited += 2
+
+        frontiers = [np.array([src]), np.array([dest])]
+        levels = [0, 0]
+        visited = [[frontiers[0]], [frontiers[1]]]
+        shortest = UNVISITED
+
+        while len(frontiers[0]) > 0 and len(frontiers[1]) > 0:
+            # Grow the side whose next level is cheaper to expand
+            side = int(self.degrees[frontiers[1]].sum() < self.degrees[frontiers[0]].sum())
+            own, other = (forward, backward) if side == 0 else (backward, forward)
+
+            levels[side] += 1
+            frontiers[side] = self._top_down_step(frontiers[side], own, levels[side])
+            visited[side].append(frontiers[side])
+
+            # The first level that meets the other search fixes the distance
+            met = other[frontiers[side]]
+            met = met[met != UNVISITED]
+            if len(met) > 0:
+                shortest = levels[side] + int(met.min())
+                break
+
+        for nodes in visited[0]:
+            forward[nodes] = UNVISITED
+        for nodes in visited[1]:
+            backward[nodes] = UNVISITED
+
+        return shortest
@@ -0,0 +1,132 @@
+import numpy as np
+
+from instrumentation import active, phase
+from parallel import CHUNKS_PER_JOB, parallel_map, resolve_jobs
+from traversal import edge_ranges
+
+
+WEDGE_CHUNK_SIZE = 1 << 22  # Wedges checked per vectorized batch
+
+
+class OrientedGraph:
+    # Simple undirected graph with every edge oriented from the endpoint of
+    # lower degree rank to the one of higher rank. Each node then keeps at
+    # most O(sqrt(m)) out-neighbours, which bounds the wedges to check by
+    # O(m * sqrt(m)) (forward algorithm, Schank & Wagner).
+    def __init__(self, rank, edge_keys, out_ptr):
+        self.rank = rank
+        self.edge_keys = edge_keys
+        self.out_ptr = out_ptr
+        self.out_neighbours = edge_keys % max(self.num_nodes, 1)
+
+    @classmethod
+    def from_frozen(cls, frozen):
+        num_nodes = frozen.num_nodes
+        indptr = np.asarray(frozen.indptr)
+        degrees = np.diff(indptr)
+
+        # rank[node] orders nodes by (degree, id)
+        rank = np.empty(num_nodes, dtype=np.int64)
+        rank[np.lexsort((np.arange(num_nodes), degrees))] = np.arange(num_nodes)
+
+        src = rank[np.repeat(np.arange(num_nodes), degrees)]
+        dest = rank[np.asarray(frozen.indices)]
+
+        # Keep lower -> higher rank, which also drops self-loops; unique
+        # merges parallel edges and sorts every out-neighbour list
+        forward = src < dest
+        edge_keys = np.unique(src[forward] * num_nodes + dest[forward])
+
+        out_ptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_keys // max(num_nodes, 1), minlength=num_nodes), out=out_ptr[1:])
+
+        return cls(rank, edge_keys, out_ptr)
+
+    def arrays(self):
+        return {'rank': self.rank, 'edge_keys': self.edge_keys, 'out_ptr': self.out_ptr}
+
+    @property
+    def num_nodes(self):
+        return len(self.rank)
+
+    def wedge_counts(self):
+        # Wedges starting at each out-edge position: pairs with every later
+        # out-neighbour of the same node
+        owner = np.repeat(np.arange(self.num_nodes), np.diff(self.out_ptr))
+        return self.out_ptr[owner + 1] - np.arange(len(self.out_neighbours)) - 1, owner
+
+    def chunks(self, num_chunks):
+        # Split out-edge positions into ranges holding about the same number of wedges
+        counts, _ = self.wedge_counts()
+        cumulative = np.cumsum(counts)
+        total = int(cumulative[-1]) if len(cumulative) > 0 else 0
+
+        bounds = np.searchsorted(cumulative, np.linspace(0, total, num_chunks + 1)[1:-1])
+        bounds = np.unique(np.concatenate([[0], bounds, [len(counts)]]))
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def count(self, start=0, end=None, chunk_size=WEDGE_CHUNK_SIZE):
+        # Triangles closed by wedges at out-edge positions [start, end),
+        # returned as per-rank counts (every triangle counts for its 3 nodes)
+        counts, owner = self.wedge_counts()
+        end = len(counts) if end is None else end
+        per_rank = np.zeros(self.num_nodes, dtype=np.int64)
+        profile = active()
+
+        cumulative = np.cumsum(counts[start:end])
+        pos, done = start, 0
+        while pos < end:
+            # Take positions until the batch holds about `chunk_size` wedges
+            stop = start + int(np.searchsorted(cumulative, done + chunk_size, side='right'))
+            stop = min(max(stop, pos + 1), end)
+            batch = np.arange(pos, stop)
+            pos, done = stop, cumulative[stop - start - 1]
+
+            batch_counts = counts[batch]
+            first = np.repeat(batch, batch_counts)
+            second = edge_ranges(batch + 1, batch_counts)
+
+            # Wedge (v, w) centred at u closes a triangle if v -> w exists
+            low, high = self.out_neighbours[first], self.out_neighbours[second]
+            keys = low * self.num_nodes + high
+            found = np.searchsorted(self.edge_keys, keys)
+            found[found == len(self.edge_keys)] = 0
+            closed = self.edge_keys[found] == keys
+
+            for nodes in (owner[first][closed], low[closed], high[closed]):
+                per_rank += np.bincount(nodes, minlength=self.num_nodes)
+
+            if profile is not None:
+                profile.count('triangles.wedges_checked', len(keys))
+                profile.count('triangles.closed_wedges', int(closed.sum()))
+                profile.report_progress('triangles.wedges', pos - start, end - start)
+
+        return per_rank
+
+    def per_node(self, per_rank):
+        # Translate per-rank counts back to node ids
+        return per_rank[self.rank]
+
+
+def _attach_oriented(arrays):
+    return OrientedGraph(**arrays)
+
+
+def _count_chunk(oriented, chunk):
+    start, end = chunk
+    return oriented.count(start, end)
+
+
+def count_triangles_per_node(frozen, n_jobs=1):
+    with phase('triangles.orient'):
+        oriented = OrientedGraph.from_frozen(frozen)
+
+    # Split by wedge count, sum per-node counts of all chunks
+    n_jobs = resolve_jobs(n_jobs)
+    chunks = oriented.chunks(1 if n_jobs == 1 else n_jobs * CHUNKS_PER_JOB)
+    with phase('triangles.count'):
+        per_rank = sum(parallel_map(oriented.arrays(), _attach_oriented, _count_chunk, chunks, n_jobs,
+                                    task='triangles'), np.zeros(oriented.num_nodes, dtype=np.int64))
+    per_node = oriented.per_node(per_rank)
+
+    return int(per_node.sum()) // 3, per_node
@@ -0,0 +1,117 @@
+import numpy as np
+
+from edge_list import CHUNK_SIZE, LabelInterner, read_edge_chunks
+
+
+class DisjointSet:
+    # Union-find over elements 0 .. n-1 stored in NumPy arrays. Single unions
+    # use union by size with path compression; batches of edges are merged
+    # with vectorized min-label hooking followed by full path compression.
+    def __init__(self, num_elements=0):
+        capacity = max(num_elements, 16)
+        self.parent = np.arange(capacity, dtype=np.int64)
+        self.size = np.ones(capacity, dtype=np.int64)
+        self.num_elements = num_elements
+        self.num_components = num_elements
+
+    def __len__(self):
+        return self.num_elements
+
+    def add(self, count=1):
+        # Append `count` singleton elements, returns the id of the first one
+        first = self.num_elements
+        if first + count > len(self.parent):
+            # Grow by doubling, so appends are amortized O(1)
+            capacity = max(2 * len(self.parent), first + count)
+            self.parent = np.concatenate([self.parent, np.arange(len(self.parent), capacity)])
+            self.size = np.concatenate([self.size, np.ones(capacity - len(self.size), dtype=np.int64)])
+
+        self.num_elements += count
+        self.num_components += count
+        return first
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+
+        # Path compression
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+
+        return int(root)
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+
+        # Union by size
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        self.num_components -= 1
+
+        return True
+
+    def find_all(self, elements):
+        # Vectorized find, by pointer jumping
+        roots = self.parent[elements]
+        while True:
+            next_roots = self.parent[roots]
+            if np.array_equal(next_roots, roots):
+                return roots
+            roots = next_roots
+
+    def compress(self):
+        # Point every element straight at its root
+        parent = self.parent[:self.num_elements]
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                return parent
+            parent[:] = grandparent
+
+    def union_edges(self, src, dest):
+        src, dest = np.asarray(src, dtype=np.int64), np.asarray(dest, dtype=np.int64)
+
+        while len(src) > 0:
+            src, dest = self.find_all(src), self.find_all(dest)
+            pending = src != dest
+            src, dest = src[pending], dest[pending]
+            if len(src) == 0:
+                break
+
+            # Hook the larger root under the smallest root it is paired with;
+            # ids only decrease along parent pointers, so no cycles appear
+            low, high = np.minimum(src, dest), np.maximum(src, dest)
+            np.minimum.at(self.parent, high, low)
+            self.compress()
+
+        # Refresh sizes and count of the roots
+        roots = self.compress()
+        self.size[:self.num_elements] = np.bincount(roots, minlength=self.num_elements)
+        self.num_components = int(np.count_nonzero(roots == np.arange(self.num_elements)))
+
+    def labels(self):
+        # Root of every element
+        return self.compress().copy()
+
+    def component_sizes(self):
+        roots = np.flatnonzero(self.compress() == np.arange(self.num_elements))
+        return self.size[roots]
+
+
+def stream_components(file_path, header_size=0, chunk_size=CHUNK_SIZE):
+    # Connected components of an edge list without building the adjacency
+    interner = LabelInterner()
+    components = DisjointSet()
+
+    for src, dest in read_edge_chunks(file_path, header_size, chunk_size):
+        ids = interner.intern(np.stack([src, dest], axis=1).ravel())
+        components.add(len(interner) - len(components))
+        components.union_edges(ids[0::2], ids[1::2])
+
+    return components, interner.labels